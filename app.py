@@ -1,4 +1,10 @@
 import streamlit as st
+from core.instrumentacao import medir_rerun
+from core.referencia import pre_carregar
+from core.usuarios import eh_administrador
+
+# TACO e nutricionistas começam a carregar ao fundo assim que o servidor sobe
+pre_carregar()
 
 # --- PAGE SETUP ---
 cadastro_paciente = st.Page(
@@ -32,18 +38,36 @@ pagina_dieta = st.Page(
     icon="🍎",
 )
 
-pagina_teste = st.Page(
-    "pages/teste.py",
-    title="Teste",
-    icon="🔎",
+pagina_consulta_taco = st.Page(
+    "pages/6_📚_Consulta_TACO.py",
+    title="Consulta TACO",
+    icon="📚",
+)
+
+pagina_enriquecimento = st.Page(
+    "pages/7_✨_Enriquecimento_TACO.py",
+    title="Enriquecimento TACO",
+    icon="✨",
+)
+
+pagina_diagnostico = st.Page(
+    "pages/diagnostico.py",
+    title="Diagnóstico",
+    icon="🛠️",
 )
 # --- NAVIGATION SETUP [WITH SECTIONS]---
-pg = st.navigation({
+paginas = {
     "Menu": [cadastro_paciente, consulta, relatorio_paciente],
     "Pacientes": [pagina_lead, pagina_dieta],
-    "Testes" : [pagina_teste]
-})
+    "Referência": [pagina_consulta_taco, pagina_enriquecimento],
+}
+# Diagnóstico só aparece para quem está em NUTRI_ADMINS (a página confere de novo)
+if eh_administrador(st.session_state.get("email_nutricionista")):
+    paginas["Administração"] = [pagina_diagnostico]
+pg = st.navigation(paginas)
 
 
 # --- RUN NAVIGATION ---
-pg.run()
\ No newline at end of file
+# Cada rerun é medido (tempo, I/O e tamanho do session_state): ver página Diagnóstico
+with medir_rerun(pg.title):
+    pg.run()
\ No newline at end of file
@@ -0,0 +1,223 @@
+"""Micro-benchmarks dos caminhos de dados do app, contra uma planilha falsa.
+
+Para cada tamanho de aba (pacientes e consultas), monta um `Repositorio`
+novo (SQLite temporário + `benchmarks.gsheets_falso.ConexaoFalsa` como
+destino de sincronização) e mede:
+
+    login              `IndiceCredenciais.autenticar` (email certo e desconhecido)
+    importação         primeira `ler_pacientes_consultas`, que copia as abas da planilha
+    leitura            `ler_pacientes_consultas` com e sem o cache por nutricionista
+    inserção           `inserir_anamnese_paciente` e `inserir_consulta`
+    TACO               `carregar_matriz_taco` da planilha e do snapshot local
+    totais da dieta    `PlanoDieta.adicionar_varios` + `totais_dia` e `recalcular_totais`
+
+A latência da planilha é injetável (`--latencia-ms`, `--latencia-por-mil-ms`).
+`--saida` grava os resultados em JSON; `--comparar` confronta com um arquivo
+gravado antes e sai com erro se algum caso piorou mais que `--limite`.
+
+Uso:
+    python -m benchmarks.bench_caminhos [tamanhos...] [--latencia-ms 50] [--saida atual.json] [--comparar base.json]
+"""
+import argparse
+import json
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import core.cache  # noqa: E402
+import core.database  # noqa: E402
+import core.usuarios  # noqa: E402
+from benchmarks.gsheets_falso import SENHA_SINTETICA, ConexaoFalsa, Latencia, email_sintetico, gerar_planilhas  # noqa: E402
+from core.anamnese import inserir_anamnese_paciente  # noqa: E402
+from core.consultas import inserir_consulta, ler_pacientes_consultas  # noqa: E402
+from core.database import BackendGSheets, BackendSQLite, Repositorio  # noqa: E402
+from core.dieta import DIRETORIO_SNAPSHOT_TACO, REFEICOES, PlanoDieta, carregar_matriz_taco  # noqa: E402
+
+TAMANHOS_PADRAO = [1_000, 10_000, 100_000]
+REPETICOES = 20
+ITENS_PLANO = [20, 200]
+MINIMO_DIFERENCA_MS = 0.5
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def cronometrar(funcao, repeticoes, preparar=None):
+    """Tempos (ms) de `repeticoes` chamadas de `funcao`; `preparar` roda antes de cada uma, fora da medição."""
+    tempos = []
+    for _ in range(repeticoes):
+        if preparar is not None:
+            preparar()
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append((time.perf_counter() - inicio) * 1000.0)
+    return tempos
+
+
+def resumo(caso, linhas, tempos):
+    ordenados = sorted(tempos)
+    return {
+        "caso": caso,
+        "linhas": linhas,
+        "repeticoes": len(tempos),
+        "mediana_ms": statistics.median(ordenados),
+        "p95_ms": ordenados[min(len(ordenados) - 1, int(round(0.95 * (len(ordenados) - 1))))],
+    }
+
+
+def usar_repositorio(repo):
+    """Faz as funções de `core` (que usam os objetos do processo) enxergarem `repo`."""
+    core.database._repositorio = repo
+    core.usuarios._indice = None
+    core.cache._cache = core.cache.CacheInquilino()
+
+
+def medir_tamanho(linhas, diretorio, latencia, repeticoes):
+    planilhas = gerar_planilhas(linhas)
+    conexao = ConexaoFalsa(planilhas, latencia)
+    local = BackendSQLite(os.path.join(diretorio, f"bench_{linhas}.db"))
+    repo = Repositorio(local, BackendGSheets(lambda: conexao))
+    usar_repositorio(repo)
+    id_nutricionista = 1
+    resultados = []
+
+    resultados.append(resumo("importação (1ª leitura)", linhas, cronometrar(
+        lambda: ler_pacientes_consultas(id_nutricionista), 1
+    )))
+    cache = core.cache.obter_cache()
+    resultados.append(resumo("ler_pacientes_consultas sem cache", linhas, cronometrar(
+        lambda: ler_pacientes_consultas(id_nutricionista), repeticoes,
+        preparar=lambda: cache.invalidar_tags("aba:AnamnesePacientes", "aba:Consultas"),
+    )))
+    resultados.append(resumo("ler_pacientes_consultas com cache", linhas, cronometrar(
+        lambda: ler_pacientes_consultas(id_nutricionista), repeticoes
+    )))
+
+    indice = core.usuarios.obter_indice_credenciais()
+    email = email_sintetico(id_nutricionista)
+    indice.autenticar(email, SENHA_SINTETICA)  # carga do índice fora da medição
+    resultados.append(resumo("login (email certo)", linhas, cronometrar(
+        lambda: indice.autenticar(email, SENHA_SINTETICA), max(3, repeticoes // 4)
+    )))
+    resultados.append(resumo("login (email desconhecido)", linhas, cronometrar(
+        lambda: indice.autenticar("ninguem@exemplo.com", SENHA_SINTETICA), repeticoes
+    )))
+
+    resultados.append(resumo("inserir_anamnese_paciente", linhas, cronometrar(
+        lambda: inserir_anamnese_paciente({
+            "id_nutricionista": id_nutricionista, "nome_paciente": "Paciente novo", "peso_paciente": 70.0,
+        }), repeticoes
+    )))
+    resultados.append(resumo("inserir_consulta", linhas, cronometrar(
+        lambda: inserir_consulta({
+            "id_paciente": 1, "id_nutricionista": id_nutricionista, "nome_paciente": "Paciente 1",
+            "data_consulta": "2025-06-01 10:00:00", "peso_paciente": 70.0,
+        }, "Paciente 1"), repeticoes
+    )))
+    repo.sincronizador.descarregar(timeout=60)
+    repo.sincronizador.parar()
+
+    sem_snapshot = os.path.join(diretorio, "sem_snapshot")
+    resultados.append(resumo("TACO da planilha", linhas, cronometrar(
+        lambda: carregar_matriz_taco(repo, sem_snapshot), max(3, repeticoes // 4)
+    )))
+    return resultados
+
+
+def medir_fixos(repeticoes):
+    """Casos que não dependem do tamanho das abas (TACO do snapshot e totais da dieta)."""
+    snapshot = os.path.join(RAIZ, DIRETORIO_SNAPSHOT_TACO)
+    resultados = [resumo("TACO do snapshot", 0, cronometrar(lambda: carregar_matriz_taco(None, snapshot), repeticoes))]
+    matriz = carregar_matriz_taco(None, snapshot)
+    aleatorio = np.random.default_rng(0)
+    for quantidade in ITENS_PLANO:
+        itens = [
+            (REFEICOES[n % len(REFEICOES)], int(matriz.ids[aleatorio.integers(len(matriz))]), 100.0)
+            for n in range(quantidade)
+        ]
+
+        def totalizar():
+            plano = PlanoDieta(matriz)
+            plano.adicionar_varios(itens)
+            plano.totais_dia()
+
+        resultados.append(resumo(f"totais da dieta ({quantidade} itens)", quantidade, cronometrar(totalizar, repeticoes)))
+        plano = PlanoDieta(matriz)
+        plano.adicionar_varios(itens)
+        resultados.append(resumo(
+            f"recalcular_totais ({quantidade} itens)", quantidade, cronometrar(plano.recalcular_totais, repeticoes)
+        ))
+    return resultados
+
+
+def comparar(resultados, caminho_base, limite):
+    """Imprime a razão atual/base de cada caso; devolve os casos que pioraram mais que `limite`."""
+    with open(caminho_base, encoding="utf-8") as arquivo:
+        base = {(r["caso"], r["linhas"]): r for r in json.load(arquivo)["resultados"]}
+    piores = []
+    print(f"\nComparação com {caminho_base} (mediana atual / base)")
+    for r in resultados:
+        anterior = base.get((r["caso"], r["linhas"]))
+        if anterior is None or not anterior["mediana_ms"]:
+            continue
+        razao = r["mediana_ms"] / anterior["mediana_ms"]
+        # abaixo de MINIMO_DIFERENCA_MS a diferença é ruído do relógio, não regressão
+        piorou = razao > 1 + limite and r["mediana_ms"] - anterior["mediana_ms"] > MINIMO_DIFERENCA_MS
+        marca = "  <-- piorou" if piorou else ""
+        print(f"{r['caso']:<38} {r['linhas']:>9} {razao:>6.2f}x{marca}")
+        if marca:
+            piores.append(r)
+    return piores
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("tamanhos", nargs="*", type=int, default=TAMANHOS_PADRAO)
+    parser.add_argument("--latencia-ms", type=float, default=0.0, help="espera fixa por chamada à planilha")
+    parser.add_argument("--latencia-por-mil-ms", type=float, default=0.0, help="espera a cada mil linhas lidas/enviadas")
+    parser.add_argument("--repeticoes", type=int, default=REPETICOES)
+    parser.add_argument("--saida", help="grava os resultados neste JSON")
+    parser.add_argument("--comparar", help="JSON de uma execução anterior")
+    parser.add_argument("--limite", type=float, default=0.2, help="piora tolerada na comparação (0.2 = 20%%)")
+    args = parser.parse_args(argumentos)
+
+    # as funções de inserção chamam st.success/st.toast, que aqui rodam sem servidor: cala o aviso de cada chamada
+    import streamlit  # noqa: F401
+
+    logging.getLogger("streamlit.runtime.scriptrunner_utils.script_run_context").addFilter(
+        lambda registro: "missing ScriptRunContext" not in registro.getMessage()
+    )
+    latencia = Latencia(args.latencia_ms / 1000.0, args.latencia_por_mil_ms / 1000.0)
+
+    print(f"latência da planilha: {args.latencia_ms} ms por chamada + {args.latencia_por_mil_ms} ms a cada mil linhas")
+    print(f"{'caso':<38} | {'linhas':>9} | {'mediana (ms)':>12} | {'p95 (ms)':>10} | {'rep.':>4}")
+    resultados = []
+    with tempfile.TemporaryDirectory() as diretorio:
+        lotes = [lambda: medir_fixos(args.repeticoes)] + [
+            lambda tamanho=tamanho: medir_tamanho(tamanho, diretorio, latencia, args.repeticoes)
+            for tamanho in args.tamanhos
+        ]
+        for lote in lotes:
+            for r in lote():
+                print(f"{r['caso']:<38} | {r['linhas']:>9} | {r['mediana_ms']:>12.3f} | {r['p95_ms']:>10.3f} | {r['repeticoes']:>4}")
+                resultados.append(r)
+
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as arquivo:
+            json.dump({
+                "criado_em": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "latencia_ms": args.latencia_ms,
+                "latencia_por_mil_ms": args.latencia_por_mil_ms,
+                "resultados": resultados,
+            }, arquivo, ensure_ascii=False, indent=2)
+    if args.comparar and comparar(resultados, args.comparar, args.limite):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Latência de inserção em função do tamanho da aba.
+
+Compara o caminho atual (`Repositorio.inserir`: INSERT local + fila de
+sincronização, depois `append_rows` em lote só com as linhas novas) com o
+caminho antigo das páginas (ler a aba inteira, `pd.concat` e `conn.update`
+com tudo). Roda sem rede, contra uma planilha falsa em memória que conta as
+células e as chamadas enviadas (`benchmarks.gsheets_falso`).
+
+Uso:
+    python -m benchmarks.bench_insercao [tamanhos...]
+"""
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.gsheets_falso import ConexaoFalsa, PlanilhaFalsa  # noqa: E402
+from core.database import BackendGSheets, BackendSQLite, Repositorio  # noqa: E402
+
+TAMANHOS_PADRAO = [100, 1_000, 10_000, 100_000]
+INSERCOES = 50
+
+
+def consulta(i):
+    return {
+        "id_consulta": i,
+        "nome_paciente": f"Paciente {i % 500}",
+        "data_consulta": "2025-05-18 13:13:51",
+        "queixas": "cansaço",
+        "conduta": "ajuste de carboidratos",
+        "orientacoes": "beber água",
+        "data_retorno": "2025-06-18",
+        "horario_retorno": "14:00",
+    }
+
+
+def medir(tamanho, diretorio):
+    existentes = pd.DataFrame([consulta(i) for i in range(1, tamanho + 1)])
+
+    local = BackendSQLite(os.path.join(diretorio, f"bench_{tamanho}.db"))
+    local.anexar("Consultas", existentes.to_dict("records"))
+    local.marcar_importado("Consultas")
+    planilha = PlanilhaFalsa(existentes)
+    conexao = ConexaoFalsa({"Consultas": planilha})
+    repo = Repositorio(local, BackendGSheets(lambda: conexao))
+
+    tempos_novo = []
+    for i in range(INSERCOES):
+        inicio = time.perf_counter()
+        repo.inserir("Consultas", consulta(tamanho + 1 + i))
+        tempos_novo.append(time.perf_counter() - inicio)
+    repo.sincronizador.descarregar(timeout=30)
+    repo.sincronizador.parar()
+    celulas_novo = planilha.celulas_enviadas / INSERCOES
+    chamadas_novo = planilha.chamadas
+
+    planilha.celulas_enviadas = 0
+    tempos_antigo = []
+    for i in range(min(INSERCOES, 10)):
+        inicio = time.perf_counter()
+        df = conexao.read(worksheet="Consultas")
+        df = pd.concat([df, pd.DataFrame([consulta(tamanho + 1 + INSERCOES + i)])], ignore_index=True)
+        conexao.update(worksheet="Consultas", data=df)
+        tempos_antigo.append(time.perf_counter() - inicio)
+    celulas_antigo = planilha.celulas_enviadas / len(tempos_antigo)
+
+    return (
+        statistics.median(tempos_novo) * 1000,
+        celulas_novo,
+        chamadas_novo,
+        statistics.median(tempos_antigo) * 1000,
+        celulas_antigo,
+    )
+
+
+def main(tamanhos):
+    print(f"{INSERCOES} inserções por tamanho; células por inserção; chamadas = append_rows em lote")
+    print(f"{'linhas':>8} | {'inserir (ms)':>12} | {'células':>8} | {'chamadas':>8} | {'reescrita (ms)':>14} | {'células':>9}")
+    with tempfile.TemporaryDirectory() as diretorio:
+        for tamanho in tamanhos:
+            novo, cel_novo, chamadas, antigo, cel_antigo = medir(tamanho, diretorio)
+            print(
+                f"{tamanho:>8} | {novo:>12.3f} | {cel_novo:>8.0f} | {chamadas:>8} | "
+                f"{antigo:>14.3f} | {cel_antigo:>9.0f}"
+            )
+
+
+if __name__ == "__main__":
+    main([int(t) for t in sys.argv[1:]] or TAMANHOS_PADRAO)
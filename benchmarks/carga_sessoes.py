@@ -0,0 +1,342 @@
+"""Teste de carga com várias sessões simultâneas do app (`AppTest`).
+
+Cada nível de concorrência sobe N sessões de nutricionistas e N visitantes
+do formulário de lead, cada uma num processo próprio com o seu
+`streamlit.testing.v1.AppTest` a partir do `app.py` (o `AppTest` troca
+estado global do streamlit a cada run, então duas sessões não podem dividir
+um processo). As sessões de nutricionista fazem login, cadastram pacientes,
+registram uma consulta para cada um e montam e salvam um plano alimentar;
+os visitantes enviam a pré-anamnese.
+
+Todos os processos gravam no mesmo arquivo SQLite, cada um com o seu
+`Repositorio`, e disputam de verdade as transações, as sequências de IDs e
+a fila de sincronização. Quem envia a fila para a planilha falsa de
+`benchmarks.gsheets_falso` é só o `Sincronizador` do processo principal,
+como a thread única do servidor; o dos processos de sessão é parado, porque
+a entrega "pelo menos uma vez" não reserva as linhas da fila e dois
+remetentes enviariam a mesma linha duas vezes.
+
+Ao final de cada nível, confere no banco e na planilha que cada escrita
+feita pelas sessões aparece exatamente uma vez (escritas perdidas e IDs
+repetidos) e mostra a latência dos reruns (p50/p95/p99) e a vazão.
+
+Obs.: no `AppTest`, `switch_page` roda o script da página direto, sem
+passar de novo pelo `app.py`; o login e o primeiro rerun passam por ele.
+
+Uso:
+    python -m benchmarks.carga_sessoes [níveis...] [--pacientes 2] [--latencia-ms 50]
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+import pandas as pd
+from streamlit.testing.v1 import AppTest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_caminhos import usar_repositorio  # noqa: E402
+from benchmarks.gsheets_falso import SENHA_SINTETICA, ConexaoFalsa, Latencia, PlanilhaFalsa, email_sintetico  # noqa: E402
+from core.database import TABELAS, BackendGSheets, BackendSQLite, Repositorio, obter_repositorio  # noqa: E402
+from core.usuarios import gerar_hash_senha  # noqa: E402
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP = os.path.join(RAIZ, "app.py")
+NIVEIS_PADRAO = [1, 2, 4, 8]
+PACIENTES_POR_SESSAO = 2
+TIMEOUT_RERUN = 120
+TIMEOUT_SESSAO = 900
+# Espera do sincronizador do processo principal com a fila vazia: as sessões
+# rodam em outros processos e não conseguem acordá-lo com `notificar()`
+INTERVALO_SINCRONIZACAO = 0.2
+# Itens que o interpretador do lote resolve sem pedir escolha (ver `core.entrada_lote`)
+LOTE_PLANO = "Café da Manhã: pão francês 50g, queijo minas 30g\nAlmoço: arroz, integral, cozido 120g"
+
+
+class Sessao:
+    """Um navegador simulado: mede cada rerun e guarda as escritas que fez."""
+
+    def __init__(self, nome):
+        self.nome = nome
+        self.tempos = []
+        self.erros = []
+        self.app = None
+
+    def rodar(self, acao=None):
+        """Roda `acao` (que altera widgets e devolve o AppTest) ou um rerun simples; mede o tempo."""
+        inicio = time.perf_counter()
+        at = (acao or (lambda: self.app))().run()
+        self.tempos.append((time.perf_counter() - inicio) * 1000.0)
+        if at.exception:
+            self.erros.extend(e.message for e in at.exception)
+        return at
+
+    def abrir(self, pagina=None, query=None):
+        self.app = at = AppTest.from_file(APP, default_timeout=TIMEOUT_RERUN)
+        for chave, valor in (query or {}).items():
+            at.query_params[chave] = valor
+        if pagina is not None:
+            at.switch_page(pagina)
+        return self.rodar()
+
+
+def escolher_paciente(seletor, nome):
+    """Escolhe o paciente pelo id, que é o valor dos seletores de paciente das páginas.
+
+    `select_index` do AppTest guardaria o rótulo já formatado (o nome), que o
+    `format_func` das páginas não reconhece.
+    """
+    pacientes = obter_repositorio().ler("AnamnesePacientes")
+    return seletor.set_value(int(pacientes.loc[pacientes["nome_paciente"] == nome, "id_paciente"].iloc[0]))
+
+
+def sessao_nutricionista(id_nutricionista, pacientes):
+    """Login, cadastro de `pacientes` pacientes, uma consulta para cada e um plano salvo."""
+    s = Sessao(f"nutri{id_nutricionista}")
+    escritas = {"pacientes": [], "consultas": [], "planos": []}
+    s.abrir()
+    s.app.text_input(key="email").set_value(email_sintetico(id_nutricionista))
+    s.app.text_input(key="password").set_value(SENHA_SINTETICA)
+    s.rodar(lambda: s.app.button[0].click())
+    if not s.app.session_state["password_correct"]:
+        s.erros.append("login recusado")
+        return s, escritas
+
+    for k in range(pacientes):
+        nome = f"Carga n{id_nutricionista} p{k}"
+        s.app.text_input[0].set_value(nome)
+        s.rodar(lambda: s.app.button(key="FormSubmitter:anamnese_form-Enviar").click())
+        escritas["pacientes"].append(nome)
+
+    s.rodar(lambda: s.app.switch_page("pages/2_📅_Consultas.py"))
+    for nome in escritas["pacientes"]:
+        s.rodar(lambda: escolher_paciente(s.app.selectbox[0], nome))
+        s.rodar(lambda: next(b for b in s.app.button if b.label.startswith("💾")).click())
+        escritas["consultas"].append(nome)
+
+    s.rodar(lambda: s.app.switch_page("pages/5_🍎_Dieta.py"))
+    nome = escritas["pacientes"][0]
+    seletor = s.app.selectbox(key="paciente_plano_key")
+    s.rodar(lambda: escolher_paciente(seletor, nome))
+    s.rodar(lambda: s.app.text_area(key="lote_texto_key").set_value(LOTE_PLANO))
+    s.rodar(lambda: s.app.button(key="btn_lote_key").click())
+    s.rodar(lambda: s.app.button(key="btn_salvar_plano_key").click())
+    escritas["planos"].append(nome)
+    return s, escritas
+
+
+def sessao_visitante(numero, id_nutricionista):
+    """Visitante sem login que abre o link de pré-anamnese e envia o formulário."""
+    s = Sessao(f"lead{numero}")
+    nome = f"Carga lead {numero}"
+    s.abrir("pages/4_📢_Pre_Anamnese.py", {"id_nutricionista": str(id_nutricionista)})
+    s.app.text_input[0].set_value(nome)
+    s.rodar(lambda: s.app.button(key="FormSubmitter:pre_anamnese_form-Enviar").click())
+    return s, {"leads": [nome]}
+
+
+SESSOES = {"nutricionista": sessao_nutricionista, "visitante": sessao_visitante}
+
+
+def preparar_processo():
+    """Ajustes de cada processo (o principal e os das sessões)."""
+    # o app lê o snapshot da TACO e o índice de documentos por caminhos relativos à raiz
+    os.chdir(RAIZ)
+    # as sessões rodam sem servidor: cala o aviso de ScriptRunContext das threads de sincronização
+    logging.getLogger("streamlit.runtime.scriptrunner_utils.script_run_context").addFilter(
+        lambda registro: "missing ScriptRunContext" not in registro.getMessage()
+    )
+
+
+def preparar(caminho_banco, nutricionistas, latencia):
+    """Banco novo com os nutricionistas de teste; a planilha falsa recebe a sincronização.
+
+    Todas as tabelas já saem marcadas como importadas, para os processos das
+    sessões nunca lerem a planilha, que só existe no processo principal.
+    """
+    conexao = ConexaoFalsa({
+        aba: PlanilhaFalsa(pd.DataFrame()) for aba, tabela in TABELAS.items() if not tabela.get("somente_local")
+    }, latencia)
+    local = BackendSQLite(caminho_banco)
+    hash_senha = gerar_hash_senha(SENHA_SINTETICA)
+    local.anexar("Nutricionistas", [
+        {
+            "id_nutricionista": i,
+            "nome_nutricionista": f"Nutricionista {i}",
+            "email_nutricionista": email_sintetico(i),
+            "hash_senha_nutricionista": hash_senha,
+        }
+        for i in range(1, nutricionistas + 1)
+    ])
+    for aba in TABELAS:
+        local.marcar_importado(aba)
+    repo = Repositorio(local, BackendGSheets(lambda: conexao))
+    repo.sincronizador.intervalo_ocioso = INTERVALO_SINCRONIZACAO
+    return repo, conexao
+
+
+def processo_sessao(tipo, argumentos, caminho_banco, largada, resultados):
+    """Corpo de cada processo: um repositório próprio sobre o banco compartilhado e uma sessão.
+
+    Põe em `resultados` o nome da sessão, os tempos dos reruns, os erros e as escritas feitas.
+    """
+    nome, tempos = f"{tipo}{list(argumentos)}", []
+    try:
+        preparar_processo()
+        # planilha sem abas: se uma sessão tentar ler ou enviar direto, falha com WorksheetNotFound
+        repo = Repositorio(BackendSQLite(caminho_banco), BackendGSheets(lambda: ConexaoFalsa({})), intervalo_reconciliacao=None)
+        repo.sincronizador.parar()
+        usar_repositorio(repo)
+        largada.wait()
+    except Exception as erro:
+        largada.abort()
+        resultados.put((nome, tempos, [f"preparação: {erro!r}"], {}))
+        return
+    try:
+        s, escritas = SESSOES[tipo](*argumentos)
+        resultados.put((s.nome, s.tempos, s.erros, escritas))
+    except Exception as erro:
+        resultados.put((nome, tempos, [repr(erro)], {}))
+
+
+def contar(valores, esperados):
+    """(perdidos, repetidos): esperados que não aparecem e que aparecem mais de uma vez."""
+    vistos = {}
+    for valor in valores:
+        vistos[valor] = vistos.get(valor, 0) + 1
+    perdidos = sum(1 for e in esperados if e not in vistos)
+    repetidos = sum(1 for e in esperados if vistos.get(e, 0) > 1)
+    return perdidos, repetidos
+
+
+def conferir(repo, conexao, escritas):
+    """Perdidos/repetidos no banco e na planilha, e IDs repetidos nas abas com sequência."""
+    colunas = {"pacientes": ("AnamnesePacientes", "nome_paciente"), "consultas": ("Consultas", "nome_paciente"),
+               "leads": ("LeadsPacientes", "nome")}
+    resultado = {"perdidas_banco": 0, "repetidas_banco": 0, "perdidas_planilha": 0, "repetidas_planilha": 0}
+    for tipo, (aba, coluna) in colunas.items():
+        esperados = escritas.get(tipo, [])
+        for destino, df in (("banco", repo.ler(aba)), ("planilha", conexao.read(worksheet=aba))):
+            valores = df[coluna].tolist() if coluna in df else []
+            perdidos, repetidos = contar(valores, esperados)
+            resultado[f"perdidas_{destino}"] += perdidos
+            resultado[f"repetidas_{destino}"] += repetidos
+
+    planos = repo.ler("PlanosDieta")
+    pacientes = repo.ler("AnamnesePacientes")
+    salvos = pacientes[pacientes["id_paciente"].isin(planos["id_paciente"])]["nome_paciente"].tolist() if len(planos) else []
+    resultado["perdidas_banco"] += contar(salvos, escritas.get("planos", []))[0]
+
+    ids_repetidos = 0
+    for aba, coluna in (("AnamnesePacientes", "id_paciente"), ("Consultas", "id_consulta"), ("PlanosDieta", "id_versao_plano")):
+        destinos = [repo.ler(aba)] if TABELAS[aba].get("somente_local") else [repo.ler(aba), conexao.read(worksheet=aba)]
+        for df in destinos:
+            if coluna in df:
+                ids = df[coluna].dropna().astype(int)
+                ids_repetidos += int(ids.duplicated().sum())
+    resultado["ids_repetidos"] = ids_repetidos
+    return resultado
+
+
+def percentil(ordenados, p):
+    return ordenados[min(len(ordenados) - 1, int(round(p / 100.0 * (len(ordenados) - 1))))] if ordenados else float("nan")
+
+
+def rodar_nivel(concorrencia, pacientes, latencia):
+    contexto = multiprocessing.get_context("spawn")
+    largada = contexto.Barrier(2 * concorrencia + 1)
+    resultados = contexto.Queue()
+    with tempfile.TemporaryDirectory() as diretorio:
+        caminho_banco = os.path.join(diretorio, "carga.db")
+        repo, conexao = preparar(caminho_banco, concorrencia, latencia)
+        sessoes = [("nutricionista", (i, pacientes)) for i in range(1, concorrencia + 1)]
+        sessoes += [("visitante", (n, (n - 1) % concorrencia + 1)) for n in range(1, concorrencia + 1)]
+        processos = [
+            contexto.Process(target=processo_sessao, args=(tipo, argumentos, caminho_banco, largada, resultados))
+            for tipo, argumentos in sessoes
+        ]
+        for processo in processos:
+            processo.start()
+        try:
+            # o relógio só começa com todos os processos já de pé (imports e repositório prontos)
+            largada.wait()
+        except threading.BrokenBarrierError:
+            pass
+        inicio = time.perf_counter()
+        terminadas = [resultados.get(timeout=TIMEOUT_SESSAO) for _ in processos]
+        duracao = time.perf_counter() - inicio
+        for processo in processos:
+            processo.join()
+        repo.sincronizador.descarregar(timeout=120)
+        repo.sincronizador.parar()
+
+        tempos, escritas, erros = [], {}, []
+        for nome, tempos_sessao, erros_sessao, feitas in terminadas:
+            tempos.extend(tempos_sessao)
+            erros.extend(f"{nome}: {e}" for e in erros_sessao)
+            for tipo, valores in feitas.items():
+                escritas.setdefault(tipo, []).extend(valores)
+        if repo.local.tamanho_fila():
+            erros.append(f"fila: {repo.local.tamanho_fila()} linha(s) não enviadas")
+        conferencia = conferir(repo, conexao, escritas)
+
+    ordenados = sorted(tempos)
+    total_escritas = sum(len(v) for v in escritas.values())
+    return {
+        "sessoes": 2 * concorrencia,
+        "reruns": len(tempos),
+        "p50_ms": percentil(ordenados, 50),
+        "p95_ms": percentil(ordenados, 95),
+        "p99_ms": percentil(ordenados, 99),
+        "media_ms": statistics.fmean(ordenados) if ordenados else float("nan"),
+        "reruns_por_s": len(tempos) / duracao,
+        "escritas_por_s": total_escritas / duracao,
+        "escritas": total_escritas,
+        "erros": erros,
+        **conferencia,
+    }
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("niveis", nargs="*", type=int, default=NIVEIS_PADRAO,
+                        help="sessões de nutricionista por nível (e o mesmo número de visitantes)")
+    parser.add_argument("--pacientes", type=int, default=PACIENTES_POR_SESSAO, help="pacientes cadastrados por sessão")
+    parser.add_argument("--latencia-ms", type=float, default=0.0, help="espera por chamada à planilha falsa")
+    args = parser.parse_args(argumentos)
+
+    preparar_processo()
+    latencia = Latencia(args.latencia_ms / 1000.0)
+
+    print(f"{args.pacientes} paciente(s) por nutricionista; latência da planilha {args.latencia_ms} ms por chamada")
+    print(
+        f"{'sessões':>7} | {'reruns':>6} | {'p50 (ms)':>9} | {'p95 (ms)':>9} | {'p99 (ms)':>9} | {'reruns/s':>8} | "
+        f"{'escritas/s':>10} | {'perdidas b/p':>12} | {'repetidas b/p':>13} | {'IDs rep.':>8} | {'erros':>5}"
+    )
+    falhou = False
+    for concorrencia in args.niveis:
+        r = rodar_nivel(concorrencia, args.pacientes, latencia)
+        print(
+            f"{r['sessoes']:>7} | {r['reruns']:>6} | {r['p50_ms']:>9.1f} | {r['p95_ms']:>9.1f} | {r['p99_ms']:>9.1f} | "
+            f"{r['reruns_por_s']:>8.1f} | {r['escritas_por_s']:>10.1f} | "
+            f"{r['perdidas_banco']:>5}/{r['perdidas_planilha']:<6} | {r['repetidas_banco']:>6}/{r['repetidas_planilha']:<6} | "
+            f"{r['ids_repetidos']:>8} | {len(r['erros']):>5}"
+        )
+        for erro in r["erros"][:5]:
+            print(f"    {erro}")
+        falhou = falhou or bool(
+            r["erros"] or r["perdidas_banco"] or r["perdidas_planilha"]
+            or r["repetidas_banco"] or r["repetidas_planilha"] or r["ids_repetidos"]
+        )
+    if falhou:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
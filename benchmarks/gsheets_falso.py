@@ -0,0 +1,188 @@
+"""Planilha do Google Sheets falsa, em memória, para os benchmarks.
+
+`ConexaoFalsa` imita o que o app usa de `GSheetsConnection` (`read`,
+`update` e `client._select_worksheet(...).append_rows`), sem rede nem
+credenciais. Como no gspread, uma aba que não existe levanta
+`WorksheetNotFound`, a não ser com `criar_abas=True`. Cada chamada pode
+esperar uma latência fixa mais uma parte proporcional ao número de linhas,
+para simular a API. `gerar_planilhas` monta abas sintéticas
+(Nutricionistas, AnamnesePacientes, Consultas, TACO) de qualquer tamanho,
+de 1 mil a 1 milhão de linhas.
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from gspread.exceptions import WorksheetNotFound
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.dieta import ABAS_COMPLEMENTARES_TACO, NUTRIENTES_PRINCIPAIS, NUTRIENTES_TACO  # noqa: E402
+from core.usuarios import gerar_hash_senha  # noqa: E402
+
+SENHA_SINTETICA = "senha-benchmark"
+PACIENTES_POR_NUTRICIONISTA = 1_000
+
+
+class Latencia:
+    """Espera de cada chamada: `fixa` segundos + `por_mil_linhas` a cada mil linhas."""
+
+    def __init__(self, fixa=0.0, por_mil_linhas=0.0):
+        self.fixa = fixa
+        self.por_mil_linhas = por_mil_linhas
+
+    def esperar(self, linhas=0):
+        espera = self.fixa + self.por_mil_linhas * linhas / 1000.0
+        if espera > 0:
+            time.sleep(espera)
+
+
+class PlanilhaFalsa:
+    """Imitação mínima de um `gspread.Worksheet`."""
+
+    def __init__(self, df, latencia=None):
+        self.cabecalho = list(df.columns)
+        self.df = df
+        self.novas = []
+        self.latencia = latencia or Latencia()
+        self.celulas_enviadas = 0
+        self.chamadas = 0
+
+    @property
+    def linhas(self):
+        return len(self.df) + len(self.novas)
+
+    @property
+    def col_count(self):
+        return len(self.cabecalho)
+
+    def row_values(self, linha):
+        self.latencia.esperar()
+        return list(self.cabecalho)
+
+    def add_cols(self, n):
+        pass
+
+    def update(self, range_name=None, values=None):
+        self.latencia.esperar()
+        self.cabecalho = list(values[0])
+
+    def append_rows(self, valores, **opcoes):
+        self.latencia.esperar(len(valores))
+        self.celulas_enviadas += sum(len(v) for v in valores)
+        self.chamadas += 1
+        # guardadas com o cabeçalho da hora do envio, que pode crescer depois
+        self.novas.extend(dict(zip(self.cabecalho, v)) for v in valores)
+
+    def dataframe(self):
+        if self.novas:
+            self.df = pd.concat([self.df, pd.DataFrame(self.novas)], ignore_index=True)
+            self.novas = []
+        return self.df
+
+
+class ConexaoFalsa:
+    """Imitação de `GSheetsConnection` (read/update/client) sobre várias `PlanilhaFalsa`."""
+
+    def __init__(self, planilhas, latencia=None, criar_abas=False):
+        self.latencia = latencia or Latencia()
+        self.planilhas = planilhas
+        self.criar_abas = criar_abas
+        for planilha in planilhas.values():
+            planilha.latencia = self.latencia
+        self.client = self
+        self.leituras = 0
+
+    def _select_worksheet(self, worksheet=None):
+        if worksheet not in self.planilhas:
+            if not self.criar_abas:
+                raise WorksheetNotFound(worksheet)
+            self.planilhas[worksheet] = PlanilhaFalsa(pd.DataFrame(), self.latencia)
+        return self.planilhas[worksheet]
+
+    def read(self, worksheet=None):
+        planilha = self._select_worksheet(worksheet)
+        df = planilha.dataframe()
+        self.latencia.esperar(len(df))
+        self.leituras += 1
+        return df.copy()
+
+    def update(self, worksheet=None, data=None):
+        planilha = self._select_worksheet(worksheet)
+        self.latencia.esperar(len(data))
+        planilha.cabecalho = list(data.columns)
+        planilha.df = data
+        planilha.novas = []
+        planilha.celulas_enviadas += data.size
+
+
+def email_sintetico(id_nutricionista):
+    return f"nutri{int(id_nutricionista)}@exemplo.com"
+
+
+def gerar_planilhas(linhas, alimentos=600, semente=0):
+    """Abas sintéticas: `linhas` pacientes e `linhas` consultas, um nutricionista a cada mil pacientes.
+
+    Todos os nutricionistas têm a senha `SENHA_SINTETICA`, já em hash (o
+    mesmo para todos, para não pagar um PBKDF2 por linha ao gerar).
+    """
+    aleatorio = np.random.default_rng(semente)
+    quantidade_nutricionistas = max(1, linhas // PACIENTES_POR_NUTRICIONISTA)
+    ids_nutricionistas = np.arange(1, quantidade_nutricionistas + 1)
+    nutricionistas = pd.DataFrame({
+        "id_nutricionista": ids_nutricionistas,
+        "nome_nutricionista": [f"Nutricionista {i}" for i in ids_nutricionistas],
+        "crn_nutricionista": [f"CRN-{i:05d}" for i in ids_nutricionistas],
+        "email_nutricionista": [email_sintetico(i) for i in ids_nutricionistas],
+        "hash_senha_nutricionista": gerar_hash_senha(SENHA_SINTETICA),
+    })
+
+    ids_pacientes = np.arange(1, linhas + 1)
+    dono = (ids_pacientes - 1) % quantidade_nutricionistas + 1
+    pacientes = pd.DataFrame({
+        "id_paciente": ids_pacientes,
+        "id_nutricionista": dono,
+        "nome_paciente": [f"Paciente {i}" for i in ids_pacientes],
+        "data_nascimento_paciente": "1990-01-01",
+        "sexo_paciente": np.where(ids_pacientes % 2, "Feminino", "Masculino"),
+        "peso_paciente": aleatorio.uniform(50, 110, linhas).round(1),
+        "altura_paciente": aleatorio.uniform(150, 195, linhas).round(0),
+        "objetivo_paciente": "Emagrecimento",
+        "alergias_paciente": "",
+        "data_envio": "2025-01-01T10:00:00",
+    })
+
+    paciente_da_consulta = aleatorio.integers(1, linhas + 1, linhas)
+    dias = aleatorio.integers(0, 365, linhas)
+    datas = pd.Timestamp("2025-01-01") + pd.to_timedelta(dias, unit="D")
+    consultas = pd.DataFrame({
+        "id_consulta": np.arange(1, linhas + 1),
+        "id_paciente": paciente_da_consulta,
+        "id_nutricionista": dono[paciente_da_consulta - 1],
+        "nome_paciente": [f"Paciente {i}" for i in paciente_da_consulta],
+        "data_consulta": datas.strftime("%Y-%m-%d 10:00:00"),
+        "peso_paciente": aleatorio.uniform(50, 110, linhas).round(1),
+        "queixas": "cansaço",
+        "conduta": "ajuste de carboidratos",
+        "orientacoes": "beber água",
+        "data_retorno": (datas + pd.Timedelta(days=30)).strftime("%Y-%m-%d"),
+        "horario_retorno": "14:00",
+    })
+
+    ids_alimentos = np.arange(1, alimentos + 1)
+    taco = pd.DataFrame({
+        "id_alimento": ids_alimentos,
+        "descricao_alimento": [f"Alimento {i}, cozido" for i in ids_alimentos],
+        "classe": [f"Classe {i % 15}" for i in ids_alimentos],
+        **{coluna: aleatorio.uniform(0, 100, alimentos).round(2) for coluna in [*NUTRIENTES_PRINCIPAIS, *NUTRIENTES_TACO]},
+    })
+
+    return {
+        "Nutricionistas": PlanilhaFalsa(nutricionistas),
+        "AnamnesePacientes": PlanilhaFalsa(pacientes),
+        "Consultas": PlanilhaFalsa(consultas),
+        "TACO": PlanilhaFalsa(taco),
+        **{aba: PlanilhaFalsa(pd.DataFrame()) for aba in ABAS_COMPLEMENTARES_TACO},
+    }
@@ -0,0 +1,57 @@
+"""Teste de estresse do alocador de IDs (`SequenciaIds`).
+
+Várias threads em vários processos alocam IDs da mesma sequência, no mesmo
+arquivo SQLite, ao mesmo tempo. Ao final confere que nenhum ID se repetiu.
+
+Uso:
+    python -m benchmarks.stress_ids [processos] [threads] [alocacoes]
+"""
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.database import BackendSQLite, Repositorio  # noqa: E402
+
+
+def alocar(caminho, threads, alocacoes):
+    repo = Repositorio(BackendSQLite(caminho))
+    ids = []
+    trava = threading.Lock()
+
+    def trabalhador():
+        locais = [repo.proximo_id("id_consulta") for _ in range(alocacoes)]
+        with trava:
+            ids.extend(locais)
+
+    grupo = [threading.Thread(target=trabalhador) for _ in range(threads)]
+    for t in grupo:
+        t.start()
+    for t in grupo:
+        t.join()
+    return ids
+
+
+def main(processos=4, threads=8, alocacoes=500):
+    with tempfile.TemporaryDirectory() as diretorio:
+        caminho = os.path.join(diretorio, "stress.db")
+        BackendSQLite(caminho)
+        inicio = time.perf_counter()
+        with multiprocessing.Pool(processos) as pool:
+            resultados = pool.starmap(alocar, [(caminho, threads, alocacoes)] * processos)
+        duracao = time.perf_counter() - inicio
+
+    ids = [i for lote in resultados for i in lote]
+    esperado = processos * threads * alocacoes
+    repetidos = len(ids) - len(set(ids))
+    print(f"{len(ids)} IDs alocados ({esperado} esperados) em {duracao:.2f}s, {repetidos} repetidos")
+    if len(ids) != esperado or repetidos:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:]])
@@ -1,21 +1,29 @@
-def inserir_anamnese_paciente(dict_anamnese):
-    import streamlit as st 
-    import pandas as pd
-    from streamlit_gsheets import GSheetsConnection
+def ler_pacientes(id_nutricionista):
+    """Pacientes de um nutricionista (em cache por nutricionista)."""
+    from core.cache import obter_cache
+    from core.database import obter_repositorio
+    repo = obter_repositorio()
+    return obter_cache().obter(
+        "AnamnesePacientes",
+        int(id_nutricionista),
+        lambda: repo.ler("AnamnesePacientes", id_nutricionista=int(id_nutricionista)),
+    )
 
-    conn = st.connection("gsheets", type=GSheetsConnection)
-    df = conn.read(worksheet="AnamnesePacientes")
 
-    dict_anamnese['id_paciente'] = df['id_paciente'].max() + 1
+def inserir_anamnese_paciente(dict_anamnese):
+    import streamlit as st 
+    from core.cache import obter_cache
+    from core.database import obter_repositorio
 
-    df2 = pd.DataFrame([dict_anamnese])
+    repo = obter_repositorio()
 
-    df = pd.concat([df, df2], ignore_index=True)
+    dict_anamnese['id_paciente'] = repo.proximo_id("id_paciente")
+    dict_anamnese.setdefault('id_nutricionista', st.session_state.get('id_nutricionista'))
 
-    conn.update(worksheet="AnamnesePacientes", data=df)
+    repo.inserir("AnamnesePacientes", dict_anamnese)
     st.success(f"{dict_anamnese['nome_paciente']} - {dict_anamnese['id_paciente']} inserido com sucesso!")
     st.toast(f"✅🧾{dict_anamnese['nome_paciente']} inserido com sucesso! \n ​{dict_anamnese['id_paciente']}")
-    st.cache_data.clear()
+    obter_cache().invalidar_registro("AnamnesePacientes", dict_anamnese)
 
 def copiar_link_streamlit(link, label = "📋 Copiar link"):
     import streamlit as st 
@@ -0,0 +1,104 @@
+"""Índice de busca de alimentos da TACO.
+
+Montado uma vez por processo sobre `descricao_alimento`. A consulta ignora
+acentos e caixa ("feijao" encontra "Feijão"), casa prefixos de palavras
+("arr int coz" encontra "Arroz, integral, cozido") e tolera erros de
+digitação por similaridade de trigramas ("fejao" encontra "Feijão").
+"""
+import re
+import unicodedata
+
+from core.instrumentacao import medir
+
+_SEPARADORES = re.compile(r"[^0-9a-z]+")
+
+
+def normalizar(texto):
+    """Minúsculas, sem acentos e com pontuação trocada por espaço."""
+    texto = unicodedata.normalize("NFKD", str(texto))
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return _SEPARADORES.sub(" ", texto.lower()).strip()
+
+
+def _trigramas(token):
+    token = f"  {token} "
+    return {token[i:i + 3] for i in range(len(token) - 2)}
+
+
+class IndiceBuscaAlimentos:
+    """Índice invertido por prefixo de palavra e por trigrama."""
+
+    def __init__(self, nomes, similaridade_minima=0.35):
+        self.nomes = list(nomes)
+        self.similaridade_minima = similaridade_minima
+        self.linha_por_nome = {nome: i for i, nome in enumerate(self.nomes)}
+        self._normalizados = [normalizar(n) for n in self.nomes]
+        self._tokens = [n.split() for n in self._normalizados]
+
+        # token do vocabulário -> {alimento: posição da primeira ocorrência}
+        self._alimentos_por_token = {}
+        for i, tokens in enumerate(self._tokens):
+            for posicao, token in enumerate(tokens):
+                self._alimentos_por_token.setdefault(token, {}).setdefault(i, posicao)
+        self._vocabulario = list(self._alimentos_por_token)
+
+        self._tokens_por_prefixo = {}
+        self._tokens_por_trigrama = {}
+        self._trigramas_token = []
+        for t, token in enumerate(self._vocabulario):
+            for k in range(1, len(token) + 1):
+                self._tokens_por_prefixo.setdefault(token[:k], []).append(t)
+            trigramas = _trigramas(token)
+            self._trigramas_token.append(trigramas)
+            for trigrama in trigramas:
+                self._tokens_por_trigrama.setdefault(trigrama, []).append(t)
+
+    def _casamentos(self, termo):
+        """Tokens do vocabulário que casam com `termo` -> pontuação (0 a 1.2)."""
+        casamentos = {}
+        for t in self._tokens_por_prefixo.get(termo, ()):
+            casamentos[t] = 1.2 if self._vocabulario[t] == termo else 1.0
+        if casamentos or len(termo) < 3:
+            return casamentos
+        trigramas = _trigramas(termo)
+        contagem = {}
+        for trigrama in trigramas:
+            for t in self._tokens_por_trigrama.get(trigrama, ()):
+                contagem[t] = contagem.get(t, 0) + 1
+        for t, comuns in contagem.items():
+            similaridade = comuns / (len(trigramas) + len(self._trigramas_token[t]) - comuns)
+            if similaridade >= self.similaridade_minima:
+                casamentos[t] = 0.8 * similaridade
+        return casamentos
+
+    @medir("core", funcao="IndiceBuscaAlimentos.buscar")
+    def buscar(self, consulta, limite=20):
+        """Alimentos mais relevantes para `consulta`: lista de (linha, pontuação)."""
+        termos = normalizar(consulta).split()
+        if not termos:
+            return []
+        pontuacao = {}
+        termos_casados = {}
+        for termo in termos:
+            melhor = {}
+            for t, nota in self._casamentos(termo).items():
+                for alimento, posicao in self._alimentos_por_token[self._vocabulario[t]].items():
+                    # palavras do início do nome ("Arroz" em "Arroz, integral") valem mais
+                    nota_posicao = nota + (0.5 if posicao == 0 else 0.0)
+                    if nota_posicao > melhor.get(alimento, 0.0):
+                        melhor[alimento] = nota_posicao
+            for alimento, nota in melhor.items():
+                pontuacao[alimento] = pontuacao.get(alimento, 0.0) + nota
+                termos_casados[alimento] = termos_casados.get(alimento, 0) + 1
+        frase = " ".join(termos)
+        resultados = []
+        for alimento, nota in pontuacao.items():
+            # todos os termos casados vêm antes; nomes mais curtos desempatam
+            if frase in self._normalizados[alimento]:
+                nota += 0.3
+            resultados.append((termos_casados[alimento], nota, -len(self._tokens[alimento]), alimento))
+        resultados.sort(reverse=True)
+        return [(alimento, nota) for _, nota, _, alimento in resultados[:limite]]
+
+    def buscar_nomes(self, consulta, limite=20):
+        return [self.nomes[linha] for linha, _ in self.buscar(consulta, limite)]
@@ -0,0 +1,152 @@
+"""Cache das leituras das páginas, separado por nutricionista (inquilino).
+
+As páginas só mostram dados do nutricionista logado, então cada entrada é
+guardada sob (aba, id_nutricionista): uma escrita de um nutricionista
+invalida só as entradas dele, e o custo de uma leitura acompanha a carteira
+de um nutricionista, não a plataforma inteira. O cache é do processo
+(compartilhado pelas sessões do Streamlit); `ttl` limita o quanto uma
+entrada pode ficar desatualizada em relação a escritas de outros processos.
+
+Cada entrada leva tags das linhas de que foi derivada: `aba:<aba>`,
+`aba:<aba>:<id_nutricionista>` e as que quem lê declarar (por exemplo
+`paciente:<id>` para o relatório de um paciente). Uma escrita invalida só
+as tags da linha que mudou (`invalidar_registro`), e o resto do cache, bem
+como os dados de referência (`core.referencia`), ficam como estão.
+
+Cada leitura recebe uma cópia (`copy.deepcopy`) do valor guardado: quem lê
+pode mexer no DataFrame que recebeu (colunas novas, `fillna`) sem que a
+mudança apareça para as outras sessões.
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+
+def tag_aba(aba, id_nutricionista=None):
+    """Tag das entradas lidas de uma aba (de um nutricionista, ou de todos)."""
+    return f"aba:{aba}" if id_nutricionista is None else f"aba:{aba}:{int(id_nutricionista)}"
+
+
+def tag_paciente(id_paciente):
+    """Tag das entradas derivadas dos dados de um paciente."""
+    return f"paciente:{int(id_paciente)}"
+
+
+def tags_registro(aba, registro):
+    """Tags das entradas que uma escrita desta linha (dict) torna desatualizadas."""
+    tags = []
+    if registro.get("id_nutricionista") is not None:
+        tags.append(tag_aba(aba, registro["id_nutricionista"]))
+    else:
+        # sem dono conhecido: qualquer nutricionista pode ter lido a linha
+        tags.append(tag_aba(aba))
+    if registro.get("id_paciente") is not None:
+        tags.append(tag_paciente(registro["id_paciente"]))
+    return tags
+
+
+class CacheInquilino:
+    """Mapa (aba, id_nutricionista, chave) -> valor, com expiração e tags.
+
+    Guarda até `maximo_entradas`; passando disso, descarta as usadas há mais
+    tempo. `estatisticas()` conta acertos, faltas e descartes.
+    """
+
+    def __init__(self, ttl=60.0, maximo_entradas=1024):
+        self.ttl = ttl
+        self.maximo_entradas = maximo_entradas
+        self._entradas = OrderedDict()
+        self._por_tag = {}
+        # invalidações por tag, só enquanto há cargas dela em andamento (tag -> número de cargas)
+        self._geracoes = {}
+        self._carregando = {}
+        self._contadores = dict.fromkeys(("acertos", "faltas", "expiradas", "invalidadas", "despejadas"), 0)
+        self._trava = threading.Lock()
+
+    def obter(self, aba, id_nutricionista, carregar, chave=None, tags=()):
+        """Valor em cache, ou `carregar()` (guardado para as próximas leituras).
+
+        `chave` separa leituras diferentes da mesma aba e nutricionista, e
+        `tags` junta às da aba as dependências que a entrada tiver.
+        """
+        chave = (aba, id_nutricionista, chave)
+        tags = frozenset((tag_aba(aba), tag_aba(aba, id_nutricionista), *tags))
+        agora = time.monotonic()
+        with self._trava:
+            entrada = self._entradas.get(chave)
+            if entrada is not None:
+                if entrada[0] > agora:
+                    self._entradas.move_to_end(chave)
+                    self._contadores["acertos"] += 1
+                    return copy.deepcopy(entrada[1])
+                self._remover(chave)
+                self._contadores["expiradas"] += 1
+            self._contadores["faltas"] += 1
+            for tag in tags:
+                self._carregando[tag] = self._carregando.get(tag, 0) + 1
+            geracoes = [self._geracoes.get(tag, 0) for tag in sorted(tags)]
+        try:
+            valor = carregar()
+            with self._trava:
+                # uma invalidação durante a carga torna o valor suspeito: não guarda
+                if [self._geracoes.get(tag, 0) for tag in sorted(tags)] == geracoes:
+                    if chave in self._entradas:
+                        self._remover(chave)
+                    self._entradas[chave] = (agora + self.ttl, valor, tags)
+                    for tag in tags:
+                        self._por_tag.setdefault(tag, set()).add(chave)
+                    while len(self._entradas) > self.maximo_entradas:
+                        self._remover(next(iter(self._entradas)))
+                        self._contadores["despejadas"] += 1
+        finally:
+            with self._trava:
+                for tag in tags:
+                    self._carregando[tag] -= 1
+                    if not self._carregando[tag]:
+                        del self._carregando[tag]
+                        self._geracoes.pop(tag, None)
+        return copy.deepcopy(valor)
+
+    def _remover(self, chave):
+        _, _, tags = self._entradas.pop(chave)
+        for tag in tags:
+            chaves = self._por_tag.get(tag)
+            if chaves is not None:
+                chaves.discard(chave)
+                if not chaves:
+                    del self._por_tag[tag]
+
+    def invalidar_tags(self, *tags):
+        """Descarta as entradas com qualquer uma das tags; devolve quantas saíram."""
+        with self._trava:
+            removidas = 0
+            for tag in tags:
+                if tag in self._carregando:
+                    self._geracoes[tag] = self._geracoes.get(tag, 0) + 1
+                for chave in list(self._por_tag.get(tag, ())):
+                    self._remover(chave)
+                    removidas += 1
+            self._contadores["invalidadas"] += removidas
+            return removidas
+
+    def invalidar(self, aba, id_nutricionista=None):
+        """Descarta as entradas de uma aba de um nutricionista (ou de todos, sem `id_nutricionista`)."""
+        return self.invalidar_tags(tag_aba(aba, id_nutricionista))
+
+    def invalidar_registro(self, aba, registro):
+        """Descarta só as entradas derivadas de uma linha recém-escrita na aba."""
+        return self.invalidar_tags(*tags_registro(aba, registro))
+
+    def estatisticas(self):
+        """Contadores desde o início do processo e número de entradas atuais."""
+        with self._trava:
+            return {**self._contadores, "entradas": len(self._entradas), "geracoes": len(self._geracoes)}
+
+
+_cache = CacheInquilino()
+
+
+def obter_cache():
+    """Cache compartilhado pelo processo."""
+    return _cache
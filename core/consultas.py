@@ -1,27 +1,70 @@
-def ler_pacientes_consultas():
-    import streamlit as st 
-    from streamlit_gsheets import GSheetsConnection
-    conn = st.connection("gsheets", type=GSheetsConnection)
-    df_pacientes = conn.read(worksheet="AnamnesePacientes")
-    df_consultas = conn.read(worksheet="Consultas")
-    return df_pacientes, df_consultas
+import threading
+
+_consultas_preenchidas = False
+_trava_preenchimento = threading.Lock()
+
+
+def _preencher_nutricionista_consultas(repo):
+    """Preenche uma vez por processo o id_nutricionista das consultas antigas.
+
+    Consultas registradas antes da coluna existir ficam de fora das leituras
+    por nutricionista; o dono é achado pelo id_paciente (ou pelo nome, nas
+    mais antigas ainda).
+    """
+    global _consultas_preenchidas
+    if _consultas_preenchidas:
+        return
+    with _trava_preenchimento:
+        if _consultas_preenchidas:
+            return
+        antigas = repo.ler("Consultas", id_nutricionista=None)
+        if not antigas.empty:
+            pacientes = repo.ler("AnamnesePacientes").dropna(subset=["id_nutricionista"])
+            por_id = dict(zip(pacientes["id_paciente"], pacientes["id_nutricionista"]))
+            por_nome = dict(zip(pacientes["nome_paciente"], pacientes["id_nutricionista"]))
+            for consulta in antigas.to_dict("records"):
+                id_nutricionista = por_id.get(consulta.get("id_paciente"), por_nome.get(consulta.get("nome_paciente")))
+                if id_nutricionista is not None:
+                    repo.atualizar(
+                        "Consultas", "id_consulta", int(consulta["id_consulta"]),
+                        {"id_nutricionista": int(id_nutricionista)},
+                    )
+        _consultas_preenchidas = True
+
+
+def ler_consultas(id_nutricionista):
+    """Consultas dos pacientes de um nutricionista (em cache por nutricionista)."""
+    from core.cache import obter_cache
+    from core.database import obter_repositorio
+    repo = obter_repositorio()
+
+    def carregar():
+        _preencher_nutricionista_consultas(repo)
+        return repo.ler("Consultas", id_nutricionista=int(id_nutricionista))
+
+    return obter_cache().obter("Consultas", int(id_nutricionista), carregar)
+
+
+def ler_pacientes_consultas(id_nutricionista):
+    """Pacientes e consultas de um único nutricionista."""
+    from core.anamnese import ler_pacientes
+    return ler_pacientes(id_nutricionista), ler_consultas(id_nutricionista)
 
 
 def inserir_consulta(dict_consulta, paciente_escolhido):
     import streamlit as st 
-    import pandas as pd
-    from streamlit_gsheets import GSheetsConnection
-
-    conn = st.connection("gsheets", type=GSheetsConnection)
-    df = conn.read(worksheet="Consultas")
+    from core.database import obter_repositorio
+    from core.relatorio import registrar_consulta
 
-    dict_consulta['id_consulta'] = df['id_consulta'].max() + 1
+    from core.cache import obter_cache
 
-    df2 = pd.DataFrame([dict_consulta])
+    repo = obter_repositorio()
 
-    df = pd.concat([df, df2], ignore_index=True)
+    dict_consulta['id_consulta'] = repo.proximo_id("id_consulta")
+    dict_consulta.setdefault('id_nutricionista', st.session_state.get('id_nutricionista'))
 
-    conn.update(worksheet="Consultas", data=df)
+    repo.inserir("Consultas", dict_consulta)
+    registrar_consulta(repo, dict_consulta)
     st.success(f"Consulta de {paciente_escolhido} registrada com sucesso!")
     st.toast("🩺 Consulta registrada!")
-    st.cache_data.clear()
\ No newline at end of file
+    obter_cache().invalidar_registro("Consultas", dict_consulta)
\ No newline at end of file
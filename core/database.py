@@ -0,0 +1,892 @@
+"""Camada de armazenamento do Nutri-App.
+
+Todas as leituras e escritas das páginas passam pelo `Repositorio`, que guarda
+os dados num SQLite local (modo WAL) com índices nas colunas de busca. O Google
+Sheets continua disponível como destino opcional de sincronização: quando
+configurado em `.streamlit/secrets.toml`, cada escrita local também é enviada
+para a planilha, e as linhas da planilha que o banco ainda não tem são trazidas
+para ele na primeira leitura de cada aba e depois ao fundo, numa leitura feita
+passados `INTERVALO_RECONCILIACAO` segundos da anterior (ver
+`Repositorio.reconciliar`; as recargas dos dados de referência em
+`core.referencia` chamam a reconciliação direto).
+"""
+import contextlib
+import datetime
+import json
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+
+from core.instrumentacao import medir
+
+CAMINHO_BANCO_PADRAO = os.path.join("dados", "nutri.db")
+INTERVALO_RECONCILIACAO = 300
+
+_LOGGER = logging.getLogger(__name__)
+
+# Esquema das tabelas locais. Os nomes seguem as abas da planilha para que a
+# sincronização seja direta; colunas novas enviadas pelas páginas são criadas
+# sob demanda (ver `BackendSQLite._garantir_colunas`).
+TABELAS = {
+    "Nutricionistas": {
+        "colunas": {
+            "id_nutricionista": "INTEGER PRIMARY KEY",
+            "nome_nutricionista": "TEXT",
+            "crn_nutricionista": "TEXT",
+            "email_nutricionista": "TEXT",
+            "senha_nutricionista": "TEXT",
+            "hash_senha_nutricionista": "TEXT",
+            "whatsapp_nutricionista": "TEXT",
+        },
+        "indices": [["email_nutricionista"]],
+    },
+    "AnamnesePacientes": {
+        "colunas": {
+            "id_paciente": "INTEGER PRIMARY KEY",
+            "id_nutricionista": "INTEGER",
+            "nome_paciente": "TEXT",
+            "data_nascimento_paciente": "TEXT",
+            "sexo_paciente": "TEXT",
+            "peso_paciente": "REAL",
+            "altura_paciente": "REAL",
+            "objetivo_paciente": "TEXT",
+            "alergias_paciente": "TEXT",
+            "medicamentos_paciente": "TEXT",
+            "atividade_fisica_paciente": "TEXT",
+            "frequencia_atividade_fisica_paciente": "TEXT",
+            "qtd_refeicoes_paciente": "TEXT",
+            "consumo_agua_pacientes": "REAL",
+            "data_envio": "TEXT",
+        },
+        "indices": [["id_nutricionista"], ["nome_paciente"]],
+    },
+    "Consultas": {
+        "colunas": {
+            "id_consulta": "INTEGER PRIMARY KEY",
+            "id_paciente": "INTEGER",
+            "id_nutricionista": "INTEGER",
+            "nome_paciente": "TEXT",
+            "data_consulta": "TEXT",
+            "peso_paciente": "REAL",
+            "queixas": "TEXT",
+            "conduta": "TEXT",
+            "orientacoes": "TEXT",
+            "data_retorno": "TEXT",
+            "horario_retorno": "TEXT",
+        },
+        "indices": [
+            ["nome_paciente", "data_consulta"],
+            ["id_paciente", "data_consulta"],
+            ["id_nutricionista", "data_consulta"],
+            ["data_retorno"],
+        ],
+    },
+    "LeadsPacientes": {
+        "colunas": {
+            "id_lead": "INTEGER PRIMARY KEY",
+            "nome": "TEXT",
+            "email": "TEXT",
+            "telefone": "TEXT",
+            "objetivo": "TEXT",
+            "info_extra": "TEXT",
+            "id_nutricionista": "INTEGER",
+            "data_envio": "TEXT",
+        },
+        "indices": [["id_nutricionista", "data_envio"]],
+    },
+    # Versões dos planos alimentares: cada linha é um snapshot completo ou só
+    # as alterações desde a versão anterior, no formato binário de
+    # `core.dieta.codificar_registros` (base64). A planilha não tem essa aba:
+    # a tabela fica só no banco local (não é importada nem sincronizada).
+    "PlanosDieta": {
+        "colunas": {
+            "id_versao_plano": "INTEGER PRIMARY KEY",
+            "id_paciente": "INTEGER",
+            "id_nutricionista": "INTEGER",
+            "versao": "INTEGER",
+            "tipo": "TEXT",
+            "itens": "INTEGER",
+            "dados": "TEXT",
+            "criado_em": "TEXT",
+        },
+        "indices": [["id_paciente", "id_nutricionista", "versao"]],
+        "unicos": [["id_paciente", "id_nutricionista", "versao"]],
+        "somente_local": True,
+    },
+    "TACO": {
+        "colunas": {
+            "id_alimento": "INTEGER PRIMARY KEY",
+            "descricao_alimento": "TEXT",
+            "classe": "TEXT",
+            "umidade_pct": "REAL",
+            "kcal": "REAL",
+            "kj": "REAL",
+            "proteina_g": "REAL",
+            "lipideos_g": "REAL",
+            "colesterol_mg": "REAL",
+            "carboidrato_g": "REAL",
+            "fibra_alimentar_g": "REAL",
+            "cinzas_g": "REAL",
+            "calcio_mg": "REAL",
+            "magnesio_mg": "REAL",
+            "manganes_mg": "REAL",
+            "fosforo_mg": "REAL",
+            "ferro_mg": "REAL",
+            "sodio_mg": "REAL",
+            "potassio_mg": "REAL",
+            "cobre_mg": "REAL",
+            "zinco_mg": "REAL",
+            "retinol_mcg": "REAL",
+            "re_mcg": "REAL",
+            "rae_mcg": "REAL",
+            "tiamina_mg": "REAL",
+            "riboflavina_mg": "REAL",
+            "piridoxina_mg": "REAL",
+            "niacina_mg": "REAL",
+            "vitamina_c_mg": "REAL",
+        },
+        "indices": [["descricao_alimento"], ["classe"]],
+    },
+    # Composição em ácidos graxos e aminoácidos (mesmo id_alimento da TACO);
+    # as colunas de nutrientes são criadas na importação.
+    "AGtaco3": {
+        "colunas": {
+            "id_alimento": "INTEGER PRIMARY KEY",
+            "descricao_alimento": "TEXT",
+        },
+        "indices": [],
+    },
+    "AminoácidosTACO3": {
+        "colunas": {
+            "id_alimento": "INTEGER PRIMARY KEY",
+            "descricao_alimento": "TEXT",
+        },
+        "indices": [],
+    },
+}
+
+
+def _valor_sql(valor):
+    """Converte valores vindos dos formulários/planilha para tipos do SQLite."""
+    if valor is None:
+        return None
+    if isinstance(valor, float) and math.isnan(valor):
+        return None
+    if isinstance(valor, (datetime.datetime, datetime.date, datetime.time)):
+        return valor.isoformat()
+    if isinstance(valor, (list, tuple, set, dict)):
+        return str(list(valor) if isinstance(valor, (tuple, set)) else valor)
+    if hasattr(valor, "item"):  # escalares numpy/pandas
+        return _valor_sql(valor.item())
+    if hasattr(valor, "isoformat"):  # pd.Timestamp
+        return valor.isoformat()
+    return valor
+
+
+def _chave_inteira_valida(valor):
+    """Falso para valores de texto numa coluna INTEGER PRIMARY KEY.
+
+    Algumas abas (ex.: AGtaco3) têm linhas de título de grupo com texto no
+    lugar do id; essas linhas não são importadas.
+    """
+    if not isinstance(valor, str):
+        return True
+    try:
+        float(valor)
+    except ValueError:
+        return False
+    return True
+
+
+def _chave_primaria(aba):
+    return next(c for c, t in TABELAS[aba]["colunas"].items() if t == "INTEGER PRIMARY KEY")
+
+
+def _ident(nome):
+    return '"' + str(nome).replace('"', '""') + '"'
+
+
+class BackendArmazenamento:
+    """Interface mínima de um destino de dados (banco local, planilha...)."""
+
+    def ler(self, aba, **filtros):
+        raise NotImplementedError
+
+    def anexar(self, aba, registros):
+        raise NotImplementedError
+
+
+class BackendSQLite(BackendArmazenamento):
+    """Banco SQLite local, uma conexão por thread, em modo WAL."""
+
+    def __init__(self, caminho=CAMINHO_BANCO_PADRAO):
+        self.caminho = caminho
+        self._local = threading.local()
+        self._trava_esquema = threading.Lock()
+        self._colunas = {}
+        if caminho != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(caminho)), exist_ok=True)
+        self._criar_esquema()
+
+    def conexao(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.caminho, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+        return conn
+
+    @contextlib.contextmanager
+    def transacao(self):
+        """Transação explícita (BEGIN IMMEDIATE) na conexão da thread atual."""
+        conn = self.conexao()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def _criar_esquema(self):
+        with self.transacao() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS _importacoes "
+                "(aba TEXT PRIMARY KEY, importado_em TEXT)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS _sequencias "
+                "(nome TEXT PRIMARY KEY, proximo INTEGER NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS _fila_sincronizacao ("
+                "id INTEGER PRIMARY KEY, aba TEXT NOT NULL, registro TEXT NOT NULL, "
+                "tentativas INTEGER NOT NULL DEFAULT 0, proxima_tentativa REAL NOT NULL, "
+                "ultimo_erro TEXT, criado_em TEXT NOT NULL)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_fila_proxima "
+                "ON _fila_sincronizacao (proxima_tentativa, id)"
+            )
+            # Linhas que esgotaram as tentativas de envio (ver `core.sincronizacao`)
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS _fila_descartada ("
+                "id INTEGER PRIMARY KEY, aba TEXT NOT NULL, registro TEXT NOT NULL, "
+                "tentativas INTEGER NOT NULL, ultimo_erro TEXT, criado_em TEXT NOT NULL, descartado_em TEXT NOT NULL)"
+            )
+            # Linhas da planilha com a chave de outra linha da mesma aba (ver `incorporar`)
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS _quarentena_importacao ("
+                "id INTEGER PRIMARY KEY, aba TEXT NOT NULL, chave INTEGER NOT NULL, registro TEXT NOT NULL, "
+                "encontrado_em TEXT NOT NULL, UNIQUE (aba, registro))"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS _agregados "
+                "(chave TEXT PRIMARY KEY, dados TEXT NOT NULL, atualizado_em TEXT NOT NULL)"
+            )
+            for aba, definicao in TABELAS.items():
+                colunas = ", ".join(f"{_ident(c)} {t}" for c, t in definicao["colunas"].items())
+                conn.execute(f"CREATE TABLE IF NOT EXISTS {_ident(aba)} ({colunas})")
+                # Bancos criados por versões anteriores: colunas novas do esquema
+                existentes = {l["name"] for l in conn.execute(f"PRAGMA table_info({_ident(aba)})")}
+                for coluna, tipo in definicao["colunas"].items():
+                    if coluna not in existentes:
+                        conn.execute(f"ALTER TABLE {_ident(aba)} ADD COLUMN {_ident(coluna)} {tipo.replace('PRIMARY KEY', '').strip()}")
+                for colunas_indice in definicao["indices"]:
+                    nome = f"idx_{aba}_{'_'.join(colunas_indice)}"
+                    conn.execute(
+                        f"CREATE INDEX IF NOT EXISTS {_ident(nome)} ON {_ident(aba)} "
+                        f"({', '.join(_ident(c) for c in colunas_indice)})"
+                    )
+                for colunas_indice in definicao.get("unicos", []):
+                    nome = f"uniq_{aba}_{'_'.join(colunas_indice)}"
+                    try:
+                        conn.execute(
+                            f"CREATE UNIQUE INDEX IF NOT EXISTS {_ident(nome)} ON {_ident(aba)} "
+                            f"({', '.join(_ident(c) for c in colunas_indice)})"
+                        )
+                    except sqlite3.IntegrityError:
+                        # Banco antigo que já tem linhas repetidas: o índice fica de fora e
+                        # as gravações novas continuam protegidas por `anexar_versao`
+                        pass
+
+    def colunas(self, aba):
+        if aba not in self._colunas:
+            info = self.conexao().execute(f"PRAGMA table_info({_ident(aba)})").fetchall()
+            self._colunas[aba] = [linha["name"] for linha in info]
+        return self._colunas[aba]
+
+    def _garantir_colunas(self, aba, nomes):
+        faltantes = [n for n in nomes if n not in self.colunas(aba)]
+        if not faltantes:
+            return
+        with self._trava_esquema:
+            self._colunas.pop(aba, None)
+            existentes = self.colunas(aba)
+            for nome in faltantes:
+                if nome not in existentes:
+                    self.conexao().execute(f"ALTER TABLE {_ident(aba)} ADD COLUMN {_ident(nome)}")
+            self._colunas.pop(aba, None)
+
+    def _where(self, filtros):
+        if not filtros:
+            return "", []
+        # filtro com valor None vira "IS NULL" (ex.: linhas antigas sem a coluna preenchida)
+        partes = [f"{_ident(c)} IS NULL" if v is None else f"{_ident(c)} = ?" for c, v in filtros.items()]
+        return " WHERE " + " AND ".join(partes), [_valor_sql(v) for v in filtros.values() if v is not None]
+
+    def ler(self, aba, **filtros):
+        import pandas as pd
+
+        where, params = self._where(filtros)
+        sql = f"SELECT * FROM {_ident(aba)}{where} ORDER BY rowid"
+        return pd.read_sql_query(sql, self.conexao(), params=params)
+
+    def primeiro(self, aba, **filtros):
+        where, params = self._where(filtros)
+        linha = self.conexao().execute(
+            f"SELECT * FROM {_ident(aba)}{where} LIMIT 1", params
+        ).fetchone()
+        return dict(linha) if linha is not None else None
+
+    def atualizar(self, aba, chave, valor_chave, campos):
+        """UPDATE de `campos` na linha em que `chave` = `valor_chave`."""
+        self._garantir_colunas(aba, list(campos))
+        atribuicoes = ", ".join(f"{_ident(c)} = ?" for c in campos)
+        params = [_valor_sql(v) for v in campos.values()] + [_valor_sql(valor_chave)]
+        with self.transacao() as conn:
+            conn.execute(f"UPDATE {_ident(aba)} SET {atribuicoes} WHERE {_ident(chave)} = ?", params)
+
+    def contar(self, aba):
+        return self.conexao().execute(f"SELECT COUNT(*) FROM {_ident(aba)}").fetchone()[0]
+
+    def anexar(self, aba, registros, substituir=False, enfileirar=False):
+        """Insere `registros` em `aba`.
+
+        Com `enfileirar=True`, os mesmos registros entram na fila de
+        sincronização na mesma transação: ou ambos são gravados, ou nenhum.
+        """
+        registros = list(registros)
+        if not registros:
+            return
+        with self.transacao() as conn:
+            self._inserir(conn, aba, registros, substituir, enfileirar)
+
+    def anexar_versao(self, aba, coluna_versao, grupo, montar, enfileirar=False):
+        """Insere o registro da próxima versão de `grupo` (filtros) numa única transação.
+
+        `montar(ultima)` recebe a maior `coluna_versao` já gravada no grupo (0
+        se nenhuma) e devolve o registro a inserir. Como a leitura e a inserção
+        acontecem dentro do mesmo `BEGIN IMMEDIATE`, duas sessões salvando ao
+        mesmo tempo nunca gravam a mesma versão. Retorna o registro inserido.
+        """
+        where, params = self._where(grupo)
+        with self.transacao() as conn:
+            ultima = conn.execute(
+                f"SELECT MAX({_ident(coluna_versao)}) FROM {_ident(aba)}{where}", params
+            ).fetchone()[0]
+            registro = montar(int(ultima or 0))
+            self._inserir(conn, aba, [registro], False, enfileirar)
+        return registro
+
+    def _inserir(self, conn, aba, registros, substituir, enfileirar):
+        nomes = []
+        for registro in registros:
+            nomes.extend(c for c in registro if c not in nomes)
+        if any(n not in self.colunas(aba) for n in nomes):
+            # Já com a trava de escrita do banco: confere de novo e cria as colunas que faltam
+            existentes = {l["name"] for l in conn.execute(f"PRAGMA table_info({_ident(aba)})")}
+            for nome in nomes:
+                if nome not in existentes:
+                    conn.execute(f"ALTER TABLE {_ident(aba)} ADD COLUMN {_ident(nome)}")
+            self._colunas.pop(aba, None)
+        verbo = "INSERT OR REPLACE" if substituir else "INSERT"
+        sql = (
+            f"{verbo} INTO {_ident(aba)} ({', '.join(_ident(c) for c in nomes)}) "
+            f"VALUES ({', '.join('?' for _ in nomes)})"
+        )
+        linhas = [[_valor_sql(r.get(c)) for c in nomes] for r in registros]
+        conn.executemany(sql, linhas)
+        if enfileirar:
+            agora = time.time()
+            criado_em = datetime.datetime.now().isoformat()
+            conn.executemany(
+                "INSERT INTO _fila_sincronizacao (aba, registro, proxima_tentativa, criado_em) "
+                "VALUES (?, ?, ?, ?)",
+                [
+                    [aba, json.dumps({c: v for c, v in zip(nomes, linha)}, ensure_ascii=False), agora, criado_em]
+                    for linha in linhas
+                ],
+            )
+
+    def pendentes(self, limite=500):
+        """Itens da fila prontos para envio, na ordem de chegada."""
+        linhas = self.conexao().execute(
+            "SELECT id, aba, registro, tentativas FROM _fila_sincronizacao "
+            "WHERE proxima_tentativa <= ? ORDER BY id LIMIT ?",
+            [time.time(), limite],
+        ).fetchall()
+        return [
+            {"id": l["id"], "aba": l["aba"], "registro": json.loads(l["registro"]), "tentativas": l["tentativas"]}
+            for l in linhas
+        ]
+
+    def tamanho_fila(self):
+        return self.conexao().execute("SELECT COUNT(*) FROM _fila_sincronizacao").fetchone()[0]
+
+    def confirmar_envio(self, ids):
+        with self.transacao() as conn:
+            conn.executemany("DELETE FROM _fila_sincronizacao WHERE id = ?", [[i] for i in ids])
+
+    def adiar_envio(self, ids, espera, erro):
+        with self.transacao() as conn:
+            conn.executemany(
+                "UPDATE _fila_sincronizacao SET tentativas = tentativas + 1, "
+                "proxima_tentativa = ?, ultimo_erro = ? WHERE id = ?",
+                [[time.time() + espera, erro, i] for i in ids],
+            )
+
+    def descartar_envio(self, ids, erro):
+        """Move itens da fila para `_fila_descartada` (desistência após muitas falhas)."""
+        with self.transacao() as conn:
+            conn.executemany(
+                "INSERT INTO _fila_descartada "
+                "SELECT id, aba, registro, tentativas + 1, ?, criado_em, ? FROM _fila_sincronizacao WHERE id = ?",
+                [[erro, datetime.datetime.now().isoformat(), i] for i in ids],
+            )
+            conn.executemany("DELETE FROM _fila_sincronizacao WHERE id = ?", [[i] for i in ids])
+
+    def descartados(self):
+        """Itens descartados da fila de sincronização, do mais recente ao mais antigo."""
+        import pandas as pd
+
+        return pd.read_sql_query(
+            "SELECT id, aba, registro, tentativas, ultimo_erro, criado_em, descartado_em "
+            "FROM _fila_descartada ORDER BY descartado_em DESC, id DESC",
+            self.conexao(),
+        )
+
+    def reenfileirar_descartados(self):
+        """Devolve os itens descartados à fila, com as tentativas zeradas; retorna quantos."""
+        with self.transacao() as conn:
+            quantidade = conn.execute(
+                "INSERT INTO _fila_sincronizacao (aba, registro, proxima_tentativa, criado_em) "
+                "SELECT aba, registro, ?, criado_em FROM _fila_descartada ORDER BY id",
+                [time.time()],
+            ).rowcount
+            conn.execute("DELETE FROM _fila_descartada")
+        return quantidade
+
+    def agregado(self, chave):
+        """Agregado pré-calculado (JSON) guardado sob `chave`, ou None."""
+        linha = self.conexao().execute(
+            "SELECT dados FROM _agregados WHERE chave = ?", [chave]
+        ).fetchone()
+        return json.loads(linha["dados"]) if linha is not None else None
+
+    def atualizar_agregado(self, chave, funcao, criar=True):
+        """Aplica `funcao(atual)` ao agregado de `chave` numa única transação.
+
+        Com `criar=False`, chaves ainda sem agregado ficam como estão (e
+        `funcao` não é chamada). Se `funcao` devolver None, nada é gravado.
+        Retorna o agregado gravado, ou None.
+        """
+        with self.transacao() as conn:
+            linha = conn.execute("SELECT dados FROM _agregados WHERE chave = ?", [chave]).fetchone()
+            if linha is None and not criar:
+                return None
+            dados = funcao(json.loads(linha["dados"]) if linha is not None else None)
+            if dados is None:
+                return None
+            conn.execute(
+                "INSERT OR REPLACE INTO _agregados VALUES (?, ?, ?)",
+                [chave, json.dumps(dados, ensure_ascii=False), datetime.datetime.now().isoformat()],
+            )
+        return dados
+
+    def incorporar(self, aba, chave, registros):
+        """Insere os registros cuja `chave` ainda não existe na tabela; devolve quantos entraram.
+
+        Linhas que já existem ficam como estão, e registros sem chave recebem
+        uma do SQLite. Com a chave repetida entre os próprios registros (IDs
+        repetidos na planilha), o primeiro entra e os outros vão para
+        `_quarentena_importacao`, sem sobrescrever nem sumir (ver `quarentena`).
+        """
+        with self.transacao() as conn:
+            existentes = {l[0] for l in conn.execute(f"SELECT {_ident(chave)} FROM {_ident(aba)}")}
+            novos, repetidos, vistos = [], [], set()
+            for registro in registros:
+                if _valor_sql(registro.get(chave)) is None:
+                    novos.append({c: v for c, v in registro.items() if c != chave})
+                    continue
+                valor = int(float(registro[chave]))
+                if valor in vistos:
+                    repetidos.append((valor, registro))
+                    continue
+                vistos.add(valor)
+                if valor not in existentes:
+                    novos.append({**registro, chave: valor})
+            if novos:
+                self._inserir(conn, aba, novos, substituir=False, enfileirar=False)
+            antes = conn.total_changes
+            agora = datetime.datetime.now().isoformat()
+            conn.executemany(
+                "INSERT OR IGNORE INTO _quarentena_importacao (aba, chave, registro, encontrado_em) VALUES (?, ?, ?, ?)",
+                [
+                    [aba, valor, json.dumps({c: _valor_sql(v) for c, v in registro.items()}, ensure_ascii=False, sort_keys=True), agora]
+                    for valor, registro in repetidos
+                ],
+            )
+            quarentena = conn.total_changes - antes
+        if quarentena:
+            _LOGGER.warning(
+                "%d linha(s) da aba %s com %s repetido foram para a quarentena: %s",
+                quarentena, aba, chave, sorted({valor for valor, _ in repetidos}),
+            )
+        return len(novos)
+
+    def quarentena(self):
+        """Linhas da planilha que não foram importadas por repetirem a chave de outra (DataFrame)."""
+        import pandas as pd
+
+        linhas = self.conexao().execute(
+            "SELECT aba, chave, registro, encontrado_em FROM _quarentena_importacao ORDER BY id"
+        ).fetchall()
+        return pd.DataFrame([dict(l) for l in linhas], columns=["aba", "chave", "registro", "encontrado_em"])
+
+    def importado(self, aba):
+        linha = self.conexao().execute(
+            "SELECT 1 FROM _importacoes WHERE aba = ?", [aba]
+        ).fetchone()
+        return linha is not None
+
+    def marcar_importado(self, aba):
+        with self.transacao() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO _importacoes VALUES (?, ?)",
+                [aba, datetime.datetime.now().isoformat()],
+            )
+
+
+class BackendGSheets(BackendArmazenamento):
+    """Planilha do Google Sheets acessada via `st.connection("gsheets")`.
+
+    As inserções usam `append_rows` do gspread: só as linhas novas são
+    enviadas, sem reler nem reescrever o conteúdo existente da aba.
+    """
+
+    def __init__(self, fabrica_conexao):
+        self._fabrica_conexao = fabrica_conexao
+        self._cabecalhos = {}
+
+    def conexao(self):
+        return self._fabrica_conexao()
+
+    def ler(self, aba, **filtros):
+        with medir("planilha", operacao="read", aba=aba) as medicao:
+            df = self.conexao().read(worksheet=aba)
+            medicao.linhas = len(df)
+        df = df.dropna(how="all")
+        for coluna, valor in filtros.items():
+            df = df[df[coluna].isna()] if valor is None else df[df[coluna] == valor]
+        return df
+
+    def _planilha(self, aba):
+        # Requer autenticação por Service Account; o cliente de planilha
+        # pública não permite escrita.
+        return self.conexao().client._select_worksheet(worksheet=aba)
+
+    def _cabecalho(self, planilha, aba, nomes):
+        """Cabeçalho da aba (lido uma vez), estendido com colunas novas."""
+        cabecalho = self._cabecalhos.get(aba)
+        if cabecalho is None:
+            cabecalho = planilha.row_values(1)
+        novas = [n for n in nomes if n not in cabecalho]
+        if novas:
+            cabecalho = cabecalho + novas
+            if planilha.col_count < len(cabecalho):
+                planilha.add_cols(len(cabecalho) - planilha.col_count)
+            planilha.update(range_name="A1", values=[cabecalho])
+        self._cabecalhos[aba] = cabecalho
+        return cabecalho
+
+    def anexar(self, aba, registros):
+        registros = list(registros)
+        if not registros:
+            return
+        nomes = []
+        for registro in registros:
+            nomes.extend(c for c in registro if c not in nomes)
+        planilha = self._planilha(aba)
+        cabecalho = self._cabecalho(planilha, aba, nomes)
+        linhas = []
+        for registro in registros:
+            linha = [_valor_sql(registro.get(c)) for c in cabecalho]
+            linhas.append(["" if v is None else v for v in linha])
+        with medir("planilha", operacao="append_rows", aba=aba) as medicao:
+            medicao.linhas = len(linhas)
+            # RAW: o texto vai como está. USER_ENTERED interpretaria "=..." de um
+            # formulário público como fórmula e mexeria em blobs base64 ("+...")
+            planilha.append_rows(
+                linhas,
+                value_input_option="RAW",
+                insert_data_option="INSERT_ROWS",
+                table_range="A1",
+            )
+
+
+# Sequências de IDs: nome -> (aba, coluna onde o ID é gravado)
+SEQUENCIAS = {
+    "id_paciente": ("AnamnesePacientes", "id_paciente"),
+    "id_consulta": ("Consultas", "id_consulta"),
+    "id_versao_plano": ("PlanosDieta", "id_versao_plano"),
+}
+
+
+class SequenciaIds:
+    """Alocador central de IDs, seguro entre threads e entre processos.
+
+    O contador de cada sequência fica na tabela `_sequencias` e só avança
+    dentro de uma transação `BEGIN IMMEDIATE`, então dois processos nunca
+    reservam o mesmo intervalo. Cada processo reserva blocos de
+    `tamanho_bloco` IDs e os entrega da memória sob uma trava, sem tocar no
+    banco a cada alocação. Um bloco só é usado depois de gravado, logo uma
+    queda do processo pode deixar lacunas, mas nunca repetir IDs; ao reservar,
+    o contador também nunca fica abaixo de `MAX(coluna) + 1` da tabela.
+    """
+
+    def __init__(self, local, tamanho_bloco=10):
+        self.local = local
+        self.tamanho_bloco = tamanho_bloco
+        self._blocos = {}
+        self._trava = threading.Lock()
+
+    def _reservar_bloco(self, nome, quantidade):
+        aba, coluna = SEQUENCIAS[nome]
+        with self.local.transacao() as conn:
+            linha = conn.execute(
+                "SELECT proximo FROM _sequencias WHERE nome = ?", [nome]
+            ).fetchone()
+            maximo = conn.execute(
+                f"SELECT MAX({_ident(coluna)}) FROM {_ident(aba)}"
+            ).fetchone()[0]
+            inicio = max(linha[0] if linha else 1, int(maximo or 0) + 1)
+            conn.execute(
+                "INSERT OR REPLACE INTO _sequencias VALUES (?, ?)",
+                [nome, inicio + quantidade],
+            )
+        return inicio, inicio + quantidade
+
+    def proximo(self, nome):
+        with self._trava:
+            proximo, limite = self._blocos.get(nome, (0, 0))
+            if proximo >= limite:
+                proximo, limite = self._reservar_bloco(nome, self.tamanho_bloco)
+            self._blocos[nome] = (proximo + 1, limite)
+            return proximo
+
+
+class Repositorio:
+    """Ponto único de acesso aos dados usado por `core/*` e pelas páginas.
+
+    As consultas são sempre respondidas pelo banco local. Se houver um backend
+    de sincronização, as inserções entram numa fila persistente e são enviadas
+    para ele em lotes por `core.sincronizacao.Sincronizador`, sem bloquear a
+    página; as tabelas ainda não importadas são copiadas dele na primeira
+    leitura.
+    """
+
+    def __init__(self, local, sincronizacao=None, intervalo_reconciliacao=INTERVALO_RECONCILIACAO):
+        from core.sincronizacao import Sincronizador
+
+        self.local = local
+        self.sincronizacao = sincronizacao
+        self.intervalo_reconciliacao = intervalo_reconciliacao
+        self.sequencias = SequenciaIds(local)
+        self.sincronizador = Sincronizador(local, sincronizacao) if sincronizacao is not None else None
+        self.erro_reconciliacao = None
+        self._trava_importacao = threading.Lock()
+        self._reconciliado_em = {}
+        self._reconciliacoes = {}
+
+    def _sincronizada(self, aba):
+        return self.sincronizacao is not None and not TABELAS.get(aba, {}).get("somente_local", False)
+
+    def _importar_se_necessario(self, aba):
+        if not self._sincronizada(aba):
+            return
+        if self.local.importado(aba):
+            self._reconciliar_em_segundo_plano(aba)
+            return
+        with self._trava_importacao:
+            if not self.local.importado(aba):
+                self._reconciliar(aba)
+
+    def _reconciliar_em_segundo_plano(self, aba):
+        """Reconciliação ao fundo, se a última foi há mais de `intervalo_reconciliacao` segundos."""
+        ultima = self._reconciliado_em.get(aba)
+        if self.intervalo_reconciliacao is None or (
+            ultima is not None and time.monotonic() - ultima < self.intervalo_reconciliacao
+        ):
+            return
+        with self._trava_importacao:
+            thread = self._reconciliacoes.get(aba)
+            if thread is not None and thread.is_alive():
+                return
+            # conta como feita já ao começar: uma planilha fora do ar não é relida a cada leitura
+            self._reconciliado_em[aba] = time.monotonic()
+            thread = threading.Thread(target=self._reconciliar_com_registro, args=(aba,), name=f"reconciliacao-{aba}", daemon=True)
+            self._reconciliacoes[aba] = thread
+            thread.start()
+
+    def _reconciliar_com_registro(self, aba):
+        try:
+            self.reconciliar(aba)
+        except Exception as erro:
+            self.erro_reconciliacao = f"{aba}: {erro}"
+            _LOGGER.exception("Erro ao reconciliar a aba %s com a planilha", aba)
+
+    def reconciliar(self, aba):
+        """Traz da planilha as linhas novas da aba (ex.: um nutricionista incluído direto nela).
+
+        Compara pela chave primária: linhas que o banco já tem ficam como estão,
+        porque as escritas do app saem do banco para a planilha. Devolve quantas
+        linhas entraram.
+        """
+        if not self._sincronizada(aba):
+            return 0
+        with self._trava_importacao:
+            return self._reconciliar(aba)
+
+    def _registros_planilha(self, aba):
+        """Linhas da aba na planilha, sem colunas sem nome nem linhas de título no lugar do id."""
+        df = self.sincronizacao.ler(aba)
+        registros = df.to_dict("records") if df is not None else []
+        registros = [{c: v for c, v in r.items() if not str(c).startswith("Unnamed")} for r in registros]
+        chave = _chave_primaria(aba)
+        return [r for r in registros if _chave_inteira_valida(r.get(chave))]
+
+    def ler_origem(self, aba):
+        """Aba como está na planilha agora, sem passar pelo banco local (sem planilha, do banco).
+
+        Para dados de referência que podem ser editados na planilha (ex.: a
+        TACO), que `reconciliar` não traz por só incluir linhas novas.
+        """
+        import pandas as pd
+
+        if not self._sincronizada(aba):
+            return self.ler(aba)
+        with medir("leitura", aba=aba) as medicao:
+            df = pd.DataFrame(self._registros_planilha(aba))
+            medicao.linhas = len(df)
+        return df
+
+    def _reconciliar(self, aba):
+        with medir("escrita", aba=aba) as medicao:
+            chave = _chave_primaria(aba)
+            registros = self._registros_planilha(aba)
+            if self.local.importado(aba):
+                # linhas sem id (anteriores às sequências) só entram na primeira importação
+                registros = [r for r in registros if _valor_sql(r.get(chave)) is not None]
+            novas = self.local.incorporar(aba, chave, registros)
+            self.local.marcar_importado(aba)
+            self._reconciliado_em[aba] = time.monotonic()
+            medicao.linhas = novas
+        if novas:
+            from core.cache import obter_cache, tag_aba
+
+            obter_cache().invalidar_tags(tag_aba(aba))
+        return novas
+
+    def ler(self, aba, **filtros):
+        with medir("leitura", aba=aba) as medicao:
+            self._importar_se_necessario(aba)
+            df = self.local.ler(aba, **filtros)
+            medicao.linhas = len(df)
+        return df
+
+    def primeiro(self, aba, **filtros):
+        with medir("leitura", aba=aba) as medicao:
+            self._importar_se_necessario(aba)
+            linha = self.local.primeiro(aba, **filtros)
+            medicao.linhas = int(linha is not None)
+        return linha
+
+    def proximo_id(self, nome):
+        """Próximo valor da sequência `nome` (ver `SEQUENCIAS`)."""
+        with medir("escrita", aba="_sequencias"):
+            self._importar_se_necessario(SEQUENCIAS[nome][0])
+            return self.sequencias.proximo(nome)
+
+    def atualizar(self, aba, chave, valor_chave, campos):
+        """Atualização só local (não é enviada ao destino de sincronização)."""
+        with medir("escrita", aba=aba) as medicao:
+            self._importar_se_necessario(aba)
+            self.local.atualizar(aba, chave, valor_chave, campos)
+            medicao.linhas = 1
+
+    def agregado(self, chave):
+        """Agregados são derivados dos dados e ficam só no banco local."""
+        with medir("leitura", aba="_agregados") as medicao:
+            agregado = self.local.agregado(chave)
+            medicao.linhas = int(agregado is not None)
+        return agregado
+
+    def atualizar_agregado(self, chave, funcao, criar=True):
+        with medir("escrita", aba="_agregados") as medicao:
+            medicao.linhas = 1
+            return self.local.atualizar_agregado(chave, funcao, criar)
+
+    def inserir(self, aba, registro):
+        sincronizar = self._sincronizada(aba)
+        with medir("escrita", aba=aba) as medicao:
+            self._importar_se_necessario(aba)
+            self.local.anexar(aba, [registro], enfileirar=sincronizar)
+            medicao.linhas = 1
+        if sincronizar:
+            self.sincronizador.notificar()
+
+    def inserir_versao(self, aba, coluna_versao, grupo, montar):
+        """Insere a próxima versão de `grupo` (ver `BackendSQLite.anexar_versao`); devolve o registro."""
+        sincronizar = self._sincronizada(aba)
+        with medir("escrita", aba=aba) as medicao:
+            self._importar_se_necessario(aba)
+            registro = self.local.anexar_versao(aba, coluna_versao, grupo, montar, enfileirar=sincronizar)
+            medicao.linhas = 1
+        if sincronizar:
+            self.sincronizador.notificar()
+        return registro
+
+
+def _backend_gsheets_configurado():
+    """Retorna o backend do Google Sheets se houver credenciais, senão None."""
+    try:
+        import streamlit as st
+        from streamlit_gsheets import GSheetsConnection
+
+        if "gsheets" not in st.secrets.get("connections", {}):
+            return None
+    except Exception:
+        return None
+    return BackendGSheets(lambda: st.connection("gsheets", type=GSheetsConnection))
+
+
+_repositorio = None
+_trava_repositorio = threading.Lock()
+
+
+def obter_repositorio():
+    """Repositório compartilhado pelo processo (todas as sessões do Streamlit)."""
+    global _repositorio
+    if _repositorio is None:
+        with _trava_repositorio:
+            if _repositorio is None:
+                caminho = os.environ.get("NUTRI_DB_PATH", CAMINHO_BANCO_PADRAO)
+                _repositorio = Repositorio(BackendSQLite(caminho), _backend_gsheets_configurado())
+    return _repositorio
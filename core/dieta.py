@@ -0,0 +1,647 @@
+"""Motor de cálculo da prescrição de dieta.
+
+A Tabela TACO fica numa matriz NumPy contígua (alimentos × nutrientes, valores
+por 100 g, float32) com um índice `id_alimento` -> linha. A matriz cobre o
+perfil completo: macronutrientes, minerais, vitaminas, ácidos graxos (AGtaco3)
+e aminoácidos (AminoácidosTACO3). O plano do paciente guarda só arrays de
+(refeição, linha da TACO, gramas) e acumula os totais de todos os nutrientes
+por refeição a cada alteração; o produto matricial completo fica para
+conferência.
+
+A matriz vem do snapshot gerado por `tratar_taco.py` em `dados/taco/`, aberto
+com memory-map (todas as sessões e processos dividem as mesmas páginas do
+arquivo); sem snapshot, é montada a partir das abas do repositório.
+"""
+import base64
+import datetime
+import json
+import os
+import struct
+
+import numpy as np
+
+from core.instrumentacao import medir
+
+REFEICOES = [
+    "Café da Manhã",
+    "Lanche da Manhã",
+    "Almoço",
+    "Lanche da Tarde",
+    "Jantar",
+    "Ceia",
+]
+
+# Colunas da TACO usadas no resumo da dieta -> rótulo exibido nas páginas
+NUTRIENTES_PRINCIPAIS = {
+    "kcal": "Energia (kcal)",
+    "proteina_g": "Proteínas (g)",
+    "lipideos_g": "Lipídeos (g)",
+    "carboidrato_g": "Carboidratos (g)",
+    "fibra_alimentar_g": "Fibra Alimentar (g)",
+}
+
+
+# Demais colunas da TACO somáveis (umidade_pct é percentual e fica de fora)
+NUTRIENTES_TACO = {
+    "kj": "Energia (kJ)",
+    "colesterol_mg": "Colesterol (mg)",
+    "cinzas_g": "Cinzas (g)",
+    "calcio_mg": "Cálcio (mg)",
+    "magnesio_mg": "Magnésio (mg)",
+    "manganes_mg": "Manganês (mg)",
+    "fosforo_mg": "Fósforo (mg)",
+    "ferro_mg": "Ferro (mg)",
+    "sodio_mg": "Sódio (mg)",
+    "potassio_mg": "Potássio (mg)",
+    "cobre_mg": "Cobre (mg)",
+    "zinco_mg": "Zinco (mg)",
+    "retinol_mcg": "Retinol (mcg)",
+    "re_mcg": "RE (mcg)",
+    "rae_mcg": "RAE (mcg)",
+    "tiamina_mg": "Tiamina (mg)",
+    "riboflavina_mg": "Riboflavina (mg)",
+    "piridoxina_mg": "Piridoxina (mg)",
+    "niacina_mg": "Niacina (mg)",
+    "vitamina_c_mg": "Vitamina C (mg)",
+}
+
+AMINOACIDOS = {
+    "aa_tripofano_g": "Triptofano (g)",
+    "aa_treonina_g": "Treonina (g)",
+    "aa_isoleucina_g": "Isoleucina (g)",
+    "aa_leucina_g": "Leucina (g)",
+    "aa_lisina_g": "Lisina (g)",
+    "aa_metionina_g": "Metionina (g)",
+    "aa_cistina_g": "Cistina (g)",
+    "aa_fenilalanina_g": "Fenilalanina (g)",
+    "aa_tirosina_g": "Tirosina (g)",
+    "aa_valina_g": "Valina (g)",
+    "aa_arginina_g": "Arginina (g)",
+    "aa_histidina_g": "Histidina (g)",
+    "aa_alanina_g": "Alanina (g)",
+    "aa_acido_aspartico_g": "Ácido aspártico (g)",
+    "aa_acido_glutamico_g": "Ácido glutâmico (g)",
+    "aa_glicina_g": "Glicina (g)",
+    "aa_prolina_g": "Prolina (g)",
+    "aa_serina_g": "Serina (g)",
+}
+
+ABAS_COMPLEMENTARES_TACO = ["AGtaco3", "AminoácidosTACO3"]
+
+DIRETORIO_SNAPSHOT_TACO = os.path.join("dados", "taco")
+
+# Formato binário de um item do plano salvo: 11 bytes, sem nomes nem nutrientes
+FORMATO_ITEM = np.dtype([
+    ("id_item", "<u4"),
+    ("id_alimento", "<u2"),
+    ("refeicao", "u1"),
+    ("gramas", "<f4"),
+])
+# Cabeçalho: marca, versão do formato, tipo (completo/alterações), nº de itens e de removidos
+_CABECALHO_PLANO = struct.Struct("<2sBBII")
+_MARCA_PLANO = b"PD"
+_VERSAO_FORMATO_PLANO = 1
+# Depois de tantas versões só com alterações, a próxima é gravada completa
+SNAPSHOT_PLANO_A_CADA = 20
+
+
+def rotulo_nutriente(coluna):
+    """Rótulo de exibição de uma coluna de nutriente ("ag_18_2_n-6_g" -> "AG 18:2 n-6 (g)")."""
+    for rotulos in (NUTRIENTES_PRINCIPAIS, NUTRIENTES_TACO, AMINOACIDOS):
+        if coluna in rotulos:
+            return rotulos[coluna]
+    if coluna.startswith("ag_"):
+        partes = coluna[3:].rsplit("_", 1)[0].split("_")
+        if partes[0].isdigit():
+            nome = ":".join(partes[:2]) + (" " + " ".join(partes[2:]) if partes[2:] else "")
+        else:
+            nome = " ".join(partes)
+        return f"AG {nome} (g)"
+    return coluna
+
+
+def grupo_nutriente(coluna):
+    if coluna in NUTRIENTES_PRINCIPAIS or coluna in ("kj", "colesterol_mg", "cinzas_g"):
+        return "Macronutrientes"
+    if coluna.startswith("ag_"):
+        return "Ácidos graxos"
+    if coluna.startswith("aa_"):
+        return "Aminoácidos"
+    if coluna.endswith("_mcg") or coluna in ("tiamina_mg", "riboflavina_mg", "piridoxina_mg", "niacina_mg", "vitamina_c_mg"):
+        return "Vitaminas"
+    return "Minerais"
+
+
+def nutrientes_disponiveis(colunas):
+    """Colunas de nutrientes somáveis presentes em `colunas`, principais primeiro."""
+    colunas = list(colunas)
+    extras = [
+        c for c in colunas
+        if c in NUTRIENTES_TACO or c in AMINOACIDOS or (c.startswith("ag_") and c.endswith("_g"))
+    ]
+    return list(NUTRIENTES_PRINCIPAIS) + [c for c in extras if c not in NUTRIENTES_PRINCIPAIS]
+
+
+def carregar_taco_completa(repositorio, da_origem=False):
+    """TACO unida às abas de ácidos graxos e aminoácidos (como em `tratar_taco.py`).
+
+    Com `da_origem`, lê as abas direto da planilha (`Repositorio.ler_origem`).
+    """
+    ler = repositorio.ler_origem if da_origem else repositorio.ler
+    df = ler("TACO")
+    for aba in ABAS_COMPLEMENTARES_TACO:
+        complemento = ler(aba)
+        if complemento.empty:
+            continue
+        complemento = complemento.drop(columns=["descricao_alimento"], errors="ignore")
+        df = df.merge(complemento, on="id_alimento", how="left")
+    return df
+
+
+@medir("core", funcao="carregar_matriz_taco")
+def carregar_matriz_taco(repositorio=None, diretorio=DIRETORIO_SNAPSHOT_TACO, da_origem=False):
+    """Matriz TACO do snapshot local; sem snapshot, montada a partir do repositório.
+
+    `da_origem` vale para a montagem sem snapshot (ver `carregar_taco_completa`).
+    """
+    if os.path.exists(os.path.join(diretorio, "manifesto.json")):
+        return MatrizTACO.de_snapshot(diretorio)
+    if repositorio is None:
+        from core.database import obter_repositorio
+
+        repositorio = obter_repositorio()
+    df = carregar_taco_completa(repositorio, da_origem)
+    if "descricao_alimento" not in df.columns:
+        return None
+    return MatrizTACO.de_dataframe(df)
+
+
+def _para_numero(serie):
+    """Converte uma coluna da TACO para float ("Tr", "NA", "*" e vazios viram 0)."""
+    import pandas as pd
+
+    return pd.to_numeric(serie, errors="coerce").fillna(0.0).to_numpy(dtype=np.float64)
+
+
+class MatrizTACO:
+    """TACO como matriz contígua (alimentos × nutrientes), valores por 100 g."""
+
+    def __init__(self, ids, nomes, nutrientes, valores, classes=None):
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.nomes = list(nomes)
+        self.classes = list(classes) if classes is not None else [""] * len(self.nomes)
+        self.nutrientes = list(nutrientes)
+        self.valores = np.ascontiguousarray(valores, dtype=np.float32)
+        self.versao = None
+        self.linha_por_id = {int(i): n for n, i in enumerate(self.ids)}
+        self.linha_por_nome = {nome: n for n, nome in enumerate(self.nomes)}
+        self.coluna_por_nutriente = {c: n for n, c in enumerate(self.nutrientes)}
+        self.colunas_ausentes = []
+
+    @classmethod
+    def de_dataframe(cls, df, nutrientes=None):
+        """Monta a matriz a partir da TACO (colunas ausentes viram zeros).
+
+        Sem `nutrientes`, usa todas as colunas somáveis presentes em `df`.
+        """
+        df = df.dropna(subset=["id_alimento", "descricao_alimento"])
+        if nutrientes is None:
+            nutrientes = nutrientes_disponiveis(df.columns)
+        valores = np.zeros((len(df), len(nutrientes)), dtype=np.float32)
+        ausentes = []
+        for j, coluna in enumerate(nutrientes):
+            if coluna in df.columns:
+                valores[:, j] = _para_numero(df[coluna])
+            else:
+                ausentes.append(coluna)
+        matriz = cls(
+            df["id_alimento"].astype(int).to_numpy(),
+            df["descricao_alimento"].astype(str).str.strip().tolist(),
+            nutrientes,
+            valores,
+            df["classe"].fillna("").astype(str).tolist() if "classe" in df.columns else None,
+        )
+        matriz.colunas_ausentes = ausentes
+        return matriz
+
+    @classmethod
+    def de_snapshot(cls, diretorio=DIRETORIO_SNAPSHOT_TACO):
+        """Abre a versão atual do snapshot de `tratar_taco.py` (matriz em memory-map)."""
+        with open(os.path.join(diretorio, "manifesto.json"), encoding="utf-8") as arquivo:
+            manifesto = json.load(arquivo)
+        pasta = os.path.join(diretorio, manifesto["versao"])
+        with open(os.path.join(pasta, "alimentos.json"), encoding="utf-8") as arquivo:
+            alimentos = json.load(arquivo)
+        matriz = cls(
+            np.load(os.path.join(pasta, "ids.npy")),
+            alimentos["nomes"],
+            alimentos["nutrientes"],
+            np.load(os.path.join(pasta, "nutrientes.npy"), mmap_mode="r"),
+            alimentos["classes"],
+        )
+        matriz.versao = manifesto["versao"]
+        return matriz
+
+    def __len__(self):
+        return len(self.ids)
+
+    def coluna(self, nutriente):
+        return self.coluna_por_nutriente[nutriente]
+
+    def por_100g(self, linha):
+        """Vetor de nutrientes (por 100 g) de uma linha da matriz."""
+        return self.valores[linha]
+
+
+class PlanoDieta:
+    """Plano alimentar de um paciente.
+
+    Cada item é uma tripla (refeição, linha da TACO, gramas) guardada em
+    arrays paralelos, com um id estável (`id_itens`) que não muda quando
+    outros itens saem do plano. Os totais por refeição são acumulados a cada
+    alteração (soma ou subtrai `gramas × M[linha] / 100`), então ler os totais
+    não custa nada por rerun. `recalcular_totais` refaz a conta inteira
+    (`G @ M / 100`) e `verificar_totais` compara as duas; com `verificar=True`
+    (ou `NUTRI_VERIFICAR_TOTAIS=1`) a comparação roda a cada alteração.
+    """
+
+    def __init__(self, matriz, verificar=None):
+        self.matriz = matriz
+        if verificar is None:
+            verificar = os.environ.get("NUTRI_VERIFICAR_TOTAIS") == "1"
+        self.verificar = verificar
+        self.id_itens = np.zeros(0, dtype=np.int64)
+        self.refeicoes = np.zeros(0, dtype=np.int8)
+        self.linhas = np.zeros(0, dtype=np.int32)
+        self.gramas = np.zeros(0, dtype=np.float64)
+        self._proximo_id = 1
+        self._totais = np.zeros((len(REFEICOES), len(matriz.nutrientes)), dtype=np.float64)
+        # Paciente e versão salva de onde o plano veio (ver `salvar_plano`)
+        self.id_paciente = None
+        self.id_nutricionista = None
+        self.versao = None
+        self._salvo = np.zeros(0, dtype=FORMATO_ITEM)
+        self.alimentos_ausentes = []
+
+    def __len__(self):
+        return len(self.linhas)
+
+    def _posicao(self, id_item):
+        posicoes = np.flatnonzero(self.id_itens == int(id_item))
+        if not len(posicoes):
+            raise KeyError(f"Item {id_item} não está no plano.")
+        return int(posicoes[0])
+
+    def _acumular(self, refeicao, linha, gramas):
+        self._totais[refeicao] += gramas * self.matriz.valores[linha].astype(np.float64) / 100.0
+        if self.verificar:
+            self.verificar_totais(levantar=True)
+
+    def adicionar(self, refeicao, id_alimento, gramas):
+        """Inclui um alimento no plano e devolve o id do item."""
+        codigo = REFEICOES.index(refeicao)
+        linha = self.matriz.linha_por_id[int(id_alimento)]
+        id_item = self._proximo_id
+        self._proximo_id += 1
+        self.id_itens = np.append(self.id_itens, np.int64(id_item))
+        self.refeicoes = np.append(self.refeicoes, np.int8(codigo))
+        self.linhas = np.append(self.linhas, np.int32(linha))
+        self.gramas = np.append(self.gramas, float(gramas))
+        self._acumular(codigo, linha, float(gramas))
+        return id_item
+
+    def adicionar_varios(self, itens):
+        """Inclui vários (refeição, id_alimento, gramas) de uma vez; devolve os ids.
+
+        Os totais são atualizados por um único produto matricial do lote.
+        """
+        itens = list(itens)
+        if not itens:
+            return []
+        codigos = np.array([REFEICOES.index(r) for r, _, _ in itens], dtype=np.int8)
+        linhas = np.array([self.matriz.linha_por_id[int(i)] for _, i, _ in itens], dtype=np.int32)
+        gramas = np.array([float(g) for _, _, g in itens], dtype=np.float64)
+        ids = np.arange(self._proximo_id, self._proximo_id + len(itens), dtype=np.int64)
+        self._proximo_id += len(itens)
+        self.id_itens = np.concatenate([self.id_itens, ids])
+        self.refeicoes = np.concatenate([self.refeicoes, codigos])
+        self.linhas = np.concatenate([self.linhas, linhas])
+        self.gramas = np.concatenate([self.gramas, gramas])
+        g = np.zeros((len(REFEICOES), len(itens)), dtype=np.float64)
+        g[codigos, np.arange(len(itens))] = gramas
+        self._totais += g @ self.matriz.valores[linhas].astype(np.float64) / 100.0
+        if self.verificar:
+            self.verificar_totais(levantar=True)
+        return ids.tolist()
+
+    def remover(self, id_item):
+        posicao = self._posicao(id_item)
+        codigo, linha, gramas = int(self.refeicoes[posicao]), int(self.linhas[posicao]), float(self.gramas[posicao])
+        self.id_itens = np.delete(self.id_itens, posicao)
+        self.refeicoes = np.delete(self.refeicoes, posicao)
+        self.linhas = np.delete(self.linhas, posicao)
+        self.gramas = np.delete(self.gramas, posicao)
+        if not np.any(self.refeicoes == codigo):
+            # refeição vazia: zera em vez de deixar o resíduo de arredondamento
+            self._totais[codigo] = 0.0
+            if self.verificar:
+                self.verificar_totais(levantar=True)
+        else:
+            self._acumular(codigo, linha, -gramas)
+
+    def alterar_gramas(self, id_item, gramas):
+        posicao = self._posicao(id_item)
+        diferenca = float(gramas) - float(self.gramas[posicao])
+        self.gramas[posicao] = float(gramas)
+        self._acumular(int(self.refeicoes[posicao]), int(self.linhas[posicao]), diferenca)
+
+    def editar_refeicao(self, refeicao, id_itens, gramas):
+        """Aplica de uma vez as edições da tabela de uma refeição; devolve se algo mudou.
+
+        `id_itens` são os itens que ficam na refeição, na ordem desejada (os
+        que faltarem são removidos), e `gramas` a quantidade de cada um. Os
+        totais da refeição são refeitos uma única vez, no fim. Se a ordem
+        mudou, os itens da refeição ganham ids novos nessa ordem, porque o
+        plano salvo guarda os itens pela ordem dos ids.
+        """
+        codigo = REFEICOES.index(refeicao)
+        posicoes = np.flatnonzero(self.refeicoes == codigo)
+        posicao_por_id = dict(zip(self.id_itens[posicoes].tolist(), posicoes.tolist()))
+        id_itens = [int(i) for i in id_itens]
+        desconhecidos = [i for i in id_itens if i not in posicao_por_id]
+        if desconhecidos or len(set(id_itens)) != len(id_itens):
+            raise KeyError(f"Itens {desconhecidos or id_itens} inválidos para {refeicao}.")
+        novas = np.array([posicao_por_id[i] for i in id_itens], dtype=np.intp)
+        gramas = np.asarray(gramas, dtype=np.float64)
+        reordenou = bool(np.any(np.diff(novas) < 0))
+        if not reordenou and len(novas) == len(posicoes) and np.array_equal(self.gramas[novas], gramas):
+            return False
+
+        self.gramas[novas] = gramas
+        # a refeição vai para o fim dos arrays, já na nova ordem e sem os removidos
+        indice = np.concatenate([np.flatnonzero(self.refeicoes != codigo), novas])
+        self.id_itens = self.id_itens[indice]
+        self.refeicoes = self.refeicoes[indice]
+        self.linhas = self.linhas[indice]
+        self.gramas = self.gramas[indice]
+        inicio = len(self) - len(novas)
+        if reordenou:
+            self.id_itens[inicio:] = np.arange(self._proximo_id, self._proximo_id + len(novas), dtype=np.int64)
+            self._proximo_id += len(novas)
+        self._totais[codigo] = self.gramas[inicio:] @ self.matriz.valores[self.linhas[inicio:]].astype(np.float64) / 100.0
+        if self.verificar:
+            self.verificar_totais(levantar=True)
+        return True
+
+    def linha(self, id_item):
+        """Linha da TACO do alimento de um item."""
+        return int(self.linhas[self._posicao(id_item)])
+
+    def substituir(self, id_item, id_alimento, gramas):
+        """Troca o alimento de um item, mantendo o id e a refeição."""
+        posicao = self._posicao(id_item)
+        codigo = int(self.refeicoes[posicao])
+        linha_nova = self.matriz.linha_por_id[int(id_alimento)]
+        self._totais[codigo] -= self.gramas[posicao] * self.matriz.valores[self.linhas[posicao]].astype(np.float64) / 100.0
+        self.linhas[posicao] = linha_nova
+        self.gramas[posicao] = float(gramas)
+        self._acumular(codigo, linha_nova, float(gramas))
+
+    def limpar(self):
+        """Remove todos os itens (mantém o paciente e a versão salva)."""
+        self.id_itens = np.zeros(0, dtype=np.int64)
+        self.refeicoes = np.zeros(0, dtype=np.int8)
+        self.linhas = np.zeros(0, dtype=np.int32)
+        self.gramas = np.zeros(0, dtype=np.float64)
+        self._totais[:] = 0.0
+
+    def registros(self):
+        """Itens do plano no formato `FORMATO_ITEM`, ordenados pelo id do item."""
+        registros = np.zeros(len(self), dtype=FORMATO_ITEM)
+        registros["id_item"] = self.id_itens
+        registros["id_alimento"] = self.matriz.ids[self.linhas]
+        registros["refeicao"] = self.refeicoes
+        registros["gramas"] = self.gramas
+        return np.sort(registros, order="id_item")
+
+    def alteracoes(self):
+        """Itens novos ou alterados e ids removidos desde a última versão salva."""
+        atuais = self.registros()
+        salvos = self._salvo
+        posicoes = np.searchsorted(salvos["id_item"], atuais["id_item"])
+        encontrados = posicoes < len(salvos)
+        encontrados[encontrados] = salvos["id_item"][posicoes[encontrados]] == atuais["id_item"][encontrados]
+        alterados = ~encontrados
+        alterados[encontrados] = salvos[posicoes[encontrados]] != atuais[encontrados]
+        removidos = np.setdiff1d(salvos["id_item"], atuais["id_item"])
+        return atuais[alterados], removidos
+
+    def marcar_salvo(self, versao):
+        self.versao = versao
+        self._salvo = self.registros()
+
+    @classmethod
+    def de_registros(cls, matriz, registros, verificar=None):
+        """Plano a partir de registros salvos; alimentos fora da TACO atual são ignorados."""
+        plano = cls(matriz, verificar)
+        conhecidos = np.array([int(i) in matriz.linha_por_id for i in registros["id_alimento"]], dtype=bool)
+        plano.alimentos_ausentes = registros["id_alimento"][~conhecidos].tolist()
+        registros = registros[conhecidos]
+        plano.id_itens = registros["id_item"].astype(np.int64)
+        plano.refeicoes = registros["refeicao"].astype(np.int8)
+        plano.linhas = np.array([matriz.linha_por_id[int(i)] for i in registros["id_alimento"]], dtype=np.int32)
+        plano.gramas = registros["gramas"].astype(np.float64)
+        plano._proximo_id = int(plano.id_itens.max()) + 1 if len(plano.id_itens) else 1
+        g = np.zeros((len(REFEICOES), len(plano)), dtype=np.float64)
+        g[plano.refeicoes, np.arange(len(plano))] = plano.gramas
+        plano._totais = g @ matriz.valores[plano.linhas].astype(np.float64) / 100.0
+        return plano
+
+    def itens(self, refeicao):
+        """Itens de uma refeição: (id do item, nome, gramas, nutrientes)."""
+        codigo = REFEICOES.index(refeicao)
+        posicoes = np.flatnonzero(self.refeicoes == codigo)
+        nutrientes = self.gramas[posicoes, None] * self.matriz.valores[self.linhas[posicoes]] / 100.0
+        return [
+            (int(self.id_itens[p]), self.matriz.nomes[self.linhas[p]], float(self.gramas[p]), nutrientes[k])
+            for k, p in enumerate(posicoes)
+        ]
+
+    def tabela_refeicao(self, refeicao, nutrientes):
+        """DataFrame dos itens de uma refeição (índice `id_item`): alimento, gramas e os `nutrientes`."""
+        import pandas as pd
+
+        posicoes = np.flatnonzero(self.refeicoes == REFEICOES.index(refeicao))
+        colunas = [self.matriz.coluna(n) for n in nutrientes]
+        linhas = self.linhas[posicoes]
+        valores = self.gramas[posicoes, None] * self.matriz.valores[linhas[:, None], colunas] / 100.0
+        tabela = pd.DataFrame(valores, columns=list(nutrientes), index=pd.Index(self.id_itens[posicoes], name="id_item"))
+        tabela.insert(0, "gramas", self.gramas[posicoes])
+        tabela.insert(0, "alimento", [self.matriz.nomes[l] for l in linhas])
+        return tabela
+
+    def gramas_por_refeicao(self):
+        """Matriz refeições × alimentos com as gramas de cada alimento."""
+        g = np.zeros((len(REFEICOES), len(self.matriz)), dtype=np.float32)
+        np.add.at(g, (self.refeicoes, self.linhas), self.gramas)
+        return g
+
+    def recalcular_totais(self):
+        """Totais refeições × nutrientes refeitos do zero (`G @ M / 100`)."""
+        return self.gramas_por_refeicao() @ self.matriz.valores / 100.0
+
+    def verificar_totais(self, levantar=False, tolerancia=1e-3):
+        """Confere os totais acumulados contra `recalcular_totais`."""
+        esperado = self.recalcular_totais()
+        ok = np.allclose(self._totais, esperado, rtol=tolerancia, atol=tolerancia)
+        if not ok and levantar:
+            diferenca = float(np.abs(self._totais - esperado).max())
+            raise AssertionError(f"Totais acumulados divergem do recálculo (diferença máxima {diferenca:.6f}).")
+        return ok
+
+    def totais_por_refeicao(self):
+        """Matriz refeições × nutrientes com o total de cada refeição."""
+        return self._totais
+
+    def totais_dia(self):
+        return self._totais.sum(axis=0)
+
+    def perfil_completo(self, totais_por_refeicao=None):
+        """DataFrame nutriente × (refeições, total do dia), agrupado por tipo de nutriente."""
+        import pandas as pd
+
+        if totais_por_refeicao is None:
+            totais_por_refeicao = self.totais_por_refeicao()
+        nutrientes = self.matriz.nutrientes
+        perfil = pd.DataFrame(totais_por_refeicao.T, columns=REFEICOES)
+        perfil["Total do Dia"] = totais_por_refeicao.sum(axis=0)
+        perfil.insert(0, "Nutriente", [rotulo_nutriente(c) for c in nutrientes])
+        perfil.insert(0, "Grupo", [grupo_nutriente(c) for c in nutrientes])
+        return perfil
+
+
+def codificar_registros(registros, removidos=(), completo=True):
+    """Serializa itens (e ids removidos) do plano em texto base64 compacto."""
+    registros = np.asarray(registros, dtype=FORMATO_ITEM)
+    removidos = np.asarray(removidos, dtype="<u4")
+    cabecalho = _CABECALHO_PLANO.pack(
+        _MARCA_PLANO, _VERSAO_FORMATO_PLANO, 0 if completo else 1, len(registros), len(removidos)
+    )
+    return base64.b64encode(cabecalho + registros.tobytes() + removidos.tobytes()).decode("ascii")
+
+
+def decodificar_registros(texto):
+    """Inverso de `codificar_registros`: (completo, registros, removidos)."""
+    dados = base64.b64decode(texto)
+    marca, versao, tipo, n_registros, n_removidos = _CABECALHO_PLANO.unpack_from(dados)
+    if marca != _MARCA_PLANO or versao != _VERSAO_FORMATO_PLANO:
+        raise ValueError("Formato de plano alimentar desconhecido.")
+    inicio = _CABECALHO_PLANO.size
+    registros = np.frombuffer(dados, dtype=FORMATO_ITEM, count=n_registros, offset=inicio)
+    removidos = np.frombuffer(dados, dtype="<u4", count=n_removidos, offset=inicio + n_registros * FORMATO_ITEM.itemsize)
+    return tipo == 0, registros, removidos
+
+
+def versoes_plano(repositorio, id_paciente, id_nutricionista):
+    """Histórico de versões do plano de um paciente, da mais antiga à mais nova."""
+    df = repositorio.ler("PlanosDieta", id_paciente=int(id_paciente), id_nutricionista=int(id_nutricionista))
+    return df.sort_values("versao").reset_index(drop=True)
+
+
+def estados_versoes(linhas):
+    """Registros do plano depois de cada versão, na ordem das `linhas` (campo `dados`)."""
+    itens = {}
+    for dados in linhas:
+        completo, registros, removidos = decodificar_registros(dados)
+        if completo:
+            itens = {}
+        for registro in registros:
+            itens[int(registro["id_item"])] = registro
+        for id_item in removidos:
+            itens.pop(int(id_item), None)
+        yield np.array([itens[i] for i in sorted(itens)], dtype=FORMATO_ITEM)
+
+
+def _aplicar_versoes(linhas):
+    """Reconstrói os registros a partir das linhas desde o último snapshot."""
+    registros = np.zeros(0, dtype=FORMATO_ITEM)
+    for registros in estados_versoes(linhas):
+        pass
+    return registros
+
+
+@medir("core", funcao="carregar_plano")
+def carregar_plano(repositorio, matriz, id_paciente, id_nutricionista, versao=None):
+    """Plano salvo do paciente (a última versão, ou `versao`); None se não houver."""
+    historico = versoes_plano(repositorio, id_paciente, id_nutricionista)
+    if versao is not None:
+        historico = historico[historico["versao"] <= int(versao)]
+    if historico.empty:
+        return None
+    snapshots = np.flatnonzero(historico["tipo"].to_numpy() == "completo")
+    inicio = int(snapshots[-1]) if len(snapshots) else 0
+    plano = PlanoDieta.de_registros(matriz, _aplicar_versoes(historico["dados"].iloc[inicio:]))
+    plano.id_paciente = int(id_paciente)
+    plano.id_nutricionista = int(id_nutricionista)
+    plano.marcar_salvo(int(historico["versao"].iloc[-1]))
+    return plano
+
+
+@medir("core", funcao="salvar_plano")
+def salvar_plano(repositorio, plano, id_paciente=None, id_nutricionista=None):
+    """Grava uma nova versão do plano; devolve o número da versão (None se nada mudou).
+
+    Só os itens novos, alterados e removidos desde a versão de origem são
+    gravados, a não ser que o plano não venha da última versão salva (aí a
+    diferença não valeria para ela) ou que a cadeia de alterações desde o
+    último snapshot passe de `SNAPSHOT_PLANO_A_CADA`.
+    """
+    id_paciente = int(id_paciente if id_paciente is not None else plano.id_paciente)
+    id_nutricionista = int(id_nutricionista if id_nutricionista is not None else plano.id_nutricionista)
+    historico = versoes_plano(repositorio, id_paciente, id_nutricionista)
+    ultima = int(historico["versao"].iloc[-1]) if not historico.empty else 0
+    tipos = historico["tipo"].tolist()
+    desde_snapshot = len(tipos) - 1 - max((i for i, t in enumerate(tipos) if t == "completo"), default=-1)
+
+    mesmo_plano = (plano.id_paciente, plano.id_nutricionista) == (id_paciente, id_nutricionista)
+    alterados, removidos = plano.alteracoes() if mesmo_plano else (plano.registros(), [])
+    if mesmo_plano and plano.versao == ultima and ultima and not len(alterados) and not len(removidos):
+        return None
+
+    id_versao_plano = repositorio.proximo_id("id_versao_plano")
+    criado_em = datetime.datetime.now().isoformat(timespec="seconds")
+
+    def montar(ultima_gravada):
+        # Versão e tipo decididos dentro da transação de gravação: se outra
+        # sessão salvou depois da leitura acima, este plano não vem mais da
+        # última versão e vai completo, como a versão seguinte à dela
+        completo = (
+            not mesmo_plano
+            or plano.versao != ultima_gravada
+            or not ultima_gravada
+            or desde_snapshot >= SNAPSHOT_PLANO_A_CADA
+            or len(alterados) + len(removidos) >= len(plano)
+        )
+        registros = plano.registros() if completo else alterados
+        return {
+            "id_versao_plano": id_versao_plano,
+            "id_paciente": id_paciente,
+            "id_nutricionista": id_nutricionista,
+            "versao": ultima_gravada + 1,
+            "tipo": "completo" if completo else "alteracoes",
+            "itens": len(registros) + (0 if completo else len(removidos)),
+            "dados": codificar_registros(registros, () if completo else removidos, completo),
+            "criado_em": criado_em,
+        }
+
+    versao = repositorio.inserir_versao(
+        "PlanosDieta", "versao", {"id_paciente": id_paciente, "id_nutricionista": id_nutricionista}, montar
+    )["versao"]
+    plano.id_paciente = id_paciente
+    plano.id_nutricionista = id_nutricionista
+    plano.marcar_salvo(versao)
+
+    from core.relatorio import registrar_plano
+
+    registrar_plano(repositorio, plano, versao, criado_em)
+    return versao
@@ -0,0 +1,247 @@
+"""Busca por palavras-chave no TACO.pdf (metodologia, notas de rodapé e tabelas).
+
+O PDF é quebrado em trechos de cada página, e cada trecho vira um vetor.
+O índice é gravado numa versão em `dados/documentos/<versão>/`:
+
+    indice.faiss   vetores dos trechos (IndexFlatIP; produto interno = cosseno)
+    trechos.json   página e texto de cada trecho
+    idf.npy        peso de cada posição do vetor, aplicado também às consultas
+
+`dados/documentos/manifesto.json` aponta para a versão atual e guarda o
+sha256 do PDF. O índice é refeito só quando o PDF muda (ver
+`indexar_documentos.py`), e o app abre o FAISS em memory-map. Ficam só a
+versão atual e a anterior (`VERSOES_MANTIDAS`). O índice não vai para o git:
+é refeito do PDF na primeira busca.
+
+Não é busca semântica: os vetores são contagens de palavras e trigramas de
+caracteres, espalhadas por hashing e ponderadas por IDF (um TF-IDF), sem
+modelo nem rede. Sinônimos não se encontram ("gordura" não acha "lipídeos"),
+mas os trigramas aguentam as palavras que o PyPDF2 parte ao meio ("recurs
+os") e variações como plural.
+"""
+import datetime
+import hashlib
+import json
+import math
+import os
+import shutil
+import threading
+import zlib
+from collections import Counter
+
+import numpy as np
+
+from core.busca_alimentos import normalizar
+from core.instrumentacao import medir
+
+DIRETORIO_INDICE_DOCUMENTOS = os.path.join("dados", "documentos")
+PDF_TACO = "TACO.pdf"
+
+DIMENSAO = 1024
+PESO_TRIGRAMAS = 0.5
+# Trechos de até ~TAMANHO_TRECHO caracteres, repetindo ~SOBREPOSICAO do trecho anterior
+TAMANHO_TRECHO = 500
+SOBREPOSICAO = 120
+# Trechos com menos palavras que isso (linhas só de números das tabelas) ficam fora do índice
+MINIMO_PALAVRAS = 5
+# A versão atual e a anterior (que uma sessão aberta antes da troca ainda pode estar lendo)
+VERSOES_MANTIDAS = 2
+
+STOPWORDS = {
+    "a", "ao", "aos", "as", "com", "da", "das", "de", "do", "dos", "e", "em", "na", "nas", "no", "nos",
+    "o", "os", "ou", "para", "pela", "pelo", "por", "que", "se", "um", "uma",
+}
+
+_trava_construcao = threading.Lock()
+
+
+def sha256_arquivo(caminho):
+    h = hashlib.sha256()
+    with open(caminho, "rb") as arquivo:
+        for bloco in iter(lambda: arquivo.read(1 << 20), b""):
+            h.update(bloco)
+    return h.hexdigest()
+
+
+def _palavras(texto):
+    # números e "tr"/"na" das tabelas de composição não dizem nada do assunto do trecho
+    return [p for p in normalizar(texto).split() if p not in STOPWORDS and sum(c.isalpha() for c in p) >= 3]
+
+
+def _atributos(texto):
+    """Palavras (sem stopwords nem números) e trigramas de caracteres de cada palavra, com peso."""
+    pesos = Counter()
+    for palavra in _palavras(texto):
+        pesos[palavra] += 1.0
+        marcada = f" {palavra} "
+        for i in range(len(marcada) - 2):
+            pesos["#" + marcada[i:i + 3]] += PESO_TRIGRAMAS
+    return pesos
+
+
+def _hashing(textos):
+    """Vetores de contagem (len(textos) × DIMENSAO) por hashing com sinal.
+
+    Usa crc32, que não muda entre processos (o `hash` do Python muda), para
+    que consultas e índice caiam nas mesmas posições.
+    """
+    vetores = np.zeros((len(textos), DIMENSAO), dtype=np.float32)
+    for n, texto in enumerate(textos):
+        for atributo, peso in _atributos(texto).items():
+            codigo = zlib.crc32(atributo.encode("utf-8"))
+            sinal = 1.0 if codigo & 0x80000000 else -1.0
+            vetores[n, codigo % DIMENSAO] += sinal * (1.0 + math.log(peso))
+    return vetores
+
+
+def calcular_idf(vetores):
+    """Peso de cada posição do vetor: raro nos trechos pesa mais (IDF suavizado)."""
+    frequencia = np.count_nonzero(vetores, axis=0)
+    return (np.log((1.0 + len(vetores)) / (1.0 + frequencia)) + 1.0).astype(np.float32)
+
+
+def vetorizar(textos, idf=None):
+    """Vetores normalizados (len(textos) × DIMENSAO, float32), ponderados por `idf`."""
+    vetores = _hashing(textos)
+    if idf is not None:
+        vetores *= idf
+    normas = np.linalg.norm(vetores, axis=1, keepdims=True)
+    normas[normas == 0] = 1.0
+    return vetores / normas
+
+
+def extrair_trechos(caminho_pdf):
+    """Trechos do PDF com texto: lista de {"pagina", "texto"}, sem atravessar páginas."""
+    from PyPDF2 import PdfReader
+
+    trechos = []
+    for numero, pagina in enumerate(PdfReader(caminho_pdf).pages, start=1):
+        linhas = [" ".join(linha.split()) for linha in (pagina.extract_text() or "").splitlines()]
+        linhas = [linha for linha in linhas if linha]
+        atual, novas = [], 0
+        for linha in linhas:
+            atual.append(linha)
+            novas += 1
+            if sum(len(l) + 1 for l in atual) >= TAMANHO_TRECHO:
+                trechos.append({"pagina": numero, "texto": "\n".join(atual)})
+                repetidas = []
+                while len(atual) > 1 and sum(len(l) + 1 for l in repetidas) + len(atual[-1]) <= SOBREPOSICAO:
+                    repetidas.insert(0, atual.pop())
+                atual, novas = repetidas, 0
+        if novas:
+            trechos.append({"pagina": numero, "texto": "\n".join(atual)})
+    return [t for t in trechos if len(_palavras(t["texto"])) >= MINIMO_PALAVRAS]
+
+
+def construir_indice(caminho_pdf=PDF_TACO, destino=DIRETORIO_INDICE_DOCUMENTOS, sha_pdf=None):
+    """Indexa o PDF numa versão nova e troca o manifesto; devolve o manifesto."""
+    import faiss
+
+    sha_pdf = sha_pdf or sha256_arquivo(caminho_pdf)
+    trechos = extrair_trechos(caminho_pdf)
+    indice = faiss.IndexFlatIP(DIMENSAO)
+    idf = np.ones(DIMENSAO, dtype=np.float32)
+    if trechos:
+        idf = calcular_idf(_hashing([t["texto"] for t in trechos]))
+        indice.add(vetorizar([t["texto"] for t in trechos], idf))
+
+    versao = f"{datetime.datetime.now():%Y%m%d%H%M%S}-{sha_pdf[:8]}"
+    pasta = os.path.join(destino, versao)
+    os.makedirs(pasta)
+    faiss.write_index(indice, os.path.join(pasta, "indice.faiss"))
+    np.save(os.path.join(pasta, "idf.npy"), idf)
+    with open(os.path.join(pasta, "trechos.json"), "w", encoding="utf-8") as arquivo:
+        json.dump(trechos, arquivo, ensure_ascii=False)
+
+    manifesto = {
+        "versao": versao,
+        "criado_em": datetime.datetime.now().isoformat(timespec="seconds"),
+        "origem": os.path.basename(caminho_pdf),
+        "sha256_origem": sha_pdf,
+        "trechos": len(trechos),
+        "dimensao": DIMENSAO,
+    }
+    temporario = os.path.join(destino, "manifesto.json.tmp")
+    with open(temporario, "w", encoding="utf-8") as arquivo:
+        json.dump(manifesto, arquivo, ensure_ascii=False, indent=2)
+    os.replace(temporario, os.path.join(destino, "manifesto.json"))
+    remover_versoes_antigas(destino, versao)
+    return manifesto
+
+
+def remover_versoes_antigas(destino, atual, manter=VERSOES_MANTIDAS):
+    """Apaga as pastas de versão em `destino` além da `atual` e das `manter - 1` mais novas."""
+    # os nomes começam pelo instante da criação: a ordem alfabética é a cronológica
+    versoes = sorted(
+        (nome for nome in os.listdir(destino) if nome != atual and os.path.isdir(os.path.join(destino, nome))),
+        reverse=True,
+    )
+    for nome in versoes[max(manter - 1, 0):]:
+        shutil.rmtree(os.path.join(destino, nome), ignore_errors=True)
+
+
+def _manifesto(destino):
+    caminho = os.path.join(destino, "manifesto.json")
+    if not os.path.exists(caminho):
+        return None
+    with open(caminho, encoding="utf-8") as arquivo:
+        return json.load(arquivo)
+
+
+def indice_atualizado(caminho_pdf=PDF_TACO, destino=DIRETORIO_INDICE_DOCUMENTOS, sha_pdf=None):
+    """True se o índice em `destino` foi feito a partir deste mesmo PDF."""
+    manifesto = _manifesto(destino)
+    if manifesto is None or manifesto.get("dimensao") != DIMENSAO:
+        return False
+    return manifesto.get("sha256_origem") == (sha_pdf or sha256_arquivo(caminho_pdf))
+
+
+class IndiceDocumentos:
+    """Índice FAISS dos trechos do PDF, aberto em memory-map."""
+
+    def __init__(self, indice, trechos, idf=None, versao=None):
+        self.indice = indice
+        self.trechos = trechos
+        self.idf = idf
+        self.versao = versao
+
+    @classmethod
+    def de_diretorio(cls, destino=DIRETORIO_INDICE_DOCUMENTOS):
+        import faiss
+
+        manifesto = _manifesto(destino)
+        pasta = os.path.join(destino, manifesto["versao"])
+        # os vetores ficam no arquivo: processos e sessões dividem as mesmas páginas
+        modo = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+        indice = faiss.read_index(os.path.join(pasta, "indice.faiss"), modo)
+        with open(os.path.join(pasta, "trechos.json"), encoding="utf-8") as arquivo:
+            trechos = json.load(arquivo)
+        return cls(indice, trechos, np.load(os.path.join(pasta, "idf.npy")), manifesto["versao"])
+
+    def __len__(self):
+        return len(self.trechos)
+
+    @medir("core", funcao="IndiceDocumentos.buscar")
+    def buscar(self, consulta, limite=5):
+        """Os `limite` trechos mais parecidos com a consulta: lista de (trecho, pontuação)."""
+        if not str(consulta).strip() or not self.trechos:
+            return []
+        pontuacoes, posicoes = self.indice.search(vetorizar([consulta], self.idf), min(limite, len(self.trechos)))
+        return [
+            (self.trechos[p], float(s))
+            for p, s in zip(posicoes[0], pontuacoes[0])
+            if p >= 0 and s > 0
+        ]
+
+
+def carregar_indice_documentos(caminho_pdf=PDF_TACO, destino=DIRETORIO_INDICE_DOCUMENTOS):
+    """Índice do PDF; (re)construído antes, se não existir ou se o PDF mudou."""
+    sha_pdf = sha256_arquivo(caminho_pdf) if os.path.exists(caminho_pdf) else None
+    if sha_pdf is not None and not indice_atualizado(caminho_pdf, destino, sha_pdf):
+        with _trava_construcao:
+            if not indice_atualizado(caminho_pdf, destino, sha_pdf):
+                os.makedirs(destino, exist_ok=True)
+                construir_indice(caminho_pdf, destino, sha_pdf)
+    if _manifesto(destino) is None:
+        return None
+    return IndiceDocumentos.de_diretorio(destino)
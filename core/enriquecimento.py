@@ -0,0 +1,314 @@
+"""Enriquecimento dos alimentos da TACO com anotações geradas por LLM.
+
+Cada tarefa (emojis, tags, ...) é um prompt por alimento mais uma função que
+limpa a resposta. `enriquecer` faz as requisições em paralelo, com no máximo
+`concorrencia` em andamento, e respeita um limite de requisições por segundo
+(balde de fichas). Respostas 429 e 5xx são refeitas com espera exponencial,
+e um 429 segura o balde para todas as requisições. Cada resposta é gravada
+na hora num cache SQLite (`dados/enriquecimento.db`) por (tarefa,
+id_alimento). Uma execução interrompida continua de onde parou, e alimentos
+já anotados não são pedidos de novo.
+
+A API é a `generateContent` do Gemini. A chave vem de `GEMINI_API_KEY` ou de
+`st.secrets`, e `NUTRI_LLM_URL` troca o endereço (ex.: um servidor local de
+teste).
+"""
+import asyncio
+import datetime
+import os
+import random
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+CAMINHO_CACHE_ENRIQUECIMENTO = os.path.join("dados", "enriquecimento.db")
+URL_PADRAO = "https://generativelanguage.googleapis.com/v1beta"
+MODELO_PADRAO = "gemini-2.0-flash"
+
+CONCORRENCIA_PADRAO = 8
+REQUISICOES_POR_SEGUNDO = 5.0
+TENTATIVAS = 4
+ESPERA_INICIAL = 2.0
+STATUS_TEMPORARIOS = {429, 500, 502, 503, 504}
+
+
+class ErroRequisicao(Exception):
+    """Falha de uma chamada à API; `temporario` indica que vale tentar de novo."""
+
+    def __init__(self, mensagem, status=None, espera=None):
+        super().__init__(mensagem)
+        self.status = status
+        self.espera = espera
+
+    @property
+    def temporario(self):
+        return self.status is None or self.status in STATUS_TEMPORARIOS
+
+
+class TarefaEnriquecimento:
+    """Uma anotação por alimento: o prompt e a limpeza da resposta do modelo."""
+
+    def __init__(self, nome, prompt, interpretar, max_tokens=20, temperatura=0.5):
+        self.nome = nome
+        self.prompt = prompt
+        self.interpretar = interpretar
+        self.max_tokens = max_tokens
+        self.temperatura = temperatura
+
+
+def _emojis(texto):
+    emojis = "".join(c for c in texto if ord(c) > 255 or c.isspace())
+    return " ".join(emojis.split()) or texto.strip()
+
+
+def _tags(texto):
+    tags = [t.strip(" .#'\"").lower() for t in texto.replace("\n", ",").split(",")]
+    return ", ".join(dict.fromkeys(t for t in tags if t))
+
+
+TAREFAS = {
+    "emojis": TarefaEnriquecimento(
+        "emojis",
+        "Para o alimento '{nome}', sugira de 1 a 3 emojis que o representem da melhor maneira.\n"
+        "Retorne APENAS os emojis, separados por um espaço, sem nenhuma outra palavra.\n"
+        "Exemplos: 'Maçã' -> 🍎; 'Pão de Queijo' -> 🧀🍞; 'Suco de Laranja' -> 🍊🥤\n"
+        "Alimento: '{nome}'\nEmojis:",
+        _emojis,
+        max_tokens=10,
+    ),
+    "tags": TarefaEnriquecimento(
+        "tags",
+        "Para o alimento '{nome}' da Tabela TACO, liste de 2 a 5 etiquetas curtas em português "
+        "(ex.: integral, sem lactose, fonte de proteína, fruta, ultraprocessado).\n"
+        "Retorne APENAS as etiquetas, em minúsculas, separadas por vírgula.\n"
+        "Alimento: '{nome}'\nEtiquetas:",
+        _tags,
+        max_tokens=40,
+        temperatura=0.2,
+    ),
+}
+
+
+class LimitadorTaxa:
+    """Balde de fichas: rajadas de até `capacidade` e, em média, `taxa` requisições por segundo."""
+
+    def __init__(self, taxa=REQUISICOES_POR_SEGUNDO, capacidade=None):
+        self.taxa = float(taxa)
+        self.capacidade = float(capacidade or max(1.0, self.taxa))
+        self._fichas = self.capacidade
+        self._atualizado = time.monotonic()
+        self._trava = asyncio.Lock()
+
+    def _repor(self):
+        agora = time.monotonic()
+        self._fichas = min(self.capacidade, self._fichas + (agora - self._atualizado) * self.taxa)
+        self._atualizado = agora
+
+    async def adquirir(self):
+        async with self._trava:
+            self._repor()
+            while self._fichas < 1.0:
+                await asyncio.sleep((1.0 - self._fichas) / self.taxa)
+                self._repor()
+            self._fichas -= 1.0
+
+    def pausar(self, segundos):
+        """Esvazia o balde por `segundos` (a API pediu para esperar)."""
+        self._repor()
+        self._fichas = min(self._fichas, 0.0) - segundos * self.taxa
+
+
+class CacheEnriquecimento:
+    """Resultados já obtidos, por (tarefa, id_alimento), num SQLite local."""
+
+    def __init__(self, caminho=CAMINHO_CACHE_ENRIQUECIMENTO):
+        self.caminho = caminho
+        self._local = threading.local()
+        if caminho != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(caminho)), exist_ok=True)
+        self.conexao().execute(
+            "CREATE TABLE IF NOT EXISTS resultados ("
+            "tarefa TEXT NOT NULL, id_alimento INTEGER NOT NULL, valor TEXT, criado_em TEXT, "
+            "PRIMARY KEY (tarefa, id_alimento))"
+        )
+
+    def conexao(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.caminho, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def obter(self, tarefa):
+        """Dict id_alimento -> valor com tudo o que já foi anotado na tarefa."""
+        linhas = self.conexao().execute("SELECT id_alimento, valor FROM resultados WHERE tarefa = ?", (tarefa,))
+        return {int(i): v for i, v in linhas}
+
+    def gravar(self, tarefa, id_alimento, valor):
+        self.conexao().execute(
+            "INSERT OR REPLACE INTO resultados (tarefa, id_alimento, valor, criado_em) VALUES (?, ?, ?, ?)",
+            (tarefa, int(id_alimento), valor, datetime.datetime.now().isoformat(timespec="seconds")),
+        )
+
+    def remover(self, tarefa, ids=None):
+        """Descarta resultados da tarefa (todos, ou só os de `ids`) para pedi-los de novo."""
+        if ids is None:
+            self.conexao().execute("DELETE FROM resultados WHERE tarefa = ?", (tarefa,))
+            return
+        self.conexao().executemany(
+            "DELETE FROM resultados WHERE tarefa = ? AND id_alimento = ?", [(tarefa, int(i)) for i in ids]
+        )
+
+
+def _chave_api():
+    chave = os.environ.get("GEMINI_API_KEY")
+    if chave:
+        return chave
+    try:
+        import streamlit as st
+
+        return st.secrets.get("GEMINI_API_KEY")
+    except Exception:
+        return None
+
+
+class ClienteGemini:
+    """Chamadas síncronas ao `generateContent` (uma sessão HTTP por thread)."""
+
+    def __init__(self, chave=None, url=None, modelo=MODELO_PADRAO, timeout=30):
+        self.chave = chave or _chave_api()
+        self.url = (url or os.environ.get("NUTRI_LLM_URL") or URL_PADRAO).rstrip("/")
+        self.modelo = modelo
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _sessao(self):
+        import requests
+
+        sessao = getattr(self._local, "sessao", None)
+        if sessao is None:
+            sessao = self._local.sessao = requests.Session()
+        return sessao
+
+    def gerar(self, prompt, max_tokens=20, temperatura=0.5):
+        """Texto gerado para `prompt`; levanta `ErroRequisicao` em caso de falha."""
+        import requests
+
+        payload = {
+            "contents": [{"role": "user", "parts": [{"text": prompt}]}],
+            "generationConfig": {"temperature": temperatura, "maxOutputTokens": max_tokens},
+        }
+        try:
+            resposta = self._sessao().post(
+                f"{self.url}/models/{self.modelo}:generateContent",
+                params={"key": self.chave} if self.chave else None,
+                json=payload,
+                timeout=self.timeout,
+            )
+        except requests.RequestException as erro:
+            raise ErroRequisicao(f"Erro de conexão: {erro}") from erro
+        if resposta.status_code != 200:
+            espera = resposta.headers.get("Retry-After")
+            raise ErroRequisicao(
+                f"HTTP {resposta.status_code}: {resposta.text[:200]}",
+                status=resposta.status_code,
+                espera=float(espera) if espera and espera.replace(".", "", 1).isdigit() else None,
+            )
+        try:
+            return resposta.json()["candidates"][0]["content"]["parts"][0]["text"].strip()
+        except (ValueError, KeyError, IndexError, TypeError) as erro:
+            raise ErroRequisicao(f"Resposta inesperada: {resposta.text[:200]}", status=resposta.status_code) from erro
+
+
+async def enriquecer_async(
+    alimentos,
+    tarefa,
+    cliente,
+    cache,
+    concorrencia=CONCORRENCIA_PADRAO,
+    taxa=REQUISICOES_POR_SEGUNDO,
+    tentativas=TENTATIVAS,
+    ao_progredir=None,
+):
+    """Versão assíncrona de `enriquecer`."""
+    tarefa = TAREFAS[tarefa] if isinstance(tarefa, str) else tarefa
+    alimentos = [(int(i), str(nome)) for i, nome in alimentos]
+    resultados = cache.obter(tarefa.nome)
+    pendentes = [(i, nome) for i, nome in alimentos if i not in resultados]
+    resumo = {
+        "resultados": {i: resultados[i] for i, _ in alimentos if i in resultados},
+        "do_cache": len(alimentos) - len(pendentes),
+        "novos": 0,
+        "falhas": {},
+        "interrompido": None,
+    }
+    if not pendentes:
+        return resumo
+
+    limitador = LimitadorTaxa(taxa)
+    semaforo = asyncio.Semaphore(concorrencia)
+    loop = asyncio.get_running_loop()
+    interromper = asyncio.Event()
+    concluidos = 0
+
+    async def processar(executor, id_alimento, nome):
+        nonlocal concluidos
+        async with semaforo:
+            for tentativa in range(tentativas):
+                if interromper.is_set():
+                    return
+                await limitador.adquirir()
+                try:
+                    texto = await loop.run_in_executor(
+                        executor,
+                        cliente.gerar,
+                        tarefa.prompt.format(nome=nome),
+                        tarefa.max_tokens,
+                        tarefa.temperatura,
+                    )
+                except ErroRequisicao as erro:
+                    if not erro.temporario:
+                        # chave inválida, permissão negada etc.: as outras também falhariam
+                        resumo["falhas"][id_alimento] = str(erro)
+                        resumo["interrompido"] = str(erro)
+                        interromper.set()
+                        return
+                    if tentativa == tentativas - 1:
+                        resumo["falhas"][id_alimento] = str(erro)
+                        break
+                    espera = erro.espera or ESPERA_INICIAL * 2 ** tentativa * (0.5 + random.random())
+                    if erro.status == 429:
+                        limitador.pausar(espera)
+                    await asyncio.sleep(espera)
+                    continue
+                valor = tarefa.interpretar(texto)
+                cache.gravar(tarefa.nome, id_alimento, valor)
+                resumo["resultados"][id_alimento] = valor
+                resumo["novos"] += 1
+                break
+        concluidos += 1
+        if ao_progredir is not None:
+            ao_progredir(concluidos, len(pendentes))
+
+    with ThreadPoolExecutor(max_workers=concorrencia) as executor:
+        await asyncio.gather(*(processar(executor, i, nome) for i, nome in pendentes))
+    resumo["resultados"] = {i: resumo["resultados"][i] for i, _ in alimentos if i in resumo["resultados"]}
+    return resumo
+
+
+def enriquecer(alimentos, tarefa, cliente=None, cache=None, **opcoes):
+    """Anota os `alimentos` ((id_alimento, nome), ...) com a `tarefa` ("emojis", "tags", ...).
+
+    Alimentos já presentes no cache não são pedidos de novo. Devolve um dict
+    com `resultados` (id -> valor, do cache e novos), `do_cache`, `novos`,
+    `falhas` (id -> mensagem) e `interrompido` (a mensagem do erro que parou
+    tudo, como chave inválida, ou None). As falhas ficam fora do cache e são
+    tentadas de novo na próxima execução. `ao_progredir(feitos, total)` é chamada na
+    thread de quem chamou `enriquecer` (pode atualizar o Streamlit).
+    """
+    return asyncio.run(
+        enriquecer_async(alimentos, tarefa, cliente or ClienteGemini(), cache or CacheEnriquecimento(), **opcoes)
+    )
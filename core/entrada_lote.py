@@ -0,0 +1,108 @@
+"""Entrada de vários alimentos do plano de uma vez.
+
+O nutricionista cola um texto como
+
+    Café da Manhã: pão francês 50g, queijo minas 30g
+    Almoço: arroz integral cozido 120 g; feijão carioca 1,5 kg
+
+Cada linha pode começar com o nome da refeição seguido de ":" (sem ele, vale
+a última refeição citada). Os itens são separados por vírgula, ";" ou "+";
+vírgulas sem quantidade depois fazem parte do nome ("arroz, integral, cozido
+100g"). Os nomes são resolvidos no `IndiceBuscaAlimentos`: quando o segundo
+colocado fica perto demais do primeiro, o item é marcado como ambíguo e traz
+as opções para o nutricionista escolher.
+"""
+import re
+
+from core.busca_alimentos import normalizar
+from core.dieta import REFEICOES
+from core.instrumentacao import medir
+
+# Diferença mínima de pontuação entre o 1º e o 2º resultado para aceitar o 1º sem perguntar
+MARGEM_AMBIGUIDADE = 0.15
+OPCOES_AMBIGUIDADE = 5
+
+UNIDADES = {"g": 1.0, "gr": 1.0, "grs": 1.0, "grama": 1.0, "gramas": 1.0, "kg": 1000.0, "ml": 1.0}
+
+def _chave_refeicao(texto):
+    return " ".join(re.sub(r"\b(da|de|do)\b", " ", normalizar(texto)).split())
+
+
+_APELIDOS_REFEICOES = {_chave_refeicao(r): r for r in REFEICOES}
+_APELIDOS_REFEICOES.update({
+    "cafe": "Café da Manhã",
+    "desjejum": "Café da Manhã",
+    "lanche manha": "Lanche da Manhã",
+    "colacao": "Lanche da Manhã",
+    "almoco": "Almoço",
+    "lanche tarde": "Lanche da Tarde",
+    "lanche": "Lanche da Tarde",
+    "janta": "Jantar",
+})
+
+_QUANTIDADE = re.compile(
+    r"(?<![\w.])(\d+(?:\.\d+)?)\s*(" + "|".join(sorted(UNIDADES, key=len, reverse=True)) + r")\b",
+    re.IGNORECASE,
+)
+_DECIMAL = re.compile(r"(\d),(\d)")
+_SEPARADORES = re.compile(r"[,;+]")
+
+
+def _itens_da_linha(texto):
+    """Divide o texto de uma linha em (nome, gramas); gramas é None se faltar a quantidade."""
+    texto = _DECIMAL.sub(r"\1.\2", texto)
+    itens = []
+    acumulado = ""
+    for fragmento in _SEPARADORES.split(texto):
+        acumulado = f"{acumulado}, {fragmento}" if acumulado else fragmento
+        quantidade = _QUANTIDADE.search(acumulado)
+        if quantidade:
+            nome = (acumulado[: quantidade.start()] + " " + acumulado[quantidade.end():]).strip(" ,")
+            gramas = float(quantidade.group(1)) * UNIDADES[quantidade.group(2).lower()]
+            itens.append((" ".join(nome.split()), gramas))
+            acumulado = ""
+    if acumulado.strip(" ,"):
+        itens.append((" ".join(acumulado.strip(" ,").split()), None))
+    return itens
+
+
+@medir("core", funcao="interpretar_lote")
+def interpretar_lote(texto, indice, refeicao_padrao=REFEICOES[0]):
+    """Interpreta o texto colado e resolve os nomes no índice de busca.
+
+    Devolve uma lista de dicts com as chaves `refeicao`, `texto`, `gramas`,
+    `linha` (linha da TACO ou None), `opcoes` (linhas candidatas quando o
+    nome é ambíguo) e `erro` (None quando o item está pronto para entrar).
+    """
+    refeicao = refeicao_padrao
+    resultado = []
+    for linha_texto in str(texto).splitlines():
+        if not linha_texto.strip():
+            continue
+        cabecalho, separador, resto = linha_texto.partition(":")
+        if separador and _chave_refeicao(cabecalho) in _APELIDOS_REFEICOES:
+            refeicao = _APELIDOS_REFEICOES[_chave_refeicao(cabecalho)]
+            linha_texto = resto
+        for nome, gramas in _itens_da_linha(linha_texto):
+            item = {"refeicao": refeicao, "texto": nome, "gramas": gramas, "linha": None, "opcoes": [], "erro": None}
+            resultado.append(item)
+            if not nome:
+                item["erro"] = "Quantidade sem alimento."
+                continue
+            candidatos = indice.buscar(nome, limite=OPCOES_AMBIGUIDADE)
+            if not candidatos:
+                item["erro"] = "Alimento não encontrado na TACO."
+            elif (
+                len(candidatos) > 1
+                and normalizar(indice.nomes[candidatos[0][0]]) != normalizar(nome)
+                and candidatos[0][1] - candidatos[1][1] < MARGEM_AMBIGUIDADE
+            ):
+                item["opcoes"] = [linha for linha, _ in candidatos]
+                item["erro"] = "Nome ambíguo: escolha uma das opções."
+            else:
+                item["linha"] = candidatos[0][0]
+            if gramas is None:
+                item["erro"] = "Faltou a quantidade (ex.: 50g)."
+            elif gramas <= 0:
+                item["erro"] = "Quantidade deve ser maior que zero."
+    return resultado
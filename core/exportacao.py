@@ -0,0 +1,288 @@
+"""Exportação em PDF do plano alimentar e do relatório do paciente.
+
+A exportação tem duas etapas. `dados_plano` e `dados_relatorio` leem o plano
+ou o relatório e devolvem dicts simples, só com texto e números.
+`pdf_plano` e `pdf_relatorio` desenham o PDF a partir desses dicts com
+fpdf2. A segunda etapa não toca no banco nem no Streamlit, então a
+exportação em lote (`exportar_zip`) desenha os PDFs num pool de processos e
+grava cada um no ZIP (um arquivo temporário) assim que fica pronto. Só
+alguns PDFs ficam em memória ao mesmo tempo.
+"""
+import datetime
+import multiprocessing
+import os
+import tempfile
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from fpdf import FPDF
+from fpdf.enums import XPos, YPos
+
+from core.busca_alimentos import normalizar
+from core.dieta import REFEICOES
+from core.instrumentacao import medir
+
+MACROS_PDF = ["kcal", "proteina_g", "carboidrato_g", "lipideos_g"]
+CABECALHO_MACROS = ["kcal", "Prot. (g)", "Carb. (g)", "Lip. (g)"]
+
+# Abaixo disso o custo de subir os processos supera o ganho do pool
+MINIMO_PARA_POOL = 8
+# PDFs em andamento por processo (limita a memória da exportação em lote)
+TAREFAS_POR_PROCESSO = 4
+
+
+def _texto(valor):
+    """Texto aceito pelas fontes padrão do PDF (latin-1; emojis e afins caem fora)."""
+    return str(valor).encode("latin-1", "ignore").decode("latin-1").strip()
+
+
+def nome_arquivo(prefixo, id_paciente, nome_paciente):
+    """Nome de arquivo sem acentos nem espaços, ex.: plano_0012_ana_souza.pdf."""
+    return f"{prefixo}_{int(id_paciente):04d}_{'_'.join(normalizar(nome_paciente).split()) or 'paciente'}.pdf"
+
+
+def dados_plano(plano, nome_paciente="", nome_nutricionista=""):
+    """Conteúdo do PDF do plano: refeições com itens e totais de kcal e macros."""
+    colunas = [plano.matriz.coluna(n) for n in MACROS_PDF]
+    totais = plano.totais_por_refeicao()
+    refeicoes = []
+    for codigo, refeicao in enumerate(REFEICOES):
+        itens = plano.itens(refeicao)
+        if not itens:
+            continue
+        refeicoes.append({
+            "nome": refeicao,
+            "itens": [
+                [nome, float(gramas)] + [float(nutrientes[c]) for c in colunas]
+                for _, nome, gramas, nutrientes in itens
+            ],
+            "totais": [float(totais[codigo, c]) for c in colunas],
+        })
+    totais_dia = plano.totais_dia()
+    return {
+        "paciente": nome_paciente,
+        "nutricionista": nome_nutricionista,
+        "versao": plano.versao,
+        "data": datetime.date.today().strftime("%d/%m/%Y"),
+        "refeicoes": refeicoes,
+        "totais_dia": [float(totais_dia[c]) for c in colunas],
+    }
+
+
+def dados_relatorio(relatorio, nome_nutricionista=""):
+    """Conteúdo do PDF do relatório a partir de `relatorio_paciente`."""
+    pesos = relatorio["pesos"]
+    dietas = relatorio["dietas"]
+    return {
+        "paciente": relatorio["paciente"].get("nome_paciente", ""),
+        "nutricionista": nome_nutricionista,
+        "data": datetime.date.today().strftime("%d/%m/%Y"),
+        "consultas": relatorio["consultas"],
+        "primeira_consulta": relatorio["primeira_consulta"],
+        "ultima_consulta": relatorio["ultima_consulta"],
+        "frequencia_media_dias": relatorio["frequencia_media_dias"],
+        "retornos": dict(relatorio["retornos"]),
+        "pesos": [
+            [data.strftime("%d/%m/%Y"), float(peso), float(imc) if imc == imc else None]
+            for data, peso, imc in zip(
+                pesos["data"], pesos["peso_kg"], pesos["imc"] if "imc" in pesos else [float("nan")] * len(pesos)
+            )
+        ],
+        "consultas_por_mes": relatorio["consultas_por_mes"].values.tolist(),
+        "dietas": [
+            [int(linha["versao"]), linha["data"].strftime("%d/%m/%Y")] + [float(linha[n]) for n in MACROS_PDF]
+            for linha in dietas.to_dict("records")
+        ],
+    }
+
+
+def _novo_documento(titulo, dados):
+    pdf = FPDF(format="A4")
+    pdf.set_auto_page_break(auto=True, margin=15)
+    pdf.set_title(_texto(titulo))
+    pdf.add_page()
+    pdf.set_font("Helvetica", "B", 16)
+    pdf.cell(0, 9, _texto(titulo), new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+    pdf.set_font("Helvetica", "", 10)
+    linha = f"Paciente: {dados['paciente']}"
+    if dados.get("nutricionista"):
+        linha += f"    Nutricionista: {dados['nutricionista']}"
+    pdf.cell(0, 6, _texto(linha), new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+    pdf.cell(0, 6, _texto(f"Emitido em {dados['data']}"), new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+    pdf.ln(3)
+    return pdf
+
+
+def _subtitulo(pdf, texto):
+    if pdf.will_page_break(30):  # não deixa o título sozinho no pé da página
+        pdf.add_page()
+    pdf.ln(2)
+    pdf.set_font("Helvetica", "B", 12)
+    pdf.cell(0, 8, _texto(texto), new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+
+
+def _tabela(pdf, cabecalho, linhas, larguras, rodape=None):
+    """Tabela simples; a primeira coluna à esquerda, as demais à direita."""
+    pdf.set_font("Helvetica", "B", 9)
+    pdf.set_fill_color(230, 236, 230)
+    for k, (titulo, largura) in enumerate(zip(cabecalho, larguras)):
+        pdf.cell(largura, 6, _texto(titulo), border=1, align="L" if k == 0 else "R", fill=True)
+    pdf.ln()
+    pdf.set_font("Helvetica", "", 9)
+    for linha in linhas + ([rodape] if rodape else []):
+        if linha is rodape:
+            pdf.set_font("Helvetica", "B", 9)
+        for k, (valor, largura) in enumerate(zip(linha, larguras)):
+            pdf.cell(largura, 6, _texto(valor), border=1, align="L" if k == 0 else "R")
+        pdf.ln()
+
+
+def _formatar_macros(valores):
+    return [f"{valores[0]:.0f}"] + [f"{v:.1f}" for v in valores[1:]]
+
+
+def pdf_plano(dados):
+    """PDF (bytes) do plano alimentar montado por `dados_plano`."""
+    titulo = "Plano Alimentar" + (f" - versão {dados['versao']}" if dados.get("versao") else "")
+    pdf = _novo_documento(titulo, dados)
+    larguras = [86, 20, 20, 22, 22, 20]
+    for refeicao in dados["refeicoes"]:
+        _subtitulo(pdf, refeicao["nome"])
+        _tabela(
+            pdf,
+            ["Alimento", "Gramas"] + CABECALHO_MACROS,
+            [[nome[:55], f"{gramas:.0f}"] + _formatar_macros(macros) for nome, gramas, *macros in refeicao["itens"]],
+            larguras,
+            rodape=["Total da refeição", ""] + _formatar_macros(refeicao["totais"]),
+        )
+    if not dados["refeicoes"]:
+        pdf.set_font("Helvetica", "", 10)
+        pdf.cell(0, 8, "Plano sem alimentos.", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+    _subtitulo(pdf, "Total do dia")
+    _tabela(pdf, CABECALHO_MACROS, [_formatar_macros(dados["totais_dia"])], [30, 30, 30, 30])
+    return bytes(pdf.output())
+
+
+def pdf_relatorio(dados):
+    """PDF (bytes) do relatório de evolução montado por `dados_relatorio`."""
+    pdf = _novo_documento("Relatório de Evolução", dados)
+    retornos = dados["retornos"]
+    frequencia = dados["frequencia_media_dias"]
+    resumo = [
+        ["Consultas", str(dados["consultas"])],
+        ["Primeira consulta", dados["primeira_consulta"] or "-"],
+        ["Última consulta", dados["ultima_consulta"] or "-"],
+        ["Intervalo médio", f"{frequencia:.0f} dias" if frequencia is not None else "-"],
+        ["Retornos cumpridos / perdidos / agendados",
+         f"{retornos['cumpridos']} / {retornos['perdidos']} / {retornos['pendentes']}"],
+        ["Adesão aos retornos", f"{retornos['adesao']:.0%}" if retornos["adesao"] is not None else "-"],
+    ]
+    _subtitulo(pdf, "Resumo")
+    _tabela(pdf, ["Indicador", "Valor"], resumo, [100, 60])
+
+    _subtitulo(pdf, "Peso e IMC")
+    if dados["pesos"]:
+        _tabela(
+            pdf,
+            ["Data", "Peso (kg)", "IMC"],
+            [[data, f"{peso:.1f}", f"{imc:.1f}" if imc is not None else "-"] for data, peso, imc in dados["pesos"]],
+            [50, 40, 40],
+        )
+    else:
+        pdf.set_font("Helvetica", "", 10)
+        pdf.cell(0, 6, "Nenhum peso registrado.", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+
+    if dados["consultas_por_mes"]:
+        _subtitulo(pdf, "Consultas por mês")
+        _tabela(pdf, ["Mês", "Consultas"], [[mes, str(n)] for mes, n in dados["consultas_por_mes"]], [50, 40])
+
+    if dados["dietas"]:
+        _subtitulo(pdf, "Dietas prescritas")
+        _tabela(
+            pdf,
+            ["Versão", "Data"] + CABECALHO_MACROS,
+            [[str(versao), data] + _formatar_macros(macros) for versao, data, *macros in dados["dietas"]],
+            [20, 30, 25, 25, 25, 25],
+        )
+    return bytes(pdf.output())
+
+
+_DESENHAR = {"plano": pdf_plano, "relatorio": pdf_relatorio}
+
+
+def _desenhar(tarefa):
+    """Executada nos processos do pool: (arquivo, tipo, dados) -> (arquivo, PDF)."""
+    arquivo, tipo, dados = tarefa
+    return arquivo, _DESENHAR[tipo](dados)
+
+
+@medir("core", funcao="exportar_zip")
+def exportar_zip(tarefas, destino=None, processos=None):
+    """Desenha os PDFs de `tarefas` e grava todos num único ZIP.
+
+    `tarefas` é um iterável (pode ser um gerador) de (nome do arquivo, "plano"
+    ou "relatorio", dados). O ZIP vai para `destino` (um arquivo binário
+    aberto) ou para um arquivo temporário anônimo. Ele volta posicionado no
+    início, pronto para o download. Com muitas tarefas, os PDFs são desenhados
+    num pool de processos, com no máximo `TAREFAS_POR_PROCESSO` por processo
+    em andamento.
+    """
+    destino = destino if destino is not None else tempfile.TemporaryFile(suffix=".zip")
+    tarefas = iter(tarefas)
+    primeiras = []
+    for tarefa in tarefas:
+        primeiras.append(tarefa)
+        if len(primeiras) >= MINIMO_PARA_POOL:
+            break
+
+    # os PDFs já saem comprimidos do fpdf2; recomprimir no ZIP só gasta tempo
+    with zipfile.ZipFile(destino, "w", compression=zipfile.ZIP_STORED) as arquivo_zip:
+        if len(primeiras) < MINIMO_PARA_POOL:
+            for tarefa in primeiras:
+                arquivo_zip.writestr(*_desenhar(tarefa))
+        else:
+            processos = processos or min(os.cpu_count() or 1, 8)
+            # "spawn": o processo do Streamlit tem threads, e um fork herdaria travas presas
+            contexto = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=processos, mp_context=contexto) as pool:
+                pendentes = set()
+                fila = iter(primeiras)
+                for fonte in (fila, tarefas):
+                    for tarefa in fonte:
+                        pendentes.add(pool.submit(_desenhar, tarefa))
+                        if len(pendentes) >= processos * TAREFAS_POR_PROCESSO:
+                            prontos, pendentes = wait(pendentes, return_when=FIRST_COMPLETED)
+                            for futuro in prontos:
+                                arquivo_zip.writestr(*futuro.result())
+                for futuro in wait(pendentes).done:
+                    arquivo_zip.writestr(*futuro.result())
+    destino.seek(0)
+    return destino
+
+
+def tarefas_planos(repositorio, matriz, id_nutricionista, pacientes, nome_nutricionista=""):
+    """Gera as tarefas de `exportar_zip` com o último plano salvo de cada paciente.
+
+    `pacientes` é um dict id_paciente -> nome. Pacientes sem plano salvo ficam
+    de fora. Os planos são carregados um a um, à medida que o ZIP pede.
+    """
+    from core.dieta import carregar_plano
+
+    for id_paciente, nome_paciente in pacientes.items():
+        plano = carregar_plano(repositorio, matriz, id_paciente, id_nutricionista)
+        if plano is None:
+            continue
+        yield (
+            nome_arquivo("plano", id_paciente, nome_paciente),
+            "plano",
+            dados_plano(plano, nome_paciente, nome_nutricionista),
+        )
+
+
+def pacientes_com_retorno(consultas, inicio, fim):
+    """Ids dos pacientes com retorno marcado entre `inicio` e `fim` (datas, inclusive)."""
+    if consultas.empty or "data_retorno" not in consultas:
+        return set()
+    datas = consultas["data_retorno"].astype(str).str[:10]
+    marcados = consultas[(datas >= inicio.isoformat()) & (datas <= fim.isoformat())]
+    return {int(i) for i in marcados["id_paciente"].dropna()}
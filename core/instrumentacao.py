@@ -0,0 +1,227 @@
+"""Medições de tempo e de I/O do processo, mostradas na página de diagnóstico.
+
+`medir(nome, **rotulos)` funciona como bloco `with` ou como decorador e
+registra a duração num histograma por (nome, rótulos). O `Repositorio` mede
+cada leitura e escrita (`leitura`/`escrita`, com a aba e as linhas
+devolvidas ou gravadas), o backend do Google Sheets mede as chamadas à
+planilha (`planilha`), e o `app.py` mede cada rerun de página com
+`medir_rerun`, que também soma o I/O feito durante o rerun e o tamanho do
+`st.session_state`.
+
+As métricas ficam na memória do processo. Com a variável de ambiente
+`NUTRI_METRICAS_JSONL` apontando para um arquivo, cada medição também é
+acrescentada a ele como uma linha JSON, para análise fora do app.
+"""
+import bisect
+import contextlib
+import datetime
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+
+# Limites superiores (ms) das faixas dos histogramas; a última faixa é "acima de 10 s"
+LIMITES_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+MAXIMO_RERUNS = 200
+
+
+class Histograma:
+    """Contagem de durações por faixa (ver `LIMITES_MS`), com soma e máximo."""
+
+    def __init__(self):
+        self.faixas = [0] * (len(LIMITES_MS) + 1)
+        self.quantidade = 0
+        self.soma_ms = 0.0
+        self.maximo_ms = 0.0
+
+    def registrar(self, ms):
+        self.faixas[bisect.bisect_left(LIMITES_MS, ms)] += 1
+        self.quantidade += 1
+        self.soma_ms += ms
+        self.maximo_ms = max(self.maximo_ms, ms)
+
+    def percentil(self, p):
+        """Limite superior da faixa em que cai o percentil `p` (0-100); None se vazio."""
+        if not self.quantidade:
+            return None
+        alvo = p / 100.0 * self.quantidade
+        acumulado = 0
+        for limite, contagem in zip(LIMITES_MS + (None,), self.faixas):
+            acumulado += contagem
+            if acumulado >= alvo and contagem:
+                return self.maximo_ms if limite is None else min(limite, self.maximo_ms)
+        return self.maximo_ms
+
+    def resumo(self):
+        return {
+            "quantidade": self.quantidade,
+            "media_ms": self.soma_ms / self.quantidade if self.quantidade else None,
+            "p50_ms": self.percentil(50),
+            "p95_ms": self.percentil(95),
+            "p99_ms": self.percentil(99),
+            "maximo_ms": self.maximo_ms if self.quantidade else None,
+        }
+
+
+class Metricas:
+    """Séries de medições do processo, por (nome, rótulos), e os últimos reruns."""
+
+    def __init__(self, arquivo_jsonl=None):
+        self.arquivo_jsonl = arquivo_jsonl
+        self._series = {}
+        self._reruns = deque(maxlen=MAXIMO_RERUNS)
+        self._trava = threading.Lock()
+
+    def registrar(self, nome, segundos, linhas=None, erro=False, **rotulos):
+        chave = (nome, tuple(sorted(rotulos.items())))
+        with self._trava:
+            serie = self._series.get(chave)
+            if serie is None:
+                serie = self._series[chave] = {"histograma": Histograma(), "linhas": 0, "erros": 0}
+            serie["histograma"].registrar(segundos * 1000.0)
+            serie["linhas"] += linhas or 0
+            serie["erros"] += int(erro)
+        self._exportar({"tipo": "medicao", "nome": nome, **rotulos, "ms": segundos * 1000.0, "linhas": linhas, "erro": erro})
+
+    def registrar_rerun(self, rerun):
+        with self._trava:
+            self._reruns.append(rerun)
+        self._exportar({"tipo": "rerun", **rerun})
+
+    def series(self):
+        """Uma linha por série: nome, rótulos, resumo do histograma, linhas e erros."""
+        with self._trava:
+            itens = [(chave, dict(serie, histograma=serie["histograma"].resumo())) for chave, serie in self._series.items()]
+        return [
+            {"nome": nome, **dict(rotulos), **serie["histograma"], "linhas": serie["linhas"], "erros": serie["erros"]}
+            for (nome, rotulos), serie in sorted(itens, key=lambda item: (item[0][0], str(item[0][1])))
+        ]
+
+    def histograma(self, nome, **rotulos):
+        """Faixas do histograma de uma série (lista de (limite_ms, contagem)); None se não existir."""
+        with self._trava:
+            serie = self._series.get((nome, tuple(sorted(rotulos.items()))))
+            if serie is None:
+                return None
+            return list(zip(LIMITES_MS + (None,), serie["histograma"].faixas))
+
+    def reruns(self):
+        """Os últimos `MAXIMO_RERUNS` reruns, do mais antigo ao mais recente."""
+        with self._trava:
+            return list(self._reruns)
+
+    def limpar(self):
+        with self._trava:
+            self._series.clear()
+            self._reruns.clear()
+
+    def linhas_jsonl(self):
+        """Estado atual (séries e reruns) como texto JSON-lines."""
+        agora = datetime.datetime.now().isoformat(timespec="seconds")
+        linhas = [{"tipo": "serie", "em": agora, **serie} for serie in self.series()]
+        linhas += [{"tipo": "rerun", **rerun} for rerun in self.reruns()]
+        return "".join(json.dumps(linha, ensure_ascii=False, default=str) + "\n" for linha in linhas)
+
+    def _exportar(self, evento):
+        if not self.arquivo_jsonl:
+            return
+        linha = json.dumps({"em": time.time(), **evento}, ensure_ascii=False, default=str) + "\n"
+        with self._trava, open(self.arquivo_jsonl, "a", encoding="utf-8") as arquivo:
+            arquivo.write(linha)
+
+
+_metricas = Metricas(os.environ.get("NUTRI_METRICAS_JSONL") or None)
+_rerun_atual = threading.local()
+
+
+def obter_metricas():
+    """Métricas compartilhadas pelo processo."""
+    return _metricas
+
+
+class _Medicao(contextlib.ContextDecorator):
+    def __init__(self, nome, rotulos):
+        self.nome = nome
+        self.rotulos = rotulos
+        self.linhas = None
+
+    def _recreate_cm(self):
+        # como decorador, cada chamada (de qualquer thread) mede com a sua instância
+        return _Medicao(self.nome, self.rotulos)
+
+    def __enter__(self):
+        self._inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, tipo, erro, rastro):
+        segundos = time.perf_counter() - self._inicio
+        # st.stop()/st.rerun() são BaseException de controle, não erros
+        falhou = isinstance(erro, Exception)
+        _metricas.registrar(self.nome, segundos, self.linhas, falhou, **self.rotulos)
+        acumulado = getattr(_rerun_atual, "io", None)
+        if acumulado is not None and self.nome in ("leitura", "escrita", "planilha"):
+            acumulado[self.nome] += 1
+            if self.nome != "planilha":
+                # chamadas à planilha acontecem dentro de uma leitura (importação), já contada
+                acumulado["ms_io"] += segundos * 1000.0
+                acumulado["linhas"] += self.linhas or 0
+        return False
+
+
+def medir(nome, **rotulos):
+    """Mede um bloco (`with medir(...) as m:`; `m.linhas = n`) ou uma função (`@medir(...)`)."""
+    return _Medicao(nome, rotulos)
+
+
+def tamanho_sessao(estado):
+    """Bytes aproximados dos valores do session_state (DataFrames pelo uso de memória, o resto raso)."""
+    total = 0
+    for valor in list(estado.values()):
+        uso = getattr(valor, "memory_usage", None)
+        if callable(uso):
+            try:
+                total += int(uso(deep=True).sum())
+                continue
+            except (TypeError, ValueError, AttributeError):
+                pass
+        total += sys.getsizeof(valor)
+    return total
+
+
+@contextlib.contextmanager
+def medir_rerun(pagina):
+    """Mede um rerun de página, com o I/O feito nele e o tamanho do session_state ao final."""
+    import streamlit as st
+
+    _rerun_atual.io = acumulado = {"leitura": 0, "escrita": 0, "planilha": 0, "ms_io": 0.0, "linhas": 0}
+    inicio = time.perf_counter()
+    erro = None
+    try:
+        with medir("rerun", pagina=pagina):
+            yield
+    except Exception as excecao:
+        erro = excecao
+        raise
+    finally:
+        _rerun_atual.io = None
+        try:
+            chaves, tamanho = len(st.session_state), tamanho_sessao(st.session_state)
+        except BaseException:
+            # depois de st.stop()/st.rerun() o session_state levanta o mesmo pedido de novo;
+            # o rerun é registrado sem o tamanho da sessão
+            chaves = tamanho = None
+        _metricas.registrar_rerun({
+            "em": datetime.datetime.now().isoformat(timespec="seconds"),
+            "pagina": pagina,
+            "ms": (time.perf_counter() - inicio) * 1000.0,
+            "leituras": acumulado["leitura"],
+            "escritas": acumulado["escrita"],
+            "chamadas_planilha": acumulado["planilha"],
+            "ms_io": acumulado["ms_io"],
+            "linhas": acumulado["linhas"],
+            "chaves_sessao": chaves,
+            "bytes_sessao": tamanho,
+            "erro": None if erro is None else type(erro).__name__,
+        })
@@ -0,0 +1,300 @@
+"""Completar o plano alimentar por metas de macronutrientes.
+
+Para cada refeição, resolve um programa linear (HiGHS, via
+`scipy.optimize.linprog`) sobre os alimentos da TACO que podem entrar no
+plano: as variáveis são as quantidades de cada alimento (em 100 g) e o
+objetivo é o desvio relativo das metas de kcal, proteína, carboidrato,
+lipídeo e fibra, mais um custo pequeno por alimento fora do ponto de partida.
+Uma solução básica usa poucos alimentos (no máximo um por meta), o que dá
+refeições parecidas com as montadas à mão. As quantidades saem arredondadas
+para porções inteiras de `PASSO_GRAMAS`.
+"""
+import re
+
+import numpy as np
+from scipy.optimize import linprog
+
+from core.busca_alimentos import normalizar
+from core.dieta import REFEICOES
+from core.instrumentacao import medir
+
+METAS = ["kcal", "proteina_g", "carboidrato_g", "lipideos_g", "fibra_alimentar_g"]
+
+# Fração das metas do dia que cabe a cada refeição
+DISTRIBUICAO_REFEICOES = {
+    "Café da Manhã": 0.20,
+    "Lanche da Manhã": 0.10,
+    "Almoço": 0.30,
+    "Lanche da Tarde": 0.10,
+    "Jantar": 0.25,
+    "Ceia": 0.05,
+}
+
+# Peso de cada meta no desvio (relativo à própria meta)
+PESOS_METAS = {"kcal": 2.0, "proteina_g": 1.5, "carboidrato_g": 1.0, "lipideos_g": 1.0, "fibra_alimentar_g": 0.5}
+
+PASSO_GRAMAS = 5
+PORCAO_MINIMA = 10
+PORCAO_MAXIMA = 300
+PORCAO_MAXIMA_POR_CLASSE = {"Gorduras e óleos": 20, "Produtos açucarados": 50, "Nozes e sementes": 40}
+CUSTO_ALIMENTO_NOVO = 0.02  # por 100 g, em unidades de desvio relativo
+
+# Classes que não fazem sentido num plano gerado (sal, fermento, bebidas alcoólicas...)
+CLASSES_FORA = {"Miscelâneas", "Bebidas (alcoólicas e não alcoólicas)"}
+# Nessas classes o alimento cru é ingrediente, não porção servida
+CLASSES_SEM_CRU = {
+    "Cereais e derivados",
+    "Leguminosas e derivados",
+    "Carnes e derivados",
+    "Pescados e frutos do mar",
+    "Ovos e derivados",
+    "Alimentos preparados",
+}
+
+# Palavras de nomes que indicam ingrediente, não porção servida
+INGREDIENTES = [
+    "farinha", "amido", "po", "fermento", "farelo", "gelatina", "toucinho", "charque", "banha",
+    "desidratado", "desidratada", "desidratadas", "infantil",
+]
+
+# Classes que o otimizador usa por conta própria em cada refeição
+CLASSES_LANCHE = ["Frutas e derivados", "Leite e derivados", "Cereais e derivados", "Ovos e derivados", "Nozes e sementes"]
+CLASSES_PRINCIPAL = [
+    "Cereais e derivados",
+    "Leguminosas e derivados",
+    "Carnes e derivados",
+    "Pescados e frutos do mar",
+    "Ovos e derivados",
+    "Verduras, hortaliças e derivados",
+    "Gorduras e óleos",
+]
+CLASSES_POR_REFEICAO = {
+    "Café da Manhã": CLASSES_LANCHE,
+    "Lanche da Manhã": CLASSES_LANCHE,
+    "Almoço": CLASSES_PRINCIPAL,
+    "Lanche da Tarde": CLASSES_LANCHE,
+    "Jantar": CLASSES_PRINCIPAL,
+    "Ceia": CLASSES_LANCHE,
+}
+
+# Alergias/intolerâncias comuns -> palavras dos nomes da TACO que as contêm
+# (sem "torrada" no glúten: na TACO é o preparo, como em "Castanha-de-caju, torrada")
+ALERGENOS = {
+    "lactose": ["leite", "queijo", "iogurte", "requeijao", "ricota", "manteiga", "creme de leite", "doce de leite", "bebida lactea", "chantilly"],
+    "leite": ["leite", "queijo", "iogurte", "requeijao", "ricota", "manteiga", "creme de leite", "doce de leite", "bebida lactea"],
+    "gluten": ["trigo", "pao", "macarrao", "biscoito", "bolo", "lasanha", "pizza", "cevada", "centeio", "aveia", "farinha de trigo", "pastel", "coxinha", "esfiha", "quibe", "nhoque"],
+    "ovo": ["ovo", "ovos", "maionese", "omelete"],
+    "amendoim": ["amendoim", "pacoca", "pe de moleque"],
+    "castanha": ["castanha", "noz", "amendoa", "avela", "macadamia", "pistache"],
+    "frutos do mar": ["camarao", "caranguejo", "siri", "lagosta", "marisco", "mexilhao", "ostra", "polvo", "lula"],
+    "crustaceo": ["camarao", "caranguejo", "siri", "lagosta"],
+    "peixe": ["peixe", "atum", "sardinha", "bacalhau", "salmao", "pescada", "merluza", "corvina", "tilapia", "cacao", "pintado", "manjuba", "corimbata", "dourada", "porquinho", "tucunare", "pescadinha"],
+    "soja": ["soja", "shoyu", "tofu"],
+}
+# Outros nomes (normalizados, casados por palavra inteira) para as chaves de `ALERGENOS`
+SINONIMOS_ALERGENOS = {
+    "nozes": "castanha",
+    "oleaginosas": "castanha",
+    "lacteos": "leite",
+    "laticinios": "leite",
+    "trigo": "gluten",
+    "crustaceos": "crustaceo",
+    "camarao": "crustaceo",
+    "mariscos": "frutos do mar",
+    "peixes": "peixe",
+}
+# Classes da TACO excluídas inteiras por um alergeno, além das palavras de `ALERGENOS`.
+# Glúten fica só nas palavras: "Cereais e derivados" tem arroz, milho e mandioca.
+CLASSES_ALERGENOS = {
+    "lactose": ["Leite e derivados"],
+    "leite": ["Leite e derivados"],
+    "castanha": ["Nozes e sementes"],
+    "ovo": ["Ovos e derivados"],
+    "frutos do mar": ["Pescados e frutos do mar"],
+}
+# Termos mais curtos que isso ("a", "no") casariam com metade da TACO
+TAMANHO_MINIMO_TERMO = 3
+_SEM_ALERGIA = {"", "nao", "nenhuma", "nenhum", "nada", "sem", "n a", "na", "nega", "nao possui", "nao tem"}
+
+
+def alvos_por_refeicao(metas_dia, distribuicao=DISTRIBUICAO_REFEICOES):
+    """Divide as metas do dia entre as refeições: {refeição: {nutriente: meta}}."""
+    return {
+        refeicao: {n: float(v) * fracao for n, v in metas_dia.items()}
+        for refeicao, fracao in distribuicao.items()
+        if fracao > 0
+    }
+
+
+def termos_alergia(alergias):
+    """Termos (normalizados) citados no campo `alergias_paciente`."""
+    if alergias is None or (isinstance(alergias, float) and np.isnan(alergias)):
+        return []
+    partes = re.split(r"[,;/\n]|\s+e\s+", str(alergias))
+    termos = []
+    for parte in partes:
+        termo = normalizar(parte)
+        termo = re.sub(r"^(alergia|alergica|alergico|intolerancia|intolerante)( (a|ao|a|de|do|da))? ", "", termo)
+        if termo not in _SEM_ALERGIA and len(termo) >= TAMANHO_MINIMO_TERMO:
+            termos.append(termo)
+    return termos
+
+
+def _alergenos_do_termo(termo):
+    """Chaves de `ALERGENOS` citadas no termo, por palavra inteira (com plural)."""
+    chaves = set()
+    for nome, chave in [*((a, a) for a in ALERGENOS), *SINONIMOS_ALERGENOS.items()]:
+        if re.search(r"\b" + re.escape(nome) + r"(s|es)?\b", termo):
+            chaves.add(chave)
+    return chaves
+
+
+def alimentos_excluidos(matriz, alergias):
+    """Máscara dos alimentos que o paciente não pode comer.
+
+    Um termo que cita um alergeno conhecido exclui as palavras e as classes
+    dele; um termo desconhecido exclui os alimentos que têm o termo inteiro
+    no nome.
+    """
+    palavras, classes = set(), set()
+    for termo in termos_alergia(alergias):
+        chaves = _alergenos_do_termo(termo)
+        for chave in chaves:
+            palavras.update(ALERGENOS[chave])
+            classes.update(CLASSES_ALERGENOS.get(chave, []))
+        if not chaves:
+            palavras.add(termo)
+    excluidos = np.isin(np.asarray(matriz.classes, dtype=object), list(classes))
+    if not palavras:
+        return excluidos
+    padrao = re.compile(r"\b(" + "|".join(re.escape(p) for p in sorted(palavras)) + r")s?\b")
+    for linha, nome in enumerate(matriz.nomes):
+        if padrao.search(normalizar(nome)):
+            excluidos[linha] = True
+    return excluidos
+
+
+def alimentos_candidatos(matriz, alergias=None, classes=None):
+    """Máscara dos alimentos que o otimizador pode incluir por conta própria."""
+    candidatos = ~alimentos_excluidos(matriz, alergias)
+    ingrediente = re.compile(r"\b(" + "|".join(INGREDIENTES) + r")\b")
+    for linha, (nome, classe) in enumerate(zip(matriz.nomes, matriz.classes)):
+        nome = normalizar(nome)
+        if classe in CLASSES_FORA or (classes is not None and classe not in classes):
+            candidatos[linha] = False
+        elif ingrediente.search(nome):
+            candidatos[linha] = False
+        elif classe in CLASSES_SEM_CRU and re.search(r"\bcrua?s?\b", nome):
+            candidatos[linha] = False
+    return candidatos
+
+
+def _porcoes_maximas(matriz):
+    return np.array(
+        [PORCAO_MAXIMA_POR_CLASSE.get(classe, PORCAO_MAXIMA) for classe in matriz.classes],
+        dtype=np.float64,
+    )
+
+
+def _resolver(composicao, alvo, pesos, custo, minimo, maximo):
+    """LP do desvio ponderado; devolve as quantidades (em 100 g) de cada alimento."""
+    k, n = composicao.shape
+    # variáveis: [x (100 g de cada alimento), folga acima, folga abaixo]
+    a_eq = np.hstack([composicao, -np.eye(k), np.eye(k)])
+    c = np.concatenate([custo, pesos, pesos])
+    limites = np.column_stack([
+        np.concatenate([minimo, np.zeros(2 * k)]),
+        np.concatenate([maximo, np.full(2 * k, np.inf)]),
+    ])
+    resultado = linprog(c, A_eq=a_eq, b_eq=alvo, bounds=limites, method="highs")
+    if not resultado.success:
+        raise ValueError(f"Não foi possível otimizar a refeição: {resultado.message}")
+    return resultado.x[:n]
+
+
+def otimizar_refeicao(matriz, metas, candidatos, iniciais=(), somente_iniciais=False, porcoes_maximas=None):
+    """Gramas de cada alimento para uma refeição chegar às `metas`.
+
+    `iniciais` são linhas da matriz que o nutricionista já escolheu: entram
+    com pelo menos `PORCAO_MINIMA` e sem custo. Devolve {linha: gramas}.
+
+    A primeira passada escolhe os alimentos; a segunda refaz a conta só com
+    eles, todos com pelo menos `PORCAO_MINIMA` (evita "5 g de carne").
+    """
+    nutrientes = [n for n in metas if n in matriz.coluna_por_nutriente]
+    if not nutrientes:
+        return {}
+    if porcoes_maximas is None:
+        porcoes_maximas = _porcoes_maximas(matriz)
+    iniciais = sorted({int(l) for l in iniciais})
+    if somente_iniciais:
+        linhas = np.array(iniciais, dtype=np.int64)
+    else:
+        extras = np.flatnonzero(candidatos)
+        linhas = np.concatenate([iniciais, extras[~np.isin(extras, iniciais)]]).astype(np.int64)
+    if not len(linhas):
+        return {}
+
+    colunas = [matriz.coluna(n) for n in nutrientes]
+    alvo = np.array([metas[n] for n in nutrientes], dtype=np.float64)
+    pesos = np.array([PESOS_METAS.get(n, 1.0) for n in nutrientes]) / np.maximum(np.abs(alvo), 1.0)
+    composicao = matriz.valores[np.ix_(linhas, colunas)].astype(np.float64).T
+    custo = np.full(len(linhas), CUSTO_ALIMENTO_NOVO)
+    custo[: len(iniciais)] = 0.0
+    minimo = np.zeros(len(linhas))
+    minimo[: len(iniciais)] = PORCAO_MINIMA / 100.0
+    maximo = np.maximum(porcoes_maximas[linhas] / 100.0, minimo)
+
+    x = _resolver(composicao, alvo, pesos, custo, minimo, maximo)
+    escolhidos = np.flatnonzero((x * 100.0 >= PASSO_GRAMAS / 2) | (minimo > 0))
+    x = np.zeros(len(linhas))
+    if len(escolhidos):
+        x[escolhidos] = _resolver(
+            composicao[:, escolhidos],
+            alvo,
+            pesos,
+            custo[escolhidos],
+            np.maximum(minimo[escolhidos], np.minimum(PORCAO_MINIMA / 100.0, maximo[escolhidos])),
+            maximo[escolhidos],
+        )
+
+    gramas = np.round(x * 100.0 / PASSO_GRAMAS) * PASSO_GRAMAS
+    return {int(linhas[p]): float(gramas[p]) for p in escolhidos if gramas[p] > 0}
+
+
+@medir("core", funcao="otimizar_dia")
+def otimizar_dia(matriz, metas_por_refeicao, alergias=None, iniciais=None, somente_iniciais=False):
+    """Resolve todas as refeições: {refeição: {linha: gramas}}.
+
+    `iniciais` é {refeição: [linhas]} com os alimentos de partida de cada
+    refeição; alimentos que batem com `alergias` nunca entram, nem como
+    ponto de partida.
+    """
+    excluidos = alimentos_excluidos(matriz, alergias)
+    porcoes_maximas = _porcoes_maximas(matriz)
+    iniciais = iniciais or {}
+    solucao = {}
+    for refeicao in REFEICOES:
+        metas = metas_por_refeicao.get(refeicao)
+        if not metas or not any(v > 0 for v in metas.values()):
+            continue
+        partida = [l for l in iniciais.get(refeicao, ()) if not excluidos[l]]
+        candidatos = alimentos_candidatos(matriz, alergias, CLASSES_POR_REFEICAO.get(refeicao))
+        solucao[refeicao] = otimizar_refeicao(
+            matriz, metas, candidatos, partida, somente_iniciais, porcoes_maximas
+        )
+    return solucao
+
+
+def aplicar_no_plano(plano, solucao):
+    """Grava a solução no `PlanoDieta`: ajusta itens existentes e inclui os novos."""
+    for refeicao, gramas_por_linha in solucao.items():
+        restantes = dict(gramas_por_linha)
+        codigo = REFEICOES.index(refeicao)
+        for posicao in np.flatnonzero(plano.refeicoes == codigo):
+            linha = int(plano.linhas[posicao])
+            if linha in restantes:
+                plano.alterar_gramas(int(plano.id_itens[posicao]), restantes.pop(linha))
+        for linha, gramas in restantes.items():
+            if gramas > 0:
+                plano.adicionar(refeicao, plano.matriz.ids[linha], gramas)
@@ -0,0 +1,138 @@
+"""Dados de referência do processo (TACO, nutricionistas), sempre servidos da memória.
+
+Cada `DadoReferencia` guarda um único valor para todas as sessões do
+Streamlit, sem cópias. Depois de `ttl` segundos, a próxima leitura ainda
+devolve o valor atual e dispara a recarga numa thread ao fundo
+(stale-while-revalidate), lendo da fonte (a planilha ou o snapshot da
+TACO), não da cópia no banco local. Fora `recarregar_e_aguardar`, que espera no
+máximo um tempo dado, nenhuma requisição espera uma recarga. Só a primeira
+carga é feita na hora, e `pre_carregar` (chamado pelo `app.py` ao subir)
+adianta essa também. Se uma recarga falhar, o valor anterior continua
+valendo, e a próxima tentativa fica para depois de outro `ttl`.
+"""
+import threading
+import time
+
+TTL_TACO = 300
+TTL_NUTRICIONISTAS = 300
+
+
+class DadoReferencia:
+    """Valor compartilhado pelo processo, recarregado ao fundo quando vence.
+
+    `carregar(atual)` recebe o valor atual (None na primeira carga) e devolve
+    o novo. Pode devolver o próprio `atual` quando nada mudou.
+    """
+
+    def __init__(self, nome, carregar, ttl=300):
+        self.nome = nome
+        self.carregar = carregar
+        self.ttl = ttl
+        self.erro = None
+        self.recargas = 0
+        self.acertos = 0
+        self.faltas = 0
+        self._valor = None
+        self._carregado_em = None
+        self._thread = None
+        self._trava = threading.Lock()
+        self._trava_carga = threading.Lock()
+
+    def _carregar(self):
+        valor = self.carregar(self._valor)
+        self._valor = valor
+        self._carregado_em = time.monotonic()
+        self.erro = None
+        self.recargas += 1
+
+    def idade(self):
+        """Segundos desde a última carga (None se nunca carregou)."""
+        return None if self._carregado_em is None else time.monotonic() - self._carregado_em
+
+    def obter(self):
+        if self._carregado_em is None:
+            # primeira carga (ou pré-carga ainda em andamento): é a única que espera
+            self.faltas += 1
+            with self._trava_carga:
+                if self._carregado_em is None:
+                    self._carregar()
+        else:
+            self.acertos += 1
+            if self.idade() >= self.ttl:
+                self.recarregar_em_segundo_plano()
+        return self._valor
+
+    def _recarregar(self):
+        with self._trava_carga:
+            try:
+                self._carregar()
+            except Exception as erro:
+                self.erro = erro
+                if self._carregado_em is not None:
+                    # mantém o valor anterior e só tenta de novo depois de outro ttl
+                    self._carregado_em = time.monotonic()
+
+    def recarregar_em_segundo_plano(self, se_mais_velho_que=0):
+        """Dispara uma recarga numa thread (se já não houver uma em andamento)."""
+        idade = self.idade()
+        if idade is not None and idade < se_mais_velho_que:
+            return
+        with self._trava:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._recarregar, name=f"referencia-{self.nome}", daemon=True)
+            self._thread.start()
+
+    def recarregar_e_aguardar(self, se_mais_velho_que=0, timeout=None):
+        """Recarrega e espera até `timeout` segundos; devolve o valor (o anterior, se não deu tempo)."""
+        self.recarregar_em_segundo_plano(se_mais_velho_que)
+        self.aguardar(timeout)
+        return self._valor
+
+    def estatisticas(self):
+        """Leituras servidas da memória (acertos), leituras que esperaram a carga (faltas) e recargas."""
+        return {"acertos": self.acertos, "faltas": self.faltas, "recargas": self.recargas, "idade": self.idade()}
+
+    def aguardar(self, timeout=None):
+        """Espera a recarga em andamento terminar (para scripts e testes)."""
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+
+def _carregar_matriz_taco(atual, repositorio=None, diretorio=None):
+    from core.dieta import DIRETORIO_SNAPSHOT_TACO, carregar_matriz_taco
+
+    # a fonte é o snapshot (refeito por `tratar_taco.py`) ou, sem ele, a planilha, não a cópia no banco
+    matriz = carregar_matriz_taco(repositorio, diretorio or DIRETORIO_SNAPSHOT_TACO, da_origem=True)
+    # mesma versão do snapshot: mantém o objeto (e os índices montados sobre ele)
+    if atual is not None and matriz is not None and matriz.versao is not None and matriz.versao == atual.versao:
+        return atual
+    return matriz
+
+
+_taco = DadoReferencia("taco", _carregar_matriz_taco, TTL_TACO)
+_pre_carregado = False
+
+
+def obter_matriz_taco():
+    """Matriz TACO do processo (ver `core.dieta.MatrizTACO`); None se não houver TACO."""
+    return _taco.obter()
+
+
+def referencias():
+    """Dados de referência do processo, por nome (para diagnóstico)."""
+    from core.usuarios import obter_indice_credenciais
+
+    return {"taco": _taco, "nutricionistas": obter_indice_credenciais().dados}
+
+
+def pre_carregar():
+    """Dispara, uma vez por processo, a carga ao fundo de todos os dados de referência."""
+    global _pre_carregado
+    if _pre_carregado:
+        return
+    _pre_carregado = True
+    for dado in referencias().values():
+        if dado.idade() is None:
+            dado.recarregar_em_segundo_plano()
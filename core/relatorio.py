@@ -0,0 +1,278 @@
+"""Relatório de evolução do paciente.
+
+Cada paciente tem um agregado pré-calculado (tabela `_agregados`, chave
+`paciente:<id>`) com a série de pesos, as consultas por mês, os retornos
+marcados e os macronutrientes de cada versão do plano alimentar. O
+agregado é atualizado a cada consulta registrada (`registrar_consulta`) e a
+cada plano salvo (`registrar_plano`), então o relatório lê uma única linha,
+sem percorrer a aba Consultas. Pacientes sem agregado (dados antigos ou
+importados da planilha) têm o agregado montado uma vez a partir das abas.
+O agregado guarda quais consultas e versões de plano já somou, então uma
+consulta que entra enquanto ele é montado não fica de fora nem conta duas
+vezes.
+"""
+import datetime
+
+import pandas as pd
+
+from core.instrumentacao import medir
+
+# Um retorno conta como cumprido se houver consulta até tantos dias antes ou depois da data marcada
+TOLERANCIA_RETORNO_DIAS = 7
+
+MACROS_RELATORIO = ["kcal", "proteina_g", "carboidrato_g", "lipideos_g", "fibra_alimentar_g"]
+
+
+def _chave(id_paciente):
+    return f"paciente:{int(id_paciente)}"
+
+
+def _data(valor):
+    """Data (sem hora) de um texto ISO/"%Y-%m-%d %H:%M:%S"; None se vazio ou inválido."""
+    if valor is None or (isinstance(valor, float) and pd.isna(valor)) or str(valor).strip() == "":
+        return None
+    try:
+        return datetime.date.fromisoformat(str(valor).strip()[:10])
+    except ValueError:
+        return None
+
+
+def _numero(valor):
+    try:
+        numero = float(valor)
+    except (TypeError, ValueError):
+        return None
+    return None if pd.isna(numero) or numero <= 0 else numero
+
+
+def agregado_vazio():
+    return {
+        "consultas": 0,
+        "primeira": None,
+        "ultima": None,
+        "por_mes": {},
+        "pesos": [],
+        "retornos": [],
+        "dietas": [],
+        "ids_consultas": [],
+        "versoes_planos": [],
+    }
+
+
+def somar_consulta(agregado, consulta):
+    """Inclui uma consulta no agregado (as consultas chegam em ordem cronológica)."""
+    data = _data(consulta.get("data_consulta"))
+    if data is None:
+        return agregado
+    id_consulta = _numero(consulta.get("id_consulta"))
+    if id_consulta is not None:
+        ids = agregado.setdefault("ids_consultas", [])
+        if int(id_consulta) in ids:
+            return agregado
+        ids.append(int(id_consulta))
+    dia = data.isoformat()
+    agregado["consultas"] += 1
+    agregado["primeira"] = min(agregado["primeira"] or dia, dia)
+    agregado["ultima"] = max(agregado["ultima"] or dia, dia)
+    mes = dia[:7]
+    agregado["por_mes"][mes] = agregado["por_mes"].get(mes, 0) + 1
+
+    peso = _numero(consulta.get("peso_paciente"))
+    if peso is not None:
+        agregado["pesos"].append([dia, peso])
+
+    tolerancia = datetime.timedelta(days=TOLERANCIA_RETORNO_DIAS)
+    for retorno in agregado["retornos"]:
+        if retorno[1] is not None:
+            continue
+        marcado = datetime.date.fromisoformat(retorno[0])
+        if abs(data - marcado) <= tolerancia:
+            retorno[1] = True
+        elif data > marcado + tolerancia:
+            retorno[1] = False
+    retorno = _data(consulta.get("data_retorno"))
+    if retorno is not None and retorno > data:
+        agregado["retornos"].append([retorno.isoformat(), None])
+    return agregado
+
+
+def somar_plano(agregado, versao, criado_em, macros, id_nutricionista=None):
+    """Inclui os totais do dia de uma versão do plano alimentar."""
+    if id_nutricionista is not None:
+        versoes = agregado.setdefault("versoes_planos", [])
+        if [int(id_nutricionista), int(versao)] in versoes:
+            return agregado
+        versoes.append([int(id_nutricionista), int(versao)])
+    agregado["dietas"].append(
+        [int(versao), str(criado_em)[:10]] + [round(float(macros.get(n, 0.0)), 2) for n in MACROS_RELATORIO]
+    )
+    return agregado
+
+
+def reconstruir_agregado(repositorio, id_paciente):
+    """Monta o agregado do zero a partir das abas (pacientes sem agregado)."""
+    from core.dieta import PlanoDieta, carregar_matriz_taco, estados_versoes
+
+    agregado = agregado_vazio()
+    paciente = repositorio.primeiro("AnamnesePacientes", id_paciente=int(id_paciente)) or {}
+    peso_inicial = _numero(paciente.get("peso_paciente"))
+    if peso_inicial is not None and _data(paciente.get("data_envio")) is not None:
+        agregado["pesos"].append([_data(paciente["data_envio"]).isoformat(), peso_inicial])
+
+    consultas = repositorio.ler("Consultas", id_paciente=int(id_paciente))
+    if paciente.get("nome_paciente"):
+        # consultas registradas antes de a aba ter id_paciente
+        antigas = repositorio.ler("Consultas", nome_paciente=paciente["nome_paciente"])
+        antigas = antigas[antigas["id_paciente"].isna()] if "id_paciente" in antigas else antigas
+        consultas = pd.concat([consultas, antigas], ignore_index=True)
+    if not consultas.empty:
+        consultas = consultas.sort_values("data_consulta", kind="stable")
+    for consulta in consultas.to_dict("records"):
+        somar_consulta(agregado, consulta)
+
+    versoes = repositorio.ler("PlanosDieta", id_paciente=int(id_paciente))
+    if not versoes.empty:
+        matriz = carregar_matriz_taco(repositorio)
+        for id_nutricionista, versoes_nutricionista in versoes.sort_values("versao").groupby("id_nutricionista"):
+            linhas = versoes_nutricionista.to_dict("records")
+            estados = estados_versoes(l["dados"] for l in linhas)
+            for linha, registros in zip(linhas, estados):
+                plano = PlanoDieta.de_registros(matriz, registros)
+                somar_plano(agregado, linha["versao"], linha["criado_em"], _macros_plano(plano), id_nutricionista)
+        agregado["dietas"].sort(key=lambda d: (d[1], d[0]))
+    return agregado
+
+
+def _macros_plano(plano):
+    totais = plano.totais_dia()
+    return {n: totais[plano.matriz.coluna(n)] for n in MACROS_RELATORIO if n in plano.matriz.coluna_por_nutriente}
+
+
+def _linhas_paciente(repositorio, id_paciente):
+    """Quantas consultas e versões de plano o paciente tem (as abas só crescem)."""
+    return (
+        len(repositorio.ler("Consultas", id_paciente=int(id_paciente))),
+        len(repositorio.ler("PlanosDieta", id_paciente=int(id_paciente))),
+    )
+
+
+def agregado_paciente(repositorio, id_paciente):
+    """Agregado do paciente; montado e gravado na primeira vez que é pedido.
+
+    A montagem lê as abas fora da transação. Uma consulta gravada nesse meio
+    tempo não estaria no agregado montado, e o `registrar_consulta` dela não
+    achou agregado para atualizar; por isso ele só é gravado se, já dentro da
+    transação, o paciente tem as mesmas linhas de antes, e senão é montado de
+    novo.
+    """
+    agregado = repositorio.agregado(_chave(id_paciente))
+    while agregado is None:
+        vistas = _linhas_paciente(repositorio, id_paciente)
+        novo = reconstruir_agregado(repositorio, id_paciente)
+
+        def gravar(atual):
+            if atual is not None:
+                return atual
+            return novo if _linhas_paciente(repositorio, id_paciente) == vistas else None
+
+        agregado = repositorio.atualizar_agregado(_chave(id_paciente), gravar)
+    return agregado
+
+
+def registrar_consulta(repositorio, consulta):
+    """Atualiza o agregado do paciente com uma consulta recém-gravada.
+
+    Se o paciente ainda não tem agregado, nada é feito: ele será montado a
+    partir da aba, já com esta consulta, quando o relatório for aberto.
+    """
+    if consulta.get("id_paciente") is None:
+        return
+    repositorio.atualizar_agregado(
+        _chave(consulta["id_paciente"]), lambda atual: somar_consulta(atual, consulta), criar=False
+    )
+    _invalidar_relatorio(consulta["id_paciente"])
+
+
+def registrar_plano(repositorio, plano, versao, criado_em):
+    """Atualiza o agregado do paciente com os totais de uma versão salva do plano."""
+    macros = _macros_plano(plano)
+    repositorio.atualizar_agregado(
+        _chave(plano.id_paciente),
+        lambda atual: somar_plano(atual, versao, criado_em, macros, plano.id_nutricionista),
+        criar=False,
+    )
+    _invalidar_relatorio(plano.id_paciente)
+
+
+def _invalidar_relatorio(id_paciente):
+    from core.cache import obter_cache, tag_paciente
+
+    obter_cache().invalidar_tags(tag_paciente(id_paciente))
+
+
+@medir("core", funcao="relatorio_paciente")
+def relatorio_paciente(repositorio, id_paciente, hoje=None):
+    """Dados do relatório de evolução de um paciente, prontos para exibir."""
+    hoje = hoje or datetime.date.today()
+    agregado = agregado_paciente(repositorio, id_paciente)
+    paciente = repositorio.primeiro("AnamnesePacientes", id_paciente=int(id_paciente)) or {}
+
+    pesos = pd.DataFrame(agregado["pesos"], columns=["data", "peso_kg"])
+    pesos["data"] = pd.to_datetime(pesos["data"])
+    altura = _numero(paciente.get("altura_paciente"))
+    if altura is not None:
+        altura_m = altura / 100.0 if altura > 3 else altura  # cadastro em cm
+        pesos["imc"] = (pesos["peso_kg"] / altura_m ** 2).round(1)
+
+    por_mes = pd.DataFrame(sorted(agregado["por_mes"].items()), columns=["mes", "consultas"])
+
+    tolerancia = datetime.timedelta(days=TOLERANCIA_RETORNO_DIAS)
+    cumpridos = perdidos = pendentes = 0
+    for data_retorno, situacao in agregado["retornos"]:
+        if situacao is True:
+            cumpridos += 1
+        elif situacao is False or datetime.date.fromisoformat(data_retorno) + tolerancia < hoje:
+            perdidos += 1
+        else:
+            pendentes += 1
+
+    frequencia = None
+    if agregado["consultas"] > 1:
+        dias = (_data(agregado["ultima"]) - _data(agregado["primeira"])).days
+        frequencia = dias / (agregado["consultas"] - 1)
+
+    dietas = pd.DataFrame(agregado["dietas"], columns=["versao", "data"] + MACROS_RELATORIO)
+    dietas["data"] = pd.to_datetime(dietas["data"])
+
+    return {
+        "paciente": paciente,
+        "consultas": agregado["consultas"],
+        "primeira_consulta": agregado["primeira"],
+        "ultima_consulta": agregado["ultima"],
+        "frequencia_media_dias": frequencia,
+        "consultas_por_mes": por_mes,
+        "pesos": pesos,
+        "retornos": {
+            "cumpridos": cumpridos,
+            "perdidos": perdidos,
+            "pendentes": pendentes,
+            "adesao": cumpridos / (cumpridos + perdidos) if cumpridos + perdidos else None,
+        },
+        "dietas": dietas,
+    }
+
+
+def ler_relatorio(id_nutricionista, id_paciente, hoje=None):
+    """`relatorio_paciente` em cache, até a próxima consulta ou plano salvo do paciente."""
+    from core.cache import obter_cache, tag_paciente
+    from core.database import obter_repositorio
+
+    repo = obter_repositorio()
+    hoje = hoje or datetime.date.today()
+    return obter_cache().obter(
+        "Relatorio",
+        int(id_nutricionista),
+        lambda: relatorio_paciente(repo, id_paciente, hoje),
+        chave=(int(id_paciente), hoje),
+        tags=(tag_paciente(id_paciente),),
+    )
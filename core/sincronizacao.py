@@ -0,0 +1,132 @@
+"""Envio em segundo plano da fila de sincronização (write-behind).
+
+`Repositorio.inserir` grava a linha no SQLite local e, na mesma transação,
+coloca uma cópia na tabela `_fila_sincronizacao`. A página retorna na hora; o
+`Sincronizador` roda numa thread própria, agrupa os itens pendentes por aba e
+envia cada grupo numa única chamada ao destino (ex.: `append_rows` do Google
+Sheets). Um item só sai da fila depois que o envio dá certo, então a entrega é
+"pelo menos uma vez": se o processo cair entre o envio e a confirmação, o
+lote é reenviado ao reiniciar. Falhas são reagendadas com espera exponencial.
+
+Uma linha que já falhou `TENTATIVAS_EM_LOTE` vezes passa a ser enviada
+sozinha, para não travar as outras linhas da mesma aba; depois de
+`MAXIMO_TENTATIVAS` falhas ela sai da fila e vai para `_fila_descartada`,
+mostrada na página de diagnóstico, de onde pode ser reenfileirada.
+"""
+import logging
+import random
+import threading
+import time
+
+TENTATIVAS_EM_LOTE = 3
+MAXIMO_TENTATIVAS = 20
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class Sincronizador:
+    """Thread que esvazia a fila persistente de escritas para o destino remoto."""
+
+    def __init__(
+        self,
+        local,
+        destino,
+        janela_agrupamento=2.0,
+        intervalo_ocioso=30.0,
+        tamanho_lote=500,
+        espera_inicial=2.0,
+        espera_maxima=300.0,
+        maximo_tentativas=MAXIMO_TENTATIVAS,
+    ):
+        self.local = local
+        self.destino = destino
+        self.janela_agrupamento = janela_agrupamento
+        self.intervalo_ocioso = intervalo_ocioso
+        self.tamanho_lote = tamanho_lote
+        self.espera_inicial = espera_inicial
+        self.espera_maxima = espera_maxima
+        self.maximo_tentativas = maximo_tentativas
+        self.lotes_enviados = 0
+        self.ultimo_erro = None
+        self._evento = threading.Event()
+        self._parar = threading.Event()
+        self._thread = threading.Thread(target=self._executar, name="nutri-sincronizacao", daemon=True)
+        self._thread.start()
+
+    def notificar(self):
+        """Avisa que há itens novos na fila."""
+        self._evento.set()
+
+    def parar(self, timeout=None):
+        self._parar.set()
+        self._evento.set()
+        self._thread.join(timeout)
+
+    def descarregar(self, timeout=None):
+        """Bloqueia até a fila ficar vazia (útil em scripts e no desligamento)."""
+        limite = None if timeout is None else time.monotonic() + timeout
+        self.janela_agrupamento, janela = 0, self.janela_agrupamento
+        try:
+            while self.local.tamanho_fila() > 0:
+                if limite is not None and time.monotonic() > limite:
+                    return False
+                self.notificar()
+                time.sleep(0.01)
+            return True
+        finally:
+            self.janela_agrupamento = janela
+
+    def _espera(self, tentativas):
+        espera = min(self.espera_inicial * (2 ** tentativas), self.espera_maxima)
+        return espera * random.uniform(0.8, 1.2)
+
+    def _executar(self):
+        while not self._parar.is_set():
+            try:
+                self._ciclo()
+            except Exception as erro:
+                # Ex.: "database is locked" sob carga; a thread não pode morrer com a fila cheia
+                self.ultimo_erro = f"fila: {erro}"
+                _LOGGER.exception("Erro no ciclo de sincronização; tentando de novo em %.0f s", self.espera_inicial)
+                self._evento.wait(self.espera_inicial)
+                self._evento.clear()
+
+    def _ciclo(self):
+        itens = self.local.pendentes(self.tamanho_lote)
+        if not itens:
+            ocioso = self.local.tamanho_fila() == 0
+            self._evento.wait(self.intervalo_ocioso if ocioso else self.espera_inicial)
+            self._evento.clear()
+            # Dá um tempo para outras escritas chegarem e irem no mesmo lote.
+            if not self._parar.is_set():
+                time.sleep(self.janela_agrupamento)
+            return
+        self._enviar(itens)
+
+    def _enviar(self, itens):
+        por_aba = {}
+        for item in itens:
+            por_aba.setdefault(item["aba"], []).append(item)
+        for aba, grupo in por_aba.items():
+            # Linhas que já falharam várias vezes vão sozinhas: uma linha ruim não segura a aba inteira
+            lotes = [[item for item in grupo if item["tentativas"] < TENTATIVAS_EM_LOTE]]
+            lotes += [[item] for item in grupo if item["tentativas"] >= TENTATIVAS_EM_LOTE]
+            for lote in lotes:
+                if lote:
+                    self._enviar_lote(aba, lote)
+
+    def _enviar_lote(self, aba, lote):
+        ids = [item["id"] for item in lote]
+        try:
+            self.destino.anexar(aba, [item["registro"] for item in lote])
+        except Exception as erro:
+            self.ultimo_erro = f"{aba}: {erro}"
+            tentativas = max(item["tentativas"] for item in lote)
+            if len(lote) == 1 and tentativas + 1 >= self.maximo_tentativas:
+                _LOGGER.error("Linha %s da aba %s descartada após %d tentativas: %s", ids[0], aba, tentativas + 1, erro)
+                self.local.descartar_envio(ids, str(erro))
+            else:
+                self.local.adiar_envio(ids, self._espera(tentativas), str(erro))
+            return
+        self.local.confirmar_envio(ids)
+        self.lotes_enviados += 1
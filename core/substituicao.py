@@ -0,0 +1,106 @@
+"""Substituição de alimentos por equivalentes nutricionais.
+
+Cada alimento vira um vetor com a distribuição da energia entre proteína,
+carboidrato e lipídeo, a fibra por 100 kcal e a densidade energética (log das
+kcal por 100 g), padronizado coluna a coluna.
+Os mais parecidos saem de uma busca exata por cosseno (um produto
+matriz × vetor sobre ~600 linhas, bem abaixo de 1 ms); a quantidade do
+substituto é a que iguala as kcal (ou a proteína) do item original.
+"""
+import functools
+
+import numpy as np
+
+from core.otimizacao import alimentos_candidatos, termos_alergia
+from core.instrumentacao import medir
+
+# Alimentos com menos energia que isso (água, chás, sal) não têm perfil comparável
+KCAL_MINIMA = 10.0
+BONUS_MESMA_CLASSE = 0.05
+# Máscaras de alergias diferentes guardadas por índice (o campo é texto livre)
+MASCARAS_ALERGIA = 128
+
+
+class IndiceSubstituicao:
+    """Vizinhos mais próximos na TACO pelo perfil de macronutrientes."""
+
+    def __init__(self, matriz):
+        self.matriz = matriz
+        kcal = matriz.valores[:, matriz.coluna("kcal")].astype(np.float64)
+        prot = matriz.valores[:, matriz.coluna("proteina_g")].astype(np.float64)
+        carb = matriz.valores[:, matriz.coluna("carboidrato_g")].astype(np.float64)
+        lipi = matriz.valores[:, matriz.coluna("lipideos_g")].astype(np.float64)
+        fibra = matriz.valores[:, matriz.coluna("fibra_alimentar_g")].astype(np.float64)
+        self.kcal = kcal
+        self.proteina = prot
+        self.validos = kcal >= KCAL_MINIMA
+
+        energia = np.where(self.validos, kcal, 1.0)
+        perfil = np.column_stack([
+            4 * prot / energia,
+            4 * carb / energia,
+            9 * lipi / energia,
+            100 * fibra / energia,
+            np.log(energia),  # densidade energética: arroz cozido não vira cereal matinal
+        ])
+        perfil[~self.validos] = 0.0
+        media = perfil[self.validos].mean(axis=0)
+        desvio = perfil[self.validos].std(axis=0)
+        desvio[desvio == 0] = 1.0
+        vetores = (perfil - media) / desvio
+        normas = np.linalg.norm(vetores, axis=1)
+        normas[normas == 0] = 1.0
+        self.vetores = np.ascontiguousarray(vetores / normas[:, None])
+        classes = {c: i for i, c in enumerate(dict.fromkeys(matriz.classes))}
+        self.classe = np.array([classes[c] for c in matriz.classes], dtype=np.int32)
+        self._permitidos = alimentos_candidatos(matriz) & self.validos
+        self._permitidos_por_termos = functools.lru_cache(maxsize=MASCARAS_ALERGIA)(self._calcular_permitidos)
+
+    def _calcular_permitidos(self, termos):
+        return alimentos_candidatos(self.matriz, ", ".join(termos)) & self.validos
+
+    def permitidos(self, alergias=None):
+        """Máscara dos substitutos aceitáveis para um paciente (memorizada pelos termos da alergia)."""
+        termos = tuple(sorted(set(termos_alergia(alergias))))
+        if not termos:
+            return self._permitidos
+        return self._permitidos_por_termos(termos)
+
+    @medir("core", funcao="IndiceSubstituicao.substitutos")
+    def substitutos(self, linha, gramas=100.0, k=5, por="kcal", alergias=None):
+        """Os `k` alimentos mais parecidos com a linha `linha`.
+
+        Devolve uma lista de (linha, gramas equivalentes, similaridade), com as
+        gramas que igualam `por` ("kcal" ou "proteina_g") de `gramas` do original.
+        Vazia se o original não tem `por` para igualar (menos de 1 por 100 g,
+        como a proteína de uma fruta ou de um óleo).
+        """
+        linha = int(linha)
+        if not self.validos[linha]:
+            return []
+        if por == "kcal":
+            referencia = self.kcal
+        elif por == "proteina_g":
+            referencia = self.proteina
+        else:
+            raise ValueError(f"Equivalência por '{por}' não suportada; use 'kcal' ou 'proteina_g'.")
+        if referencia[linha] < 1.0:
+            # gramas equivalentes a ~0 g de proteína seriam 0 g de qualquer substituto
+            return []
+
+        similaridade = self.vetores @ self.vetores[linha]
+        similaridade += BONUS_MESMA_CLASSE * (self.classe == self.classe[linha])
+        permitidos = self.permitidos(alergias) & (referencia >= 1.0)
+        permitidos[linha] = False
+        similaridade[~permitidos] = -np.inf
+
+        k = min(k, int(permitidos.sum()))
+        if k <= 0:
+            return []
+        melhores = np.argpartition(-similaridade, k - 1)[:k]
+        melhores = melhores[np.argsort(-similaridade[melhores])]
+        alvo = referencia[linha] * float(gramas)
+        return [
+            (int(m), float(np.round(alvo / referencia[m])), float(similaridade[m]))
+            for m in melhores
+        ]
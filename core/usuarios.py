@@ -1,9 +1,173 @@
+import hashlib
+import hmac
+import logging
+import math
+import numbers
+import os
+import re
+import threading
+
+from core.referencia import TTL_NUTRICIONISTAS, DadoReferencia
+
+ITERACOES_HASH = 200_000
+
+_LOGGER = logging.getLogger(__name__)
+
+
 def ler_nutricionistas():
-    import pandas as pd
-    import streamlit as st 
-    from streamlit_gsheets import GSheetsConnection
+    from core.database import obter_repositorio
 
-    conn = st.connection("gsheets", type=GSheetsConnection)
-    df = conn.read(worksheet="Nutricionistas")
+    df = obter_repositorio().ler("Nutricionistas")
     df['id_nutricionistas'] = df['id_nutricionista'].astype(int)
-    return df
\ No newline at end of file
+    return df
+
+
+def gerar_hash_senha(senha, sal=None, iteracoes=ITERACOES_HASH):
+    """Hash PBKDF2-SHA256 com sal aleatório, no formato `pbkdf2_sha256$iter$sal$hash`."""
+    sal = sal or os.urandom(16).hex()
+    digest = hashlib.pbkdf2_hmac("sha256", str(senha).encode(), sal.encode(), iteracoes).hex()
+    return f"pbkdf2_sha256${iteracoes}${sal}${digest}"
+
+
+def verificar_senha(senha, hash_senha):
+    try:
+        algoritmo, iteracoes, sal, _ = hash_senha.split("$")
+    except (AttributeError, ValueError):
+        return False
+    if algoritmo != "pbkdf2_sha256":
+        return False
+    return hmac.compare_digest(gerar_hash_senha(senha, sal, int(iteracoes)), hash_senha)
+
+
+def _normalizar_email(email):
+    return str(email or "").strip().lower()
+
+
+def administradores():
+    """Emails com acesso à administração (página Diagnóstico).
+
+    Vêm de `NUTRI_ADMINS` (emails separados por vírgula), na variável de
+    ambiente ou em `st.secrets`. Sem a lista, ninguém é administrador.
+    """
+    lista = os.environ.get("NUTRI_ADMINS")
+    if lista is None:
+        try:
+            import streamlit as st
+
+            lista = st.secrets.get("NUTRI_ADMINS")
+        except Exception:
+            lista = None
+    if isinstance(lista, str):
+        lista = lista.split(",")
+    return {_normalizar_email(email) for email in lista or []} - {""}
+
+
+def eh_administrador(email):
+    return bool(email) and _normalizar_email(email) in administradores()
+
+
+def _senha_em_texto(valor):
+    """Senha em texto puro como digitada na planilha, ou None se vazia.
+
+    O Sheets guarda senhas só de dígitos como número, e o pandas as lê como
+    int ou, se a coluna tiver células vazias, como float (1234.0, que o
+    SQLite guarda como "1234.0"); todas voltam a ser "1234".
+    """
+    if valor is None or isinstance(valor, bool):
+        return None
+    if isinstance(valor, numbers.Integral):
+        return str(int(valor))
+    if isinstance(valor, numbers.Real):
+        if math.isnan(valor):
+            return None
+        return str(int(valor)) if float(valor).is_integer() else str(valor)
+    if isinstance(valor, str) and re.fullmatch(r"\d+\.0", valor):
+        return valor[:-2]
+    return str(valor) or None
+
+
+class IndiceCredenciais:
+    """Índice em memória email -> nutricionista, compartilhado pelo processo.
+
+    É um dado de referência (ver `core.referencia.DadoReferencia`): passados
+    `ttl` segundos, é recarregado ao fundo, e o login de quem já está no
+    índice nunca espera a recarga. Cada carga traz antes as linhas novas da
+    planilha (`Repositorio.reconciliar`). Um email desconhecido faz uma
+    recarga na hora, no máximo a cada `intervalo_minimo` segundos e esperando
+    até `espera_recarga` segundos, para um nutricionista recém-incluído na
+    planilha entrar já na primeira tentativa.
+    Senhas em texto puro vindas da planilha são convertidas para hash com sal
+    na carga e gravadas só no banco local, sem o texto original.
+    """
+
+    def __init__(self, repositorio, ttl=TTL_NUTRICIONISTAS, intervalo_minimo=30, espera_recarga=5):
+        self.repositorio = repositorio
+        self.intervalo_minimo = intervalo_minimo
+        self.espera_recarga = espera_recarga
+        self.dados = DadoReferencia("nutricionistas", self._carregar, ttl)
+
+    def _carregar(self, atual):
+        # A planilha também é fonte: um nutricionista incluído direto nela entra na próxima carga
+        try:
+            self.repositorio.reconciliar("Nutricionistas")
+        except Exception:
+            _LOGGER.exception("Sem acesso à planilha; índice de credenciais montado só com o banco local")
+        df = self.repositorio.ler("Nutricionistas")
+        por_email = {}
+        for linha in df.to_dict("records"):
+            email = _normalizar_email(linha.get("email_nutricionista"))
+            if not email:
+                continue
+            hash_senha = linha.get("hash_senha_nutricionista")
+            if not isinstance(hash_senha, str):
+                hash_senha = None
+            senha = _senha_em_texto(linha.get("senha_nutricionista"))
+            if hash_senha is None and senha:
+                hash_senha = gerar_hash_senha(senha)
+                self.repositorio.atualizar(
+                    "Nutricionistas", "id_nutricionista", linha["id_nutricionista"],
+                    {"hash_senha_nutricionista": hash_senha, "senha_nutricionista": None},
+                )
+            por_email[email] = {
+                "id_nutricionista": linha["id_nutricionista"],
+                "email_nutricionista": email,
+                "nome_nutricionista": linha.get("nome_nutricionista"),
+                "hash_senha": hash_senha,
+            }
+        return por_email
+
+    def autenticar(self, email, senha):
+        """Dados do nutricionista se email e senha conferem, senão None."""
+        email = _normalizar_email(email)
+        usuario = self.dados.obter().get(email)
+        if usuario is None:
+            dados = self.dados.recarregar_e_aguardar(self.intervalo_minimo, self.espera_recarga)
+            usuario = dados.get(email)
+        if usuario is None or not verificar_senha(senha, usuario["hash_senha"]):
+            return None
+        return {c: v for c, v in usuario.items() if c != "hash_senha"}
+
+    def nutricionistas(self):
+        """Lista (id, nome) dos nutricionistas cadastrados, sem dados de senha."""
+        return [
+            {"id_nutricionista": u["id_nutricionista"], "nome_nutricionista": u["nome_nutricionista"]}
+            for u in self.dados.obter().values()
+        ]
+
+    def invalidar(self):
+        self.dados.recarregar_em_segundo_plano()
+
+
+_indice = None
+_trava_indice = threading.Lock()
+
+
+def obter_indice_credenciais():
+    global _indice
+    if _indice is None:
+        with _trava_indice:
+            if _indice is None:
+                from core.database import obter_repositorio
+
+                _indice = IndiceCredenciais(obter_repositorio())
+    return _indice
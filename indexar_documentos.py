@@ -0,0 +1,45 @@
+"""Build do índice de busca por palavras-chave do TACO.pdf.
+
+Quebra o PDF em trechos, gera os vetores TF-IDF por hashing de
+`core.documentos` (sem modelo nem rede) e grava um índice FAISS versionado em
+`dados/documentos/<versão>/`. `dados/documentos/manifesto.json` aponta para a
+versão atual e só é trocado depois que a versão nova foi gravada por inteiro;
+as versões além da atual e da anterior são apagadas em seguida.
+Se o sha256 do PDF não mudou, nada é refeito. O app também refaz o índice
+sozinho ao abrir a busca, quando o PDF muda (ver
+`core.documentos.carregar_indice_documentos`).
+
+Uso:
+    python indexar_documentos.py [--origem TACO.pdf] [--destino dados/documentos] [--forcar]
+"""
+import argparse
+import os
+
+from core.documentos import (
+    DIRETORIO_INDICE_DOCUMENTOS,
+    PDF_TACO,
+    construir_indice,
+    indice_atualizado,
+    sha256_arquivo,
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--origem", default=PDF_TACO)
+    parser.add_argument("--destino", default=DIRETORIO_INDICE_DOCUMENTOS)
+    parser.add_argument("--forcar", action="store_true", help="gera nova versão mesmo sem mudanças no PDF")
+    args = parser.parse_args()
+
+    sha_pdf = sha256_arquivo(args.origem)
+    if not args.forcar and indice_atualizado(args.origem, args.destino, sha_pdf):
+        print(f"Índice de {args.origem} já atualizado.")
+        return
+
+    os.makedirs(args.destino, exist_ok=True)
+    manifesto = construir_indice(args.origem, args.destino, sha_pdf)
+    print(f"Índice versão {manifesto['versao']}: {manifesto['trechos']} trechos em {args.destino}")
+
+
+if __name__ == "__main__":
+    main()
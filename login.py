@@ -3,10 +3,12 @@
 def check_password():
     """Returns `True` if the user had a correct password."""
     import streamlit as st
-    from streamlit_gsheets import GSheetsConnection
 
-    conn = st.connection("gsheets", type=GSheetsConnection)
-    df = conn.read(worksheet="Nutricionistas")
+    # Já autenticado: não consulta credenciais a cada rerun.
+    if st.session_state.get("password_correct", False):
+        return True
+
+    from core.usuarios import obter_indice_credenciais
 
     def login_form():
         """Form with widgets to collect user information"""
@@ -17,24 +19,20 @@ def check_password():
 
     def password_entered():
         """Checks whether a password entered by the user is correct."""
-        user_row = df[
-            (df['email_nutricionista'] == st.session_state["email"]) &
-            (df['senha_nutricionista'] == st.session_state["password"])
-        ]
+        user_row = obter_indice_credenciais().autenticar(
+            st.session_state["email"], st.session_state["password"]
+        )
 
-        if not user_row.empty:
+        if user_row is not None:
             st.session_state["password_correct"] = True
-            st.session_state["user"] = user_row['nome_nutricionista'].iloc[0]
-            st.session_state['id_nutricionista'] = user_row['id_nutricionista'].iloc[0]
+            st.session_state["user"] = user_row['nome_nutricionista']
+            st.session_state['id_nutricionista'] = user_row['id_nutricionista']
+            st.session_state['email_nutricionista'] = user_row['email_nutricionista']
             del st.session_state["password"]
             del st.session_state["email"]
         else:
             st.session_state["password_correct"] = False
 
-    # Return True if the username + password is validated.
-    if st.session_state.get("password_correct", False):
-        return True
-
     # Show inputs for username + password.
     login_form()
     if "password_correct" in st.session_state and not st.session_state["password_correct"]:
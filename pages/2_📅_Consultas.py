@@ -14,15 +14,18 @@ if st.sidebar.button("🔒 Logout"):
 
 st.title("🩺 Registrar Consulta")
 
-df_pacientes, df_consultas = ler_pacientes_consultas()
+df_pacientes, df_consultas = ler_pacientes_consultas(st.session_state['id_nutricionista'])
 
-pacientes = df_pacientes[df_pacientes['id_nutricionista'] == st.session_state['id_nutricionista']]["nome_paciente"].dropna().unique()
-paciente_escolhido = st.selectbox("Selecione o paciente:", pacientes)
+pacientes = df_pacientes.dropna(subset=["nome_paciente"])
+nomes_pacientes = dict(zip(pacientes["id_paciente"].astype(int), pacientes["nome_paciente"]))
+id_paciente_escolhido = st.selectbox("Selecione o paciente:", list(nomes_pacientes), format_func=nomes_pacientes.get)
+paciente_escolhido = nomes_pacientes.get(id_paciente_escolhido)
 
 if paciente_escolhido:
 
     st.subheader("📋 Dados da Consulta")
 
+    peso = st.number_input("Peso atual (kg)", min_value=0.0, step=0.1, help="Deixe 0 se não foi medido nesta consulta.")
     queixas = st.text_area("Queixas principais")
     conduta = st.text_area("Conduta ou plano alimentar")
     orientacoes = st.text_area("Orientações gerais")
@@ -37,9 +40,10 @@ if paciente_escolhido:
 
     if st.button("💾 Salvar Consulta"):
         dict_consulta = {
-            "id_consulta": df_consultas['id_consulta'].max() + 1 if not df_consultas.empty else 1,
+            "id_paciente": id_paciente_escolhido,
             "nome_paciente": paciente_escolhido,
             "data_consulta": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "peso_paciente": peso if peso > 0 else None,
             "queixas": queixas,
             "conduta": conduta,
             "orientacoes": orientacoes,
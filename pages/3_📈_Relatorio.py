@@ -1,4 +1,20 @@
+import datetime
+
 import streamlit as st
+from core.anamnese import ler_pacientes
+from core.consultas import ler_consultas
+from core.database import obter_repositorio
+from core.dieta import rotulo_nutriente
+from core.exportacao import (
+    dados_relatorio,
+    exportar_zip,
+    nome_arquivo,
+    pacientes_com_retorno,
+    pdf_relatorio,
+    tarefas_planos,
+)
+from core.referencia import obter_matriz_taco
+from core.relatorio import MACROS_RELATORIO, TOLERANCIA_RETORNO_DIAS, ler_relatorio
 from login import check_password
 
 if not check_password():
@@ -9,89 +25,131 @@ st.sidebar.markdown(f"👤 Logado como: **{st.session_state.get('user', '')}**")
 if st.sidebar.button("🔒 Logout"):
     st.session_state["password_correct"] = False
 
-# st.sidebar.button("Copiar Link para novo Cliente")
-
-
-# def criar_botao_copiar(texto, botao_texto="Copiar para área de transferência", key=None):
-#     """
-#     Cria um botão que copia um texto para a área de transferência quando clicado.
-    
-#     Args:
-#         texto: O texto a ser copiado
-#         botao_texto: O texto a ser exibido no botão
-#         key: Uma chave única para o componente HTML (importante se usar múltiplos botões)
-#     """
-#     if key is None:
-#         key = f"copiar_{hash(texto)}"
-    
-#     # Criar o componente HTML com JavaScript para copiar para a área de transferência
-#     html_code = f"""
-#     <div style="display: flex; align-items: center;">
-#         <p id="texto_{key}" style="margin-right: 10px; overflow: hidden; text-overflow: ellipsis;">{texto}</p>
-#         <button id="botao_{key}" 
-#                 style="background-color: #4CAF50; color: white; border: none; padding: 5px 10px; border-radius: 4px; cursor: pointer;">
-#             {botao_texto}
-#         </button>
-#         <span id="mensagem_{key}" style="margin-left: 10px; color: green; display: none;">Copiado!</span>
-#     </div>
-
-#     <script>
-#         // Aguardar até que o documento esteja totalmente carregado
-#         document.addEventListener('DOMContentLoaded', function() {{
-#             const botao = document.getElementById('botao_{key}');
-#             const texto = '{texto}';
-#             const mensagem = document.getElementById('mensagem_{key}');
-            
-#             botao.addEventListener('click', function() {{
-#                 // Criar um elemento de texto temporário
-#                 const tempInput = document.createElement('textarea');
-#                 tempInput.value = texto;
-                
-#                 // Adicionar à página, selecionar e copiar
-#                 document.body.appendChild(tempInput);
-#                 tempInput.select();
-#                 document.execCommand('copy');
-                
-#                 // Remover o elemento temporário
-#                 document.body.removeChild(tempInput);
-                
-#                 // Mostrar mensagem de confirmação
-#                 mensagem.style.display = 'inline';
-#                 setTimeout(function() {{
-#                     mensagem.style.display = 'none';
-#                 }}, 2000);
-#             }});
-#         }});
-#     </script>
-#     """
-    
-#     # Renderizar o componente HTML
-#     st.components.v1.html(html_code, height=50)
-
-# # Exemplo de uso
-# st.title("Exemplo de Botão para Copiar Link")
-
-# # Link que queremos copiar
-# link = "https://exemplo.com/minha-pagina-especial"
-
-# # Exibir informações
-# st.write("Clique no botão abaixo para copiar o link:")
-
-# # Criar o botão para copiar
-# criar_botao_copiar(link, "📋 Copiar Link")
-
-# # Adicionar um exemplo mais completo
-# st.subheader("Exemplo com vários links")
-
-# links = {
-#     "Link para pré-anamnese": "https://nutri-app.streamlit.app/Pre_Anamnese?id_nutricionista=123",
-#     "Link para agendamento": "https://nutri-app.streamlit.app/Agendar?id_nutricionista=123",
-#     "Link para WhatsApp": "https://wa.me/5511999999999"
-# }
-
-# for titulo, url in links.items():
-#     st.write(f"**{titulo}:**")
-#     criar_botao_copiar(url, "📋 Copiar", key=hash(url))
-#     st.write("---")
-
-# st.write(st.session_state)
\ No newline at end of file
+st.title("📈 Evolução do Paciente")
+
+repo = obter_repositorio()
+df_pacientes = ler_pacientes(st.session_state["id_nutricionista"])
+df_pacientes = df_pacientes.dropna(subset=["nome_paciente"])
+nomes_pacientes = dict(zip(df_pacientes["id_paciente"].astype(int), df_pacientes["nome_paciente"]))
+
+# --- EXPORTAÇÃO EM LOTE DOS PLANOS ---
+with st.sidebar.expander("📦 Exportar planos em lote"):
+    escopo_exportacao = st.radio(
+        "Pacientes", ["Com retorno nesta semana", "Todos os pacientes"], key="escopo_exportacao_key"
+    )
+    if escopo_exportacao == "Todos os pacientes":
+        pacientes_exportacao = nomes_pacientes
+    else:
+        inicio_semana = datetime.date.today() - datetime.timedelta(days=datetime.date.today().weekday())
+        com_retorno = pacientes_com_retorno(
+            ler_consultas(st.session_state["id_nutricionista"]), inicio_semana, inicio_semana + datetime.timedelta(days=6)
+        )
+        pacientes_exportacao = {i: n for i, n in nomes_pacientes.items() if i in com_retorno}
+    st.caption(f"{len(pacientes_exportacao)} paciente(s). Quem não tem plano salvo fica de fora.")
+    id_nutricionista_exportacao = st.session_state["id_nutricionista"]
+    nutricionista_exportacao = st.session_state.get("user", "")
+    # O ZIP só é montado quando o botão é clicado, num arquivo temporário
+    st.download_button(
+        "⬇️ Baixar ZIP dos planos",
+        data=lambda: exportar_zip(
+            tarefas_planos(
+                repo,
+                obter_matriz_taco(),
+                id_nutricionista_exportacao,
+                pacientes_exportacao,
+                nutricionista_exportacao,
+            )
+        ),
+        file_name=f"planos_{datetime.date.today().isoformat()}.zip",
+        mime="application/zip",
+        key="btn_zip_planos_key",
+        disabled=not pacientes_exportacao,
+    )
+
+id_paciente = st.selectbox(
+    "Selecione o paciente:",
+    list(nomes_pacientes),
+    format_func=nomes_pacientes.get,
+    index=None,
+    placeholder="Escolha um paciente",
+)
+if id_paciente is None:
+    st.info("Selecione um paciente para ver a evolução.")
+    st.stop()
+
+# Lê o agregado pré-calculado do paciente (atualizado a cada consulta e plano salvo)
+relatorio = ler_relatorio(st.session_state["id_nutricionista"], id_paciente)
+pesos = relatorio["pesos"]
+retornos = relatorio["retornos"]
+
+# --- RESUMO ---
+col1, col2, col3, col4 = st.columns(4)
+col1.metric("Consultas", relatorio["consultas"])
+col2.metric(
+    "Intervalo médio",
+    f"{relatorio['frequencia_media_dias']:.0f} dias" if relatorio["frequencia_media_dias"] is not None else "—",
+)
+col3.metric("Adesão aos retornos", f"{retornos['adesao']:.0%}" if retornos["adesao"] is not None else "—")
+if not pesos.empty:
+    variacao = pesos["peso_kg"].iloc[-1] - pesos["peso_kg"].iloc[0]
+    col4.metric("Peso atual", f"{pesos['peso_kg'].iloc[-1]:.1f} kg", f"{variacao:+.1f} kg desde o início", delta_color="off")
+else:
+    col4.metric("Peso atual", "—")
+
+if relatorio["ultima_consulta"]:
+    st.caption(f"Primeira consulta em {relatorio['primeira_consulta']}, última em {relatorio['ultima_consulta']}.")
+
+nutricionista_relatorio = st.session_state.get("user", "")
+st.download_button(
+    "📄 Baixar relatório em PDF",
+    data=lambda: pdf_relatorio(dados_relatorio(relatorio, nutricionista_relatorio)),
+    file_name=nome_arquivo("relatorio", id_paciente, nomes_pacientes[id_paciente]),
+    mime="application/pdf",
+    key="btn_pdf_relatorio_key",
+)
+
+# --- PESO E IMC ---
+st.subheader("⚖️ Peso e IMC")
+if pesos.empty:
+    st.info("Nenhum peso registrado. Informe o peso ao registrar as consultas.")
+else:
+    col_peso, col_imc = st.columns(2)
+    with col_peso:
+        st.markdown("**Peso (kg)**")
+        st.line_chart(pesos.set_index("data")["peso_kg"])
+    with col_imc:
+        st.markdown("**IMC**")
+        if "imc" in pesos:
+            st.line_chart(pesos.set_index("data")["imc"])
+        else:
+            st.caption("Altura não informada no cadastro.")
+
+# --- CONSULTAS E RETORNOS ---
+st.subheader("📅 Consultas por mês")
+if relatorio["consultas_por_mes"].empty:
+    st.info("Nenhuma consulta registrada.")
+else:
+    st.bar_chart(relatorio["consultas_por_mes"].set_index("mes")["consultas"])
+
+st.subheader("🔁 Retornos")
+col_ok, col_perdido, col_pendente = st.columns(3)
+col_ok.metric("Cumpridos", retornos["cumpridos"])
+col_perdido.metric("Perdidos", retornos["perdidos"])
+col_pendente.metric("Agendados", retornos["pendentes"])
+st.caption(f"Um retorno conta como cumprido se houve consulta até {TOLERANCIA_RETORNO_DIAS} dias da data marcada.")
+
+# --- DIETAS PRESCRITAS ---
+st.subheader("🍎 Dietas prescritas")
+dietas = relatorio["dietas"]
+if dietas.empty:
+    st.info("Nenhum plano alimentar salvo para este paciente.")
+else:
+    dietas_exibicao = dietas.rename(columns={n: rotulo_nutriente(n) for n in MACROS_RELATORIO})
+    col_kcal, col_macros = st.columns(2)
+    with col_kcal:
+        st.markdown("**Energia por versão do plano**")
+        st.line_chart(dietas_exibicao.set_index("versao")[rotulo_nutriente("kcal")])
+    with col_macros:
+        st.markdown("**Macronutrientes (g) por versão do plano**")
+        st.line_chart(dietas_exibicao.set_index("versao")[[rotulo_nutriente(n) for n in MACROS_RELATORIO[1:]]])
+    st.dataframe(dietas_exibicao, width="stretch", hide_index=True)
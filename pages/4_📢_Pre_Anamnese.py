@@ -1,13 +1,14 @@
 import streamlit as st
 import datetime
-import pandas as pd
 from core.anamnese import copiar_link_streamlit
-from streamlit_gsheets import GSheetsConnection
+from core.database import obter_repositorio
 
-with st.sidebar:
-    st.subheader("Compartilhar")
-    link = f"https://seu-app.streamlit.app/pagina?id={st.session_state.id_nutricionista}"
-    copiar_link_streamlit(link)
+# O link de compartilhamento é só para o nutricionista logado; quem preenche o formulário não tem sessão
+if st.session_state.get("id_nutricionista") is not None:
+    with st.sidebar:
+        st.subheader("Compartilhar")
+        link = f"https://seu-app.streamlit.app/pagina?id={st.session_state.id_nutricionista}"
+        copiar_link_streamlit(link)
 
 try:
     id_nutricionista = st.query_params['id_nutricionista']
@@ -36,9 +37,6 @@ with st.form("pre_anamnese_form"):
 
 if enviado:
     st.success("✅ Informações recebidas com sucesso!")
-    
-    conn = st.connection("gsheets", type=GSheetsConnection)
-    df = conn.read(worksheet="LeadsPacientes")
 
     novo_lead = {
         "nome": nome,
@@ -50,8 +48,6 @@ if enviado:
         "data_envio": datetime.datetime.now(),
     }
 
-    df_novo = pd.DataFrame([novo_lead])
-    df = pd.concat([df, df_novo], ignore_index=True)
-    conn.update(worksheet="LeadsPacientes", data=df)
+    obter_repositorio().inserir("LeadsPacientes", novo_lead)
 
     st.toast("Pré-Anamnese enviada com sucesso! ✨")
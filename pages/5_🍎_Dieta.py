@@ -1,6 +1,22 @@
+import numpy as np
 import streamlit as st
 import pandas as pd
-from streamlit_gsheets import GSheetsConnection
+from core.anamnese import ler_pacientes
+from core.database import obter_repositorio
+from core.busca_alimentos import IndiceBuscaAlimentos
+from core.dieta import (
+    REFEICOES,
+    PlanoDieta,
+    carregar_plano,
+    rotulo_nutriente,
+    salvar_plano,
+    versoes_plano,
+)
+from core.referencia import obter_matriz_taco
+from core.otimizacao import METAS, aplicar_no_plano, alvos_por_refeicao, otimizar_dia
+from core.substituicao import IndiceSubstituicao
+from core.entrada_lote import interpretar_lote
+from core.exportacao import dados_plano, nome_arquivo, pdf_plano
 
 # --- CONFIGURAÇÃO DA PÁGINA E CARREGAMENTO DOS DADOS ---
 
@@ -19,90 +35,102 @@ MAPA_EMOJIS_REFEICOES = {
 st.title("📝 Módulo de Prescrição de Dieta")
 st.markdown("Adicione alimentos a cada refeição para montar o plano alimentar do paciente.")
 
-# Função para carregar e cachear os dados da Tabela TACO
-@st.cache_data(ttl=3600)
-def load_data():
-    # Conexão com o Google Sheets conforme você especificou
-    conn = st.connection("gsheets", type=GSheetsConnection)
-    df = conn.read(worksheet="TACO")
-    
-    # Limpeza e preparação dos dados
-    # Seleciona e renomeia as colunas mais importantes para facilitar o uso
-    colunas_essenciais = {
-        'descricao_alimento': 'Alimento',
-        'porcao_g': 'Porção Padrão (g)', # Embora não usada diretamente no resumo, pode ser útil manter
-        'umidade_pct': 'Umidade (%)', # Idem
-        'kcal': 'Energia (kcal)',
-        'proteina_g': 'Proteínas (g)',
-        'lipideos_g': 'Lipídeos (g)',
-        'carboidrato_g': 'Carboidratos (g)',
-        'fibra_alimentar_g': 'Fibra Alimentar (g)'
+# A Tabela TACO como matriz NumPy (float32), com todas as colunas de nutrientes,
+# ácidos graxos e aminoácidos. Vem do snapshot gerado por tratar_taco.py
+# (memory-map, sem rede); sem ele, é montada a partir das abas do repositório local.
+# Dado de referência do processo: uma única matriz para todas as sessões, sem
+# cópias, recarregada ao fundo quando o snapshot muda (ver core/referencia.py).
+
+# Índice de busca (sem acentos, por prefixo e tolerante a erros), montado uma vez por versão da TACO
+@st.cache_resource
+def load_indice_busca(_matriz, versao_taco, ids_alimentos):
+    return IndiceBuscaAlimentos(_matriz.nomes)
+
+# Vetores de perfil nutricional para sugerir substituições, também uma vez por versão da TACO
+@st.cache_resource
+def load_indice_substituicao(_matriz, versao_taco, ids_alimentos):
+    return IndiceSubstituicao(_matriz)
+
+matriz_taco = obter_matriz_taco()
+if matriz_taco is None:
+    st.error("Coluna 'descricao_alimento' é essencial e não foi encontrada. Verifique sua planilha TACO.")
+    st.stop()
+indice_busca = load_indice_busca(matriz_taco, matriz_taco.versao, tuple(matriz_taco.ids))
+indice_substituicao = load_indice_substituicao(matriz_taco, matriz_taco.versao, tuple(matriz_taco.ids))
+for coluna_ausente in matriz_taco.colunas_ausentes:
+    st.warning(f"Coluna '{coluna_ausente}' não encontrada na planilha. Valores serão considerados 0.")
+
+COL_KCAL = matriz_taco.coluna("kcal")
+COL_PROT = matriz_taco.coluna("proteina_g")
+COL_LIPI = matriz_taco.coluna("lipideos_g")
+COL_CARB = matriz_taco.coluna("carboidrato_g")
+
+# --- PACIENTES DO NUTRICIONISTA LOGADO (PLANOS SALVOS E ALERGIAS) ---
+
+pacientes_nutricionista = {}
+if st.session_state.get("id_nutricionista") is not None:
+    df_pacientes_nutricionista = ler_pacientes(st.session_state["id_nutricionista"])
+    pacientes_nutricionista = {
+        int(linha["id_paciente"]): linha for linha in df_pacientes_nutricionista.to_dict("records")
     }
-    # Garante que apenas colunas existentes sejam selecionadas
-    colunas_presentes = [col for col in colunas_essenciais.keys() if col in df.columns]
-    df_selecionado = df[colunas_presentes].copy()
-    
-    # Renomeia apenas as colunas que foram selecionadas
-    colunas_essenciais_presentes = {k: v for k, v in colunas_essenciais.items() if k in colunas_presentes}
-    df_selecionado.rename(columns=colunas_essenciais_presentes, inplace=True)
-
-    # Define as colunas que DEVEM ser numéricas para o app funcionar
-    colunas_numericas_obrigatorias = ['Energia (kcal)', 'Proteínas (g)', 'Lipídeos (g)', 'Carboidratos (g)']
-
-    # Converte colunas numéricas, tratando erros e valores nulos
-    for col in colunas_numericas_obrigatorias:
-        if col in df_selecionado.columns:
-            df_selecionado[col] = pd.to_numeric(df_selecionado[col], errors='coerce').fillna(0)
-        else:
-            # Se uma coluna obrigatória não existir após renomear, cria com zeros
-            # Isso previne erros se a planilha original não tiver exatamente essas colunas
-            st.warning(f"Coluna '{col}' (originalmente '{[k for k, v in colunas_essenciais.items() if v == col][0]}') não encontrada na planilha. Valores serão considerados 0.")
-            df_selecionado[col] = 0 
-            
-    # Garante que a coluna 'Alimento' exista
-    if 'Alimento' not in df_selecionado.columns:
-        st.error("Coluna 'Alimento' (originalmente 'descricao_alimento') é essencial e não foi encontrada. Verifique sua planilha TACO.")
-        return pd.DataFrame(columns=['Alimento'] + colunas_numericas_obrigatorias)
-
 
-    return df_selecionado
-
-df_taco = load_data()
+def abrir_plano_paciente(matriz, pacientes, versao=None):
+    """Troca o plano da sessão pelo plano salvo do paciente escolhido (ou um plano novo)."""
+    id_paciente = st.session_state.get("paciente_plano_key")
+    if id_paciente is None:
+        st.session_state.dieta_paciente = PlanoDieta(matriz)
+        return
+    id_nutricionista = st.session_state["id_nutricionista"]
+    plano_salvo = carregar_plano(obter_repositorio(), matriz, id_paciente, id_nutricionista, versao)
+    if plano_salvo is None:
+        plano_salvo = PlanoDieta(matriz)
+        plano_salvo.id_paciente, plano_salvo.id_nutricionista = id_paciente, id_nutricionista
+    st.session_state.dieta_paciente = plano_salvo
+    alergias = pacientes[id_paciente].get("alergias_paciente")
+    st.session_state.exclusoes_otimizador_key = "" if pd.isna(alergias) else str(alergias)
 
 # --- INICIALIZAÇÃO DO ESTADO DA SESSÃO ---
 
-if 'dieta_paciente' not in st.session_state:
-    st.session_state.dieta_paciente = {
-        "Café da Manhã": [],
-        "Lanche da Manhã": [],
-        "Almoço": [],
-        "Lanche da Tarde": [],
-        "Jantar": [],
-        "Ceia": []
-    }
+if not isinstance(st.session_state.get('dieta_paciente'), PlanoDieta):
+    st.session_state.dieta_paciente = PlanoDieta(matriz_taco)
+plano = st.session_state.dieta_paciente
 # Para controlar o selectbox de alimentos e permitir reset se necessário
 if 'alimento_selecionado_key' not in st.session_state:
     st.session_state.alimento_selecionado_key = None
+# O selectbox só pode ser resetado antes de ser instanciado: o reset pedido no
+# rerun anterior (após adicionar/limpar) é aplicado aqui.
+if st.session_state.pop('resetar_alimento_selecionado', False):
+    st.session_state.alimento_selecionado_key = None
+    st.session_state.termo_busca_key = ""
+if st.session_state.pop('resetar_lote', False):
+    st.session_state.lote_texto_key = ""
+
+# Totais acumulados pelo plano a cada alteração; reruns de outros widgets não recalculam nada
+totais_refeicoes = plano.totais_por_refeicao()
+totais_dia = plano.totais_dia()
 
 
 # --- LAYOUT DA INTERFACE (SIDEBAR E ÁREA PRINCIPAL) ---
 
 with st.sidebar:
+    if pacientes_nutricionista:
+        st.selectbox(
+            "Paciente",
+            options=list(pacientes_nutricionista),
+            format_func=lambda id_paciente: pacientes_nutricionista[id_paciente]["nome_paciente"],
+            index=None,
+            placeholder="Escolha para abrir ou salvar o plano",
+            key="paciente_plano_key",
+            on_change=abrir_plano_paciente,
+            args=(matriz_taco, pacientes_nutricionista),
+        )
+
     st.header("Resumo Total do Dia")
     
-    total_kcal = 0
-    total_carb = 0
-    total_prot = 0
-    total_lipi = 0
-
-    for refeicao_lista in st.session_state.dieta_paciente.values(): # Renomeado para evitar conflito
-        if refeicao_lista:
-            df_refeicao = pd.DataFrame(refeicao_lista)
-            if not df_refeicao.empty:
-                total_kcal += df_refeicao['Energia (kcal)'].sum()
-                total_carb += df_refeicao['Carboidratos (g)'].sum()
-                total_prot += df_refeicao['Proteínas (g)'].sum()
-                total_lipi += df_refeicao['Lipídeos (g)'].sum()
+    total_kcal = totais_dia[COL_KCAL]
+    total_carb = totais_dia[COL_CARB]
+    total_prot = totais_dia[COL_PROT]
+    total_lipi = totais_dia[COL_LIPI]
     
     col1, col2 = st.columns(2)
     col1.metric("Calorias", f"{total_kcal:.0f} kcal")
@@ -111,13 +139,47 @@ with st.sidebar:
     col2.metric("Lipídeos", f"{total_lipi:.1f} g")
 
     if st.button("🧹 Limpar Dieta Atual"):
-        st.session_state.dieta_paciente = {
-            "Café da Manhã": [], "Lanche da Manhã": [], "Almoço": [],
-            "Lanche da Tarde": [], "Jantar": [], "Ceia": []
-        }
-        st.session_state.alimento_selecionado_key = None # Reseta também o alimento selecionado
+        plano.limpar()
+        st.session_state.resetar_alimento_selecionado = True # Reseta também o alimento selecionado
         st.rerun()
 
+    paciente_pdf = pacientes_nutricionista.get(plano.id_paciente, {}).get("nome_paciente", "")
+    nutricionista_pdf = st.session_state.get("user", "")
+    # O PDF só é desenhado quando o botão é clicado (dados adiados do download_button)
+    st.download_button(
+        "📄 Baixar plano em PDF",
+        data=lambda: pdf_plano(dados_plano(plano, paciente_pdf, nutricionista_pdf)),
+        file_name=nome_arquivo("plano", plano.id_paciente or 0, paciente_pdf),
+        mime="application/pdf",
+        key="btn_pdf_plano_key",
+        disabled=not len(plano),
+    )
+
+    if plano.id_paciente is not None:
+        st.subheader("💾 Plano salvo")
+        if plano.versao:
+            st.caption(f"Editando a partir da versão {plano.versao}.")
+        if st.button("Salvar nova versão", key="btn_salvar_plano_key"):
+            versao_salva = salvar_plano(obter_repositorio(), plano)
+            if versao_salva is None:
+                st.info("Nenhuma alteração desde a última versão salva.")
+            else:
+                st.success(f"Plano salvo (versão {versao_salva}).")
+
+        historico_plano = versoes_plano(obter_repositorio(), plano.id_paciente, plano.id_nutricionista)
+        if not historico_plano.empty:
+            versao_escolhida = st.selectbox(
+                "Histórico",
+                options=historico_plano["versao"].tolist()[::-1],
+                format_func=lambda v: f"Versão {v} — {historico_plano.set_index('versao').at[v, 'criado_em']}",
+                key="versao_plano_key",
+            )
+            if st.button("Abrir esta versão", key="btn_abrir_versao_key"):
+                abrir_plano_paciente(matriz_taco, pacientes_nutricionista, versao_escolhida)
+                st.rerun()
+        if plano.alimentos_ausentes:
+            st.warning(f"{len(plano.alimentos_ausentes)} alimento(s) do plano salvo não existem na TACO atual e ficaram de fora.")
+
 
 # --- ÁREA DE INPUT PARA ADICIONAR ALIMENTOS ---
 st.header("Adicionar Alimento")
@@ -127,43 +189,49 @@ col_refeicao, col_alimento_selecao, col_qtd = st.columns([1, 2, 1])
 with col_refeicao:
     refeicao_selecionada_nome = st.selectbox( # Renomeado para evitar conflito
         "Selecione a Refeição",
-        options=list(st.session_state.dieta_paciente.keys()),
+        options=REFEICOES,
         key="select_refeicao_key" 
     )
 
 with col_alimento_selecao:
+    termo_busca = st.text_input(
+        "Busque um Alimento na Tabela TACO",
+        placeholder="Ex.: feijao carioca, arr int coz...",
+        key="termo_busca_key",
+    )
+    # Resultados ordenados por relevância; sem termo, lista todos os alimentos
+    opcoes_alimentos = indice_busca.buscar_nomes(termo_busca, limite=30) if termo_busca else matriz_taco.nomes
+    if st.session_state.alimento_selecionado_key and st.session_state.alimento_selecionado_key not in opcoes_alimentos:
+        opcoes_alimentos = [st.session_state.alimento_selecionado_key] + opcoes_alimentos
+
     # Usar a chave do session_state para controlar o selectbox
     # Isso permite resetar o selectbox programaticamente se necessário
     alimento_selecionado_nome = st.selectbox(
-        "Busque um Alimento na Tabela TACO",
-        options=df_taco['Alimento'].unique() if 'Alimento' in df_taco else [],
-        placeholder="Digite para buscar...",
+        "Selecione o alimento",
+        options=opcoes_alimentos,
+        placeholder="Escolha entre os resultados..." if termo_busca else "Digite para buscar...",
         index=None, # Começa com o placeholder
         key="alimento_selecionado_key" # Chave para controle
     )
 
     # NOVA SEÇÃO: Exibir resumo do alimento selecionado
     if st.session_state.alimento_selecionado_key: # Verifica se um alimento foi selecionado (usa a chave)
-        # Pega as informações do alimento do df_taco
-        # Garante que a coluna 'Alimento' existe antes de filtrar
-        if 'Alimento' in df_taco.columns:
-            info_alimento_resumo_df = df_taco[df_taco['Alimento'] == st.session_state.alimento_selecionado_key]
-            if not info_alimento_resumo_df.empty:
-                info_alimento_resumo = info_alimento_resumo_df.iloc[0]
-            
-                # Usar st.expander para o resumo, para não ocupar muito espaço por padrão
-                with st.expander(f"Informações para 100g de: {st.session_state.alimento_selecionado_key}", expanded=True):
-                    resumo_c1, resumo_c2 = st.columns(2)
-                    with resumo_c1:
-                        st.metric(label="Energia", value=f"{info_alimento_resumo.get('Energia (kcal)', 0):.0f} kcal")
-                        st.metric(label="Carboidratos", value=f"{info_alimento_resumo.get('Carboidratos (g)', 0):.1f} g")
-                    with resumo_c2:
-                        st.metric(label="Proteínas", value=f"{info_alimento_resumo.get('Proteínas (g)', 0):.1f} g")
-                        st.metric(label="Lipídeos", value=f"{info_alimento_resumo.get('Lipídeos (g)', 0):.1f} g")
-            else:
-                st.caption(f"Informações não encontradas para {st.session_state.alimento_selecionado_key} no DataFrame processado.")
+        # Busca O(1) da linha do alimento na matriz TACO
+        linha_resumo = matriz_taco.linha_por_nome.get(st.session_state.alimento_selecionado_key)
+        if linha_resumo is not None:
+            info_alimento_resumo = matriz_taco.por_100g(linha_resumo)
+        
+            # Usar st.expander para o resumo, para não ocupar muito espaço por padrão
+            with st.expander(f"Informações para 100g de: {st.session_state.alimento_selecionado_key}", expanded=True):
+                resumo_c1, resumo_c2 = st.columns(2)
+                with resumo_c1:
+                    st.metric(label="Energia", value=f"{info_alimento_resumo[COL_KCAL]:.0f} kcal")
+                    st.metric(label="Carboidratos", value=f"{info_alimento_resumo[COL_CARB]:.1f} g")
+                with resumo_c2:
+                    st.metric(label="Proteínas", value=f"{info_alimento_resumo[COL_PROT]:.1f} g")
+                    st.metric(label="Lipídeos", value=f"{info_alimento_resumo[COL_LIPI]:.1f} g")
         else:
-            st.caption("Coluna 'Alimento' não disponível para buscar informações.")
+            st.caption(f"Informações não encontradas para {st.session_state.alimento_selecionado_key} na Tabela TACO.")
 
 
 with col_qtd:
@@ -172,30 +240,15 @@ with col_qtd:
 # Botão de adicionar Alimento, posicionado abaixo das colunas de input para melhor fluxo
 if st.button("✅ Adicionar Alimento ao Plano", key="btn_adicionar_alimento_key"):
     if st.session_state.alimento_selecionado_key and quantidade_g > 0:
-        if 'Alimento' in df_taco.columns:
-            info_alimento_para_adicionar_df = df_taco[df_taco['Alimento'] == st.session_state.alimento_selecionado_key]
-            if not info_alimento_para_adicionar_df.empty:
-                info_alimento_para_adicionar = info_alimento_para_adicionar_df.iloc[0]
-                fator = quantidade_g / 100 
-                
-                alimento_para_dieta = {
-                    'Alimento': st.session_state.alimento_selecionado_key,
-                    'Quantidade (g)': quantidade_g,
-                    'Energia (kcal)': info_alimento_para_adicionar.get('Energia (kcal)', 0) * fator,
-                    'Carboidratos (g)': info_alimento_para_adicionar.get('Carboidratos (g)', 0) * fator,
-                    'Proteínas (g)': info_alimento_para_adicionar.get('Proteínas (g)', 0) * fator,
-                    'Lipídeos (g)': info_alimento_para_adicionar.get('Lipídeos (g)', 0) * fator,
-                }
-                
-                st.session_state.dieta_paciente[refeicao_selecionada_nome].append(alimento_para_dieta)
-                st.success(f"{st.session_state.alimento_selecionado_key} ({quantidade_g}g) adicionado ao {refeicao_selecionada_nome}!")
-                # Opcional: Resetar a seleção do alimento para facilitar a próxima adição
-                st.session_state.alimento_selecionado_key = None 
-                st.rerun() # Força o rerun para atualizar o selectbox e o resumo
-            else:
-                st.warning(f"Não foi possível encontrar os dados para '{st.session_state.alimento_selecionado_key}' para adicionar ao plano.")
+        linha_adicionar = matriz_taco.linha_por_nome.get(st.session_state.alimento_selecionado_key)
+        if linha_adicionar is not None:
+            plano.adicionar(refeicao_selecionada_nome, matriz_taco.ids[linha_adicionar], quantidade_g)
+            st.success(f"{st.session_state.alimento_selecionado_key} ({quantidade_g}g) adicionado ao {refeicao_selecionada_nome}!")
+            # Opcional: Resetar a seleção do alimento para facilitar a próxima adição
+            st.session_state.resetar_alimento_selecionado = True
+            st.rerun() # Força o rerun para atualizar o selectbox e o resumo
         else:
-            st.warning("Não é possível adicionar alimento pois a coluna 'Alimento' não existe nos dados carregados.")
+            st.warning(f"Não foi possível encontrar os dados para '{st.session_state.alimento_selecionado_key}' para adicionar ao plano.")
             
     elif not st.session_state.alimento_selecionado_key:
         st.warning("Por favor, selecione um alimento.")
@@ -203,47 +256,225 @@ if st.button("✅ Adicionar Alimento ao Plano", key="btn_adicionar_alimento_key"
         st.warning("Por favor, insira uma quantidade válida (maior que 0).")
 
 
+# --- ENTRADA EM LOTE: VÁRIOS ALIMENTOS COM UM ÚNICO RERUN ---
+with st.expander("📋 Adicionar vários alimentos de uma vez"):
+    texto_lote = st.text_area(
+        "Cole uma refeição por linha",
+        placeholder="Café da Manhã: pão francês 50g, queijo minas frescal 30g\nAlmoço: arroz integral cozido 120g; feijão carioca cozido 80g",
+        key="lote_texto_key",
+    )
+    itens_lote = interpretar_lote(texto_lote, indice_busca, refeicao_padrao=refeicao_selecionada_nome) if texto_lote.strip() else []
+    prontos_lote = []
+    for numero_item, item_lote in enumerate(itens_lote):
+        descricao_item = f"**{item_lote['refeicao']}** · {item_lote['texto'] or '—'} · " + (
+            f"{item_lote['gramas']:.0f} g" if item_lote["gramas"] else "sem quantidade"
+        )
+        if item_lote["opcoes"] and item_lote["gramas"]:
+            linha_escolhida = st.selectbox(
+                f"{descricao_item} — nome ambíguo, escolha o alimento",
+                options=item_lote["opcoes"],
+                format_func=lambda linha: matriz_taco.nomes[linha],
+                key=f"lote_escolha_{numero_item}_{item_lote['texto']}",
+            )
+            prontos_lote.append((item_lote["refeicao"], matriz_taco.ids[linha_escolhida], item_lote["gramas"]))
+        elif item_lote["erro"]:
+            st.error(f"{descricao_item} — {item_lote['erro']}")
+        else:
+            st.markdown(f"✅ {descricao_item} → {matriz_taco.nomes[item_lote['linha']]}")
+            prontos_lote.append((item_lote["refeicao"], matriz_taco.ids[item_lote["linha"]], item_lote["gramas"]))
+
+    if st.button(f"✅ Adicionar {len(prontos_lote)} alimento(s) ao plano", key="btn_lote_key", disabled=not prontos_lote):
+        plano.adicionar_varios(prontos_lote)
+        st.session_state.resetar_lote = True
+        st.rerun()
+
+
+# --- COMPLETAR O PLANO POR METAS (OTIMIZADOR) ---
+with st.expander("🤖 Completar plano automaticamente por metas"):
+    exclusoes = st.text_input(
+        "Alergias e intolerâncias a excluir",
+        placeholder="Ex.: lactose, amendoim, frutos do mar",
+        key="exclusoes_otimizador_key",
+    )
+
+    st.markdown("**Metas do dia**")
+    metas_padrao = {"kcal": 2000, "proteina_g": 100, "carboidrato_g": 250, "lipideos_g": 65, "fibra_alimentar_g": 30}
+    metas_dia = {}
+    for coluna_meta, nutriente in zip(st.columns(len(METAS)), METAS):
+        metas_dia[nutriente] = coluna_meta.number_input(
+            rotulo_nutriente(nutriente), min_value=0, value=metas_padrao[nutriente], key=f"meta_dia_{nutriente}"
+        )
+
+    st.markdown("**Metas por refeição** (editáveis; zere uma refeição para deixá-la de fora)")
+    tabela_metas = pd.DataFrame(alvos_por_refeicao(metas_dia)).T.round(1)
+    tabela_metas.columns = [rotulo_nutriente(n) for n in METAS]
+    tabela_metas = st.data_editor(
+        tabela_metas,
+        width="stretch",
+        key="metas_refeicoes_" + "_".join(str(v) for v in metas_dia.values()),
+    )
+
+    usar_iniciais = st.checkbox("Partir dos alimentos já adicionados ao plano", value=True, key="otimizador_iniciais_key")
+    somente_iniciais = st.checkbox(
+        "Só ajustar as quantidades dos alimentos já adicionados",
+        value=False,
+        key="otimizador_somente_iniciais_key",
+        disabled=not usar_iniciais,
+    )
+
+    if st.button("✨ Completar plano", key="btn_otimizar_key"):
+        metas_por_refeicao = {
+            refeicao: dict(zip(METAS, (float(v) for v in linha)))
+            for refeicao, linha in zip(tabela_metas.index, tabela_metas.to_numpy())
+        }
+        iniciais = {}
+        if usar_iniciais:
+            for codigo_refeicao, nome_refeicao in enumerate(REFEICOES):
+                iniciais[nome_refeicao] = plano.linhas[plano.refeicoes == codigo_refeicao].tolist()
+        try:
+            solucao = otimizar_dia(
+                matriz_taco,
+                metas_por_refeicao,
+                alergias=exclusoes,
+                iniciais=iniciais,
+                somente_iniciais=usar_iniciais and somente_iniciais,
+            )
+        except ValueError as erro:
+            st.error(str(erro))
+        else:
+            aplicar_no_plano(plano, solucao)
+            st.rerun()
+
+
 st.divider()
 
-# --- EXIBIÇÃO DA DIETA COMPLETA (VERSÃO INTERATIVA COM BOTÃO DE REMOÇÃO) ---
+# --- EXIBIÇÃO DA DIETA COMPLETA (UMA TABELA EDITÁVEL POR REFEIÇÃO) ---
 st.header("Plano Alimentar do Paciente")
 
-for nome_refeicao, alimentos_lista in st.session_state.dieta_paciente.items(): # Renomeado para evitar conflito
-    if alimentos_lista:  
+# Colunas das tabelas: só leitura, menos a ordem e a quantidade
+NUTRIENTES_TABELA = ["kcal", "carboidrato_g", "proteina_g", "lipideos_g"]
+CONFIG_TABELA = {
+    "ordem": st.column_config.NumberColumn(
+        "Ordem", min_value=1, step=1, width="small",
+        help="Mude o número para mover o alimento; num empate, o alimento editado fica antes.",
+    ),
+    "alimento": st.column_config.TextColumn("Alimento", disabled=True, width="large"),
+    "gramas": st.column_config.NumberColumn("Qtd (g)", min_value=1, step=1, format="%.0f", required=True),
+    **{
+        nutriente: st.column_config.NumberColumn(rotulo, disabled=True, format="%.1f")
+        for nutriente, rotulo in zip(NUTRIENTES_TABELA, ["Kcal", "Carbs (g)", "Prot (g)", "Lip (g)"])
+    },
+}
+
+
+def aplicar_edicoes_tabelas(plano):
+    """Aplica as edições pendentes de todas as tabelas do formulário, uma refeição por vez.
+
+    Roda como callback do botão do formulário, antes do rerun: o estado de
+    cada `st.data_editor` traz só o que mudou (linhas editadas e removidas,
+    pela posição na tabela), aplicado sobre os itens que a tabela mostrava.
+    """
+    for codigo_refeicao, nome_refeicao in enumerate(REFEICOES):
+        edicoes = st.session_state.get(f"tabela_refeicao_{codigo_refeicao}")
+        posicoes = np.flatnonzero(plano.refeicoes == codigo_refeicao)
+        if not edicoes or not len(posicoes):
+            continue
+        removidas = set(edicoes.get("deleted_rows", []))
+        linhas_tabela = []
+        for numero, posicao in enumerate(posicoes):
+            if numero in removidas:
+                continue
+            editado = edicoes.get("edited_rows", {}).get(numero, {})
+            ordem = editado.get("ordem")
+            linhas_tabela.append((
+                numero + 1 if ordem is None else ordem,
+                "ordem" not in editado,
+                numero,
+                int(plano.id_itens[posicao]),
+                editado.get("gramas") or float(plano.gramas[posicao]),
+            ))
+        linhas_tabela.sort()
+        plano.editar_refeicao(nome_refeicao, [l[3] for l in linhas_tabela], [l[4] for l in linhas_tabela])
+
+
+with st.form("tabelas_plano_form", border=False):
+    for codigo_refeicao, nome_refeicao in enumerate(REFEICOES):
+        tabela_refeicao = plano.tabela_refeicao(nome_refeicao, NUTRIENTES_TABELA)
+        if tabela_refeicao.empty:
+            continue
         emoji_refeicao = MAPA_EMOJIS_REFEICOES.get(nome_refeicao, "🍽️")
         st.subheader(f"{emoji_refeicao} {nome_refeicao}")
-        
-        col_header_1, col_header_2, col_header_3, col_header_4, col_header_5, col_header_6 = st.columns([3, 1.2, 1, 1, 1, 1])
-        headers = ['Alimento', 'Qtd (g)', 'Kcal', 'Carbs (g)', 'Prot (g)', 'Ação']
-        
-        col_map = [col_header_1, col_header_2, col_header_3, col_header_4, col_header_5, col_header_6]
-        for col, header_text in zip(col_map, headers):
-            col.markdown(f"**{header_text}**")
+        tabela_refeicao.insert(0, "ordem", np.arange(1, len(tabela_refeicao) + 1))
+        # Uma única grade por refeição, qualquer que seja o tamanho do plano; a
+        # identidade do editor inclui os dados, então ele recomeça limpo quando
+        # o plano muda
+        st.data_editor(
+            tabela_refeicao,
+            column_config=CONFIG_TABELA,
+            hide_index=True,
+            num_rows="delete",
+            width="stretch",
+            key=f"tabela_refeicao_{codigo_refeicao}",
+        )
+
+        total_refeicao = totais_refeicoes[codigo_refeicao]
+        st.info(f"**Total da Refeição:** "
+                f"**{total_refeicao[COL_KCAL]:.0f} kcal** | "
+                f"**P:** {total_refeicao[COL_PROT]:.1f}g | "
+                f"**C:** {total_refeicao[COL_CARB]:.1f}g | "
+                f"**L:** {total_refeicao[COL_LIPI]:.1f}g")
+    if len(plano):
+        st.caption("Edite as quantidades, a ordem ou selecione linhas para excluir; nada muda até aplicar.")
+    st.form_submit_button(
+        "✅ Aplicar alterações", on_click=aplicar_edicoes_tabelas, args=(plano,), disabled=not len(plano)
+    )
 
-        for i, alimento_item in enumerate(alimentos_lista): # Renomeado para evitar conflito
-            col_data_1, col_data_2, col_data_3, col_data_4, col_data_5, col_data_6 = st.columns([3, 1.2, 1, 1, 1, 1])
-            
-            col_data_1.write(alimento_item.get('Alimento', 'N/A'))
-            col_data_2.write(f"{alimento_item.get('Quantidade (g)', 0):.0f}")
-            col_data_3.write(f"{alimento_item.get('Energia (kcal)', 0):.1f}")
-            col_data_4.write(f"{alimento_item.get('Carboidratos (g)', 0):.1f}")
-            col_data_5.write(f"{alimento_item.get('Proteínas (g)', 0):.1f}")
-            
-            if col_data_6.button("🗑️ Remover", key=f"remove_{nome_refeicao}_{i}"):
-                st.session_state.dieta_paciente[nome_refeicao].pop(i)
+# --- SUBSTITUIÇÕES EQUIVALENTES (UM ITEM POR VEZ) ---
+if len(plano):
+    with st.expander("🔁 Substituir um alimento por um equivalente"):
+        equivalencia_substituicao = st.radio(
+            "Substituições equivalentes em",
+            options=["kcal", "proteina_g"],
+            format_func={"kcal": "Calorias", "proteina_g": "Proteínas"}.get,
+            horizontal=True,
+            key="equivalencia_substituicao_key",
+        )
+        # Itens na ordem das refeições; um id que saiu do plano fica sem rótulo até o seletor recomeçar
+        posicoes_itens = {int(plano.id_itens[p]): p for p in np.argsort(plano.refeicoes, kind="stable")}
+        id_item_substituir = st.selectbox(
+            "Alimento do plano",
+            options=list(posicoes_itens),
+            format_func=lambda id_item: (
+                f"{REFEICOES[plano.refeicoes[posicoes_itens[id_item]]]} · "
+                f"{matriz_taco.nomes[plano.linhas[posicoes_itens[id_item]]]} · {plano.gramas[posicoes_itens[id_item]]:.0f} g"
+            ) if id_item in posicoes_itens else "",
+            key="item_substituir_key",
+        )
+        substitutos = indice_substituicao.substitutos(
+            plano.linha(id_item_substituir),
+            float(plano.gramas[posicoes_itens[id_item_substituir]]),
+            k=5,
+            por=equivalencia_substituicao,
+            alergias=st.session_state.get("exclusoes_otimizador_key"),
+        )
+        if not substitutos and equivalencia_substituicao == "proteina_g":
+            st.caption("Sem substitutos: o alimento não tem proteína para equivaler; tente por calorias.")
+        elif not substitutos:
+            st.caption("Sem dados nutricionais para sugerir substitutos.")
+        for linha_substituto, gramas_substituto, _ in substitutos:
+            col_sub_nome, col_sub_botao = st.columns([3, 1])
+            col_sub_nome.write(f"{matriz_taco.nomes[linha_substituto]} — {gramas_substituto:.0f} g")
+            if col_sub_botao.button("Trocar", key=f"trocar_{id_item_substituir}_{linha_substituto}"):
+                plano.substituir(id_item_substituir, matriz_taco.ids[linha_substituto], gramas_substituto)
                 st.rerun()
 
-        df_refeicao_view = pd.DataFrame(alimentos_lista)
-        if not df_refeicao_view.empty:
-            total_refeicao_kcal = df_refeicao_view['Energia (kcal)'].sum()
-            total_refeicao_prot = df_refeicao_view['Proteínas (g)'].sum()
-            total_refeicao_carb = df_refeicao_view['Carboidratos (g)'].sum()
-            total_refeicao_lipi = df_refeicao_view['Lipídeos (g)'].sum()
-
-            st.info(f"**Total da Refeição:** "
-                    f"**{total_refeicao_kcal:.0f} kcal** | "
-                    f"**P:** {total_refeicao_prot:.1f}g | "
-                    f"**C:** {total_refeicao_carb:.1f}g | "
-                    f"**L:** {total_refeicao_lipi:.1f}g")
-        st.markdown("---") # Adiciona uma linha divisória após cada refeição
-
+if len(plano):
+    with st.expander("🔬 Perfil nutricional completo (micronutrientes, ácidos graxos e aminoácidos)"):
+        perfil = plano.perfil_completo(totais_refeicoes)
+        for grupo, perfil_grupo in perfil.groupby("Grupo", sort=False):
+            st.markdown(f"**{grupo}**")
+            st.dataframe(
+                perfil_grupo.drop(columns="Grupo").set_index("Nutriente"),
+                width="stretch",
+                column_config={c: st.column_config.NumberColumn(format="%.2f") for c in perfil_grupo.columns[2:]},
+            )
@@ -0,0 +1,44 @@
+import os
+
+import streamlit as st
+from core.documentos import PDF_TACO, carregar_indice_documentos
+from login import check_password
+
+if not check_password():
+    st.stop()
+
+st.sidebar.markdown(f"👤 Logado como: **{st.session_state.get('user', '')}**")
+
+if st.sidebar.button("🔒 Logout"):
+    st.session_state["password_correct"] = False
+
+st.title("📚 Consulta à TACO")
+st.markdown(
+    "Pesquise por palavras-chave a metodologia, as notas e as tabelas do documento da TACO (4ª edição). "
+    "A busca procura as palavras digitadas, não sinônimos."
+)
+
+# Índice FAISS em memory-map, aberto uma vez por processo; feito na primeira busca e refeito só se o PDF mudar
+@st.cache_resource
+def load_indice_documentos(modificado_em):
+    return carregar_indice_documentos()
+
+indice_documentos = load_indice_documentos(os.path.getmtime(PDF_TACO) if os.path.exists(PDF_TACO) else None)
+if indice_documentos is None:
+    st.error(f"Índice do {PDF_TACO} não encontrado. Rode `python indexar_documentos.py`.")
+    st.stop()
+
+consulta = st.text_input(
+    "O que você procura?",
+    placeholder="Ex.: fibra alimentar determinação, traços Tr",
+    key="consulta_taco_key",
+)
+quantidade = st.slider("Resultados", min_value=1, max_value=15, value=5, key="quantidade_consulta_taco_key")
+
+if consulta.strip():
+    resultados = indice_documentos.buscar(consulta, limite=quantidade)
+    if not resultados:
+        st.info("Nenhum trecho encontrado. Tente outras palavras.")
+    for trecho, pontuacao in resultados:
+        with st.expander(f"Página {trecho['pagina']} do PDF · relevância {pontuacao:.2f}", expanded=True):
+            st.text(trecho["texto"])
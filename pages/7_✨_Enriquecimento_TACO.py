@@ -0,0 +1,95 @@
+import pandas as pd
+import streamlit as st
+from core.enriquecimento import (
+    CONCORRENCIA_PADRAO,
+    REQUISICOES_POR_SEGUNDO,
+    TAREFAS,
+    URL_PADRAO,
+    CacheEnriquecimento,
+    ClienteGemini,
+    enriquecer,
+)
+from core.referencia import obter_matriz_taco
+from login import check_password
+
+if not check_password():
+    st.stop()
+
+st.sidebar.markdown(f"👤 Logado como: **{st.session_state.get('user', '')}**")
+
+if st.sidebar.button("🔒 Logout"):
+    st.session_state["password_correct"] = False
+
+st.title("✨ Enriquecimento da Tabela TACO")
+st.markdown("Gera anotações por alimento (emojis, etiquetas) com um LLM. O que já foi gerado fica salvo e não é pedido de novo.")
+
+# Cache das anotações em disco (uma conexão SQLite por thread), compartilhado pelas sessões
+@st.cache_resource
+def load_cache_enriquecimento():
+    return CacheEnriquecimento()
+
+# A mesma matriz TACO das outras páginas (dado de referência do processo)
+matriz_taco = obter_matriz_taco()
+if matriz_taco is None:
+    st.error("Tabela TACO não encontrada.")
+    st.stop()
+
+cache = load_cache_enriquecimento()
+nome_tarefa = st.selectbox("Anotação", list(TAREFAS), format_func=str.capitalize, key="tarefa_enriquecimento_key")
+col_concorrencia, col_taxa = st.columns(2)
+concorrencia = col_concorrencia.number_input(
+    "Requisições simultâneas", min_value=1, max_value=32, value=CONCORRENCIA_PADRAO, key="concorrencia_enriquecimento_key"
+)
+taxa = col_taxa.number_input(
+    "Limite de requisições por segundo",
+    min_value=0.5,
+    max_value=50.0,
+    value=REQUISICOES_POR_SEGUNDO,
+    step=0.5,
+    key="taxa_enriquecimento_key",
+)
+
+alimentos = list(zip(matriz_taco.ids.tolist(), matriz_taco.nomes))
+prontos = cache.obter(nome_tarefa)
+faltando = sum(1 for id_alimento, _ in alimentos if id_alimento not in prontos)
+st.caption(f"{len(alimentos) - faltando} de {len(alimentos)} alimentos já anotados.")
+
+cliente = ClienteGemini()
+if cliente.chave is None and cliente.url == URL_PADRAO:
+    st.warning("Defina GEMINI_API_KEY (variável de ambiente ou secrets.toml) para gerar as anotações.")
+
+if st.button(f"🚀 Gerar para {faltando} alimento(s)", key="btn_enriquecer_key", disabled=not faltando):
+    barra = st.progress(0.0, text="Gerando...")
+    resumo = enriquecer(
+        alimentos,
+        nome_tarefa,
+        cliente,
+        cache,
+        concorrencia=int(concorrencia),
+        taxa=float(taxa),
+        ao_progredir=lambda feitos, total: barra.progress(feitos / total, text=f"{feitos} de {total}"),
+    )
+    if resumo["interrompido"]:
+        st.error(f"Geração interrompida: {resumo['interrompido']}")
+    elif resumo["falhas"]:
+        st.warning(f"{len(resumo['falhas'])} alimento(s) falharam; clique de novo para tentar só esses.")
+    st.success(f"{resumo['novos']} anotação(ões) nova(s).")
+    prontos = cache.obter(nome_tarefa)
+
+if prontos:
+    st.subheader("Anotações")
+    tabela = pd.DataFrame(
+        [(id_alimento, nome, prontos[id_alimento]) for id_alimento, nome in alimentos if id_alimento in prontos],
+        columns=["id_alimento", "Alimento", nome_tarefa.capitalize()],
+    )
+    st.dataframe(tabela, width="stretch", hide_index=True)
+    st.download_button(
+        "📥 Baixar como CSV",
+        data=tabela.to_csv(index=False).encode("utf-8"),
+        file_name=f"taco_{nome_tarefa}.csv",
+        mime="text/csv",
+        key="btn_csv_enriquecimento_key",
+    )
+    if st.button("🗑️ Apagar anotações desta tarefa", key="btn_apagar_enriquecimento_key"):
+        cache.remover(nome_tarefa)
+        st.rerun()
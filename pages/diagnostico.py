@@ -0,0 +1,154 @@
+import datetime
+import os
+
+import pandas as pd
+import streamlit as st
+from core.cache import obter_cache
+from core.database import CAMINHO_BANCO_PADRAO, obter_repositorio
+from core.instrumentacao import obter_metricas
+from core.referencia import referencias
+from core.usuarios import eh_administrador
+from login import check_password
+
+if not check_password():
+    st.stop()
+
+if not eh_administrador(st.session_state.get("email_nutricionista")):
+    st.error("Acesso restrito aos administradores (lista `NUTRI_ADMINS`).")
+    st.stop()
+
+st.sidebar.markdown(f"👤 Logado como: **{st.session_state.get('user', '')}**")
+
+if st.sidebar.button("🔒 Logout"):
+    st.session_state["password_correct"] = False
+
+st.title("🛠️ Diagnóstico")
+st.markdown("Tempo de cada rerun, leituras e escritas no banco e caches deste processo, desde que o servidor subiu.")
+
+metricas = obter_metricas()
+series = pd.DataFrame(metricas.series())
+colunas_tempo = ["quantidade", "media_ms", "p50_ms", "p95_ms", "p99_ms", "maximo_ms"]
+
+
+def tabela_series(nome, rotulos):
+    """Séries de um tipo de medição, uma linha por rótulo."""
+    if series.empty or nome not in set(series["nome"]):
+        return pd.DataFrame()
+    df = series[series["nome"] == nome]
+    return df[[r for r in rotulos if r in df] + colunas_tempo + ["linhas", "erros"]].round(1)
+
+
+# --- RERUNS ---
+st.subheader("⏱️ Reruns por página")
+reruns = pd.DataFrame(metricas.reruns())
+por_pagina = tabela_series("rerun", ["pagina"])
+if por_pagina.empty or reruns.empty:
+    st.info("Nenhum rerun medido ainda.")
+else:
+    st.dataframe(por_pagina.drop(columns=["linhas"]), width="stretch", hide_index=True)
+    ultimo = reruns.iloc[-1]
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Último rerun", f"{ultimo['ms']:.0f} ms", ultimo["pagina"], delta_color="off")
+    col2.metric("I/O no último rerun", f"{ultimo['ms_io']:.0f} ms", f"{ultimo['leituras']} leituras, {ultimo['escritas']} escritas", delta_color="off")
+    col3.metric("Linhas lidas/gravadas", int(ultimo["linhas"]))
+    if pd.notna(ultimo["bytes_sessao"]):
+        col4.metric("Session state", f"{ultimo['bytes_sessao'] / 1024:.0f} KB", f"{ultimo['chaves_sessao']:.0f} chaves", delta_color="off")
+    with st.expander(f"Últimos {len(reruns)} reruns"):
+        st.dataframe(reruns.iloc[::-1].round(1), width="stretch", hide_index=True)
+
+# --- I/O ---
+st.subheader("💾 Leituras e escritas por aba")
+io = pd.concat([tabela_series("leitura", ["aba"]).assign(operacao="leitura"), tabela_series("escrita", ["aba"]).assign(operacao="escrita")])
+if io.empty:
+    st.info("Nenhuma leitura ou escrita medida ainda.")
+else:
+    st.dataframe(io[["operacao"] + [c for c in io if c != "operacao"]], width="stretch", hide_index=True)
+    opcoes = list(io[["operacao", "aba"]].itertuples(index=False, name=None))
+    escolhida = st.selectbox("Histograma de latência", opcoes, format_func=lambda o: f"{o[0]} · {o[1]}", key="histograma_io_key")
+    faixas = metricas.histograma(escolhida[0], aba=escolhida[1])
+    st.bar_chart(pd.DataFrame(
+        {"faixa": [f"≤ {l} ms" if l is not None else "> 10 s" for l, _ in faixas], "quantidade": [c for _, c in faixas]}
+    ).set_index("faixa"), sort=False)
+
+planilha = tabela_series("planilha", ["operacao", "aba"])
+if not planilha.empty:
+    st.markdown("**Google Sheets**")
+    st.dataframe(planilha, width="stretch", hide_index=True)
+
+# --- FUNÇÕES ---
+st.subheader("⚙️ Funções do core")
+funcoes = tabela_series("core", ["funcao"])
+if funcoes.empty:
+    st.info("Nenhuma função medida ainda.")
+else:
+    st.dataframe(funcoes.drop(columns=["linhas"]), width="stretch", hide_index=True)
+
+# --- CACHES ---
+st.subheader("🗄️ Caches")
+estatisticas = obter_cache().estatisticas()
+col1, col2, col3, col4 = st.columns(4)
+col1.metric("Entradas", estatisticas["entradas"])
+leituras = estatisticas["acertos"] + estatisticas["faltas"]
+col2.metric("Acertos", estatisticas["acertos"], f"{estatisticas['acertos'] / leituras:.0%}" if leituras else None, delta_color="off")
+col3.metric("Invalidadas", estatisticas["invalidadas"])
+col4.metric("Expiradas/despejadas", estatisticas["expiradas"] + estatisticas["despejadas"])
+st.dataframe(
+    pd.DataFrame([
+        {"dado": nome, **dado.estatisticas(), "erro": str(dado.erro) if dado.erro else ""}
+        for nome, dado in referencias().items()
+    ]).round(1),
+    width="stretch",
+    hide_index=True,
+)
+st.caption("Dados de referência só são recarregados pelo ttl: escritas nas abas não mexem neles.")
+
+# --- SINCRONIZAÇÃO ---
+st.subheader("🔄 Fila de sincronização")
+repositorio = obter_repositorio()
+if repositorio.sincronizador is None:
+    st.info("Sem planilha configurada: nada é sincronizado.")
+else:
+    descartados = repositorio.local.descartados()
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Na fila", repositorio.local.tamanho_fila())
+    col2.metric("Lotes enviados", repositorio.sincronizador.lotes_enviados)
+    col3.metric("Descartados", len(descartados))
+    if repositorio.sincronizador.ultimo_erro:
+        st.caption(f"Último erro: {repositorio.sincronizador.ultimo_erro}")
+    if repositorio.erro_reconciliacao:
+        st.caption(f"Último erro ao trazer linhas novas da planilha: {repositorio.erro_reconciliacao}")
+    quarentena = repositorio.local.quarentena()
+    if not quarentena.empty:
+        st.warning(
+            f"{len(quarentena)} linha(s) da planilha repetem o ID de outra linha da mesma aba e não foram "
+            "importadas. Corrija o ID na planilha; a linha entra na próxima reconciliação."
+        )
+        st.dataframe(quarentena, width="stretch", hide_index=True)
+    if not descartados.empty:
+        st.warning("Estas linhas esgotaram as tentativas de envio e não estão na planilha.")
+        st.dataframe(descartados, width="stretch", hide_index=True)
+        if st.button("↩️ Reenfileirar descartados", key="btn_reenfileirar_key"):
+            repositorio.local.reenfileirar_descartados()
+            repositorio.sincronizador.notificar()
+            st.rerun()
+
+# --- EXPORTAÇÃO ---
+st.subheader("📤 Exportar")
+st.download_button(
+    "⬇️ Baixar métricas (JSON lines)",
+    data=lambda: metricas.linhas_jsonl(),
+    file_name=f"metricas_{datetime.datetime.now():%Y%m%d_%H%M%S}.jsonl",
+    mime="application/jsonl",
+    key="btn_metricas_jsonl_key",
+)
+if metricas.arquivo_jsonl:
+    st.caption(f"Cada medição também está sendo gravada em `{metricas.arquivo_jsonl}`.")
+else:
+    st.caption("Para gravar cada medição em arquivo, suba o app com `NUTRI_METRICAS_JSONL=caminho.jsonl`.")
+if st.button("🧹 Zerar métricas", key="btn_zerar_metricas_key"):
+    metricas.limpar()
+    st.rerun()
+
+with st.expander("Banco de dados"):
+    st.write(os.environ.get("NUTRI_DB_PATH", CAMINHO_BANCO_PADRAO))
+    st.write("https://docs.google.com/spreadsheets/d/15bnS_LOyRG-M8ezTW8UeOLr3P6RPqTptYKXK2083fNA/edit?gid=171359471#gid=171359471")
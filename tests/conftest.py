@@ -0,0 +1,18 @@
+import numpy as np
+import pytest
+
+from core.dieta import MatrizTACO
+
+
+@pytest.fixture
+def matriz():
+    """TACO sintética pequena: 40 alimentos × 6 nutrientes."""
+    aleatorio = np.random.default_rng(0)
+    ids = np.arange(1, 41)
+    return MatrizTACO(
+        ids,
+        [f"Alimento {i}, cozido" for i in ids],
+        ["kcal", "proteina_g", "lipideos_g", "carboidrato_g", "fibra_alimentar_g", "sodio_mg"],
+        aleatorio.uniform(0, 400, (len(ids), 6)),
+        [f"Classe {i % 5}" for i in ids],
+    )
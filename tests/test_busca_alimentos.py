@@ -0,0 +1,45 @@
+"""Busca de alimentos: sem acentos nem caixa, por prefixo e com erros de digitação."""
+import pytest
+
+from core.busca_alimentos import IndiceBuscaAlimentos, normalizar
+
+NOMES = [
+    "Arroz, integral, cozido",
+    "Arroz, tipo 1, cozido",
+    "Feijão, carioca, cozido",
+    "Pão, trigo, francês",
+    "Maçã, Fuji, com casca, crua",
+    "Leite, de vaca, integral",
+]
+
+
+@pytest.fixture
+def indice():
+    return IndiceBuscaAlimentos(NOMES)
+
+
+def test_normalizar():
+    assert normalizar("Pão, trigo, FRANCÊS") == "pao trigo frances"
+
+
+@pytest.mark.parametrize("consulta, primeiro", [
+    ("feijao", "Feijão, carioca, cozido"),
+    ("MAÇÃ", "Maçã, Fuji, com casca, crua"),
+    ("arr int coz", "Arroz, integral, cozido"),
+    ("fejao", "Feijão, carioca, cozido"),
+    ("pao frances", "Pão, trigo, francês"),
+])
+def test_primeiro_resultado(indice, consulta, primeiro):
+    assert indice.buscar_nomes(consulta)[0] == primeiro
+
+
+def test_desempate(indice):
+    # mesma pontuação: o nome mais curto vem antes
+    assert indice.buscar_nomes("integral") == ["Arroz, integral, cozido", "Leite, de vaca, integral"]
+    # todos os termos casados vêm antes dos que casam só parte da consulta
+    assert indice.buscar_nomes("arroz integral")[:2] == ["Arroz, integral, cozido", "Arroz, tipo 1, cozido"]
+
+
+def test_consulta_vazia_ou_sem_casamento(indice):
+    assert indice.buscar("  ") == []
+    assert indice.buscar("xyzw") == []
@@ -0,0 +1,131 @@
+"""Cache por nutricionista: cópias para quem lê e invalidação pelas tags da linha escrita."""
+import datetime
+
+import pandas as pd
+import pytest
+
+import core.cache
+import core.database
+from benchmarks.gsheets_falso import ConexaoFalsa, PlanilhaFalsa
+from core.anamnese import inserir_anamnese_paciente, ler_pacientes
+from core.cache import CacheInquilino
+from core.consultas import inserir_consulta, ler_consultas
+from core.database import BackendGSheets, BackendSQLite, Repositorio
+from core.dieta import PlanoDieta, salvar_plano
+from core.relatorio import ler_relatorio
+
+HOJE = datetime.date(2025, 3, 1)
+
+
+@pytest.fixture
+def repositorio(tmp_path, monkeypatch):
+    """Repositório e cache do processo trocados por novos, como nas páginas."""
+    repositorio = Repositorio(BackendSQLite(str(tmp_path / "cache.db")))
+    monkeypatch.setattr(core.database, "_repositorio", repositorio)
+    monkeypatch.setattr(core.cache, "_cache", CacheInquilino())
+    return repositorio
+
+
+def paciente(nome, id_nutricionista):
+    return {"nome_paciente": nome, "id_nutricionista": id_nutricionista}
+
+
+def consulta(id_paciente, id_nutricionista, dia):
+    return {"id_paciente": id_paciente, "id_nutricionista": id_nutricionista, "data_consulta": f"2025-02-{dia:02d} 10:00:00"}
+
+
+def test_quem_le_recebe_uma_copia():
+    cache = CacheInquilino()
+    carregar = lambda: pd.DataFrame({"nome_paciente": ["Ana", "Bia"]})
+
+    lido = cache.obter("AnamnesePacientes", 1, carregar)
+    lido["nome_paciente"] = lido["nome_paciente"].str.upper()
+    lido.drop(index=0, inplace=True)
+
+    assert cache.obter("AnamnesePacientes", 1, carregar)["nome_paciente"].tolist() == ["Ana", "Bia"]
+    assert cache.estatisticas()["acertos"] == 1
+
+
+def test_invalidacao_durante_a_carga_nao_guarda_o_valor():
+    cache = CacheInquilino()
+
+    def carregar_com_escrita_no_meio():
+        cache.invalidar("Consultas", 1)
+        return pd.DataFrame({"id_consulta": [1]})
+
+    cache.obter("Consultas", 1, carregar_com_escrita_no_meio)
+    assert cache.estatisticas()["entradas"] == 0
+    cache.obter("Consultas", 1, lambda: pd.DataFrame({"id_consulta": [1, 2]}))
+    assert cache.estatisticas()["entradas"] == 1
+
+
+def test_geracoes_nao_crescem_com_as_invalidacoes():
+    cache = CacheInquilino()
+    for id_paciente in range(1000):
+        cache.obter("Relatorio", 1, dict, chave=id_paciente, tags=(f"paciente:{id_paciente}",))
+        cache.invalidar_registro("Consultas", {"id_nutricionista": 1, "id_paciente": id_paciente})
+
+    assert cache.estatisticas()["geracoes"] == 0
+    assert cache.estatisticas()["entradas"] == 0
+
+
+def test_cadastro_de_paciente_invalida_so_os_pacientes_do_nutricionista(repositorio):
+    inserir_anamnese_paciente(paciente("Ana", 1))
+    inserir_anamnese_paciente(paciente("Bia", 2))
+    assert ler_pacientes(1)["nome_paciente"].tolist() == ["Ana"]
+    assert ler_pacientes(2)["nome_paciente"].tolist() == ["Bia"]
+
+    inserir_anamnese_paciente(paciente("Carla", 1))
+
+    assert ler_pacientes(1)["nome_paciente"].tolist() == ["Ana", "Carla"]
+    acertos = core.cache.obter_cache().estatisticas()["acertos"]
+    assert ler_pacientes(2)["nome_paciente"].tolist() == ["Bia"]
+    assert core.cache.obter_cache().estatisticas()["acertos"] == acertos + 1
+
+
+def test_consulta_invalida_as_consultas_e_o_relatorio_do_paciente(repositorio):
+    inserir_anamnese_paciente(paciente("Ana", 1))
+    inserir_anamnese_paciente(paciente("Bia", 1))
+    ana, bia = ler_pacientes(1)["id_paciente"].tolist()
+    inserir_consulta(consulta(ana, 1, 1), "Ana")
+    assert len(ler_consultas(1)) == 1
+    assert ler_relatorio(1, ana, HOJE)["consultas"] == 1
+    assert ler_relatorio(1, bia, HOJE)["consultas"] == 0
+
+    inserir_consulta(consulta(ana, 1, 15), "Ana")
+
+    assert len(ler_consultas(1)) == 2
+    assert ler_relatorio(1, ana, HOJE)["consultas"] == 2
+    acertos = core.cache.obter_cache().estatisticas()["acertos"]
+    ler_relatorio(1, bia, HOJE)
+    assert core.cache.obter_cache().estatisticas()["acertos"] == acertos + 1
+
+
+def test_plano_salvo_invalida_o_relatorio_do_paciente(repositorio, matriz):
+    inserir_anamnese_paciente(paciente("Ana", 1))
+    assert ler_relatorio(1, 1, HOJE)["dietas"].empty
+
+    plano = PlanoDieta(matriz)
+    plano.id_paciente, plano.id_nutricionista = 1, 1
+    plano.adicionar("Almoço", 3, 150.0)
+    salvar_plano(repositorio, plano)
+
+    assert len(ler_relatorio(1, 1, HOJE)["dietas"]) == 1
+
+
+def test_linha_nova_da_planilha_invalida_as_leituras_da_aba(tmp_path, monkeypatch):
+    planilhas = {"AnamnesePacientes": PlanilhaFalsa(pd.DataFrame([{"id_paciente": 1, **paciente("Ana", 1)}]))}
+    conexao = ConexaoFalsa(planilhas)
+    repositorio = Repositorio(BackendSQLite(str(tmp_path / "cache.db")), BackendGSheets(lambda: conexao))
+    monkeypatch.setattr(core.database, "_repositorio", repositorio)
+    monkeypatch.setattr(core.cache, "_cache", CacheInquilino())
+    try:
+        assert ler_pacientes(1)["nome_paciente"].tolist() == ["Ana"]
+
+        planilha = planilhas["AnamnesePacientes"]
+        planilha.df = pd.concat([planilha.dataframe(), pd.DataFrame([{"id_paciente": 2, **paciente("Bia", 1)}])])
+        assert repositorio.reconciliar("AnamnesePacientes") == 1
+
+        assert ler_pacientes(1)["nome_paciente"].tolist() == ["Ana", "Bia"]
+    finally:
+        repositorio.sincronizador.parar(1)
@@ -0,0 +1,98 @@
+"""Totais acumulados do `PlanoDieta` conferidos contra o recálculo completo (`verificar=True`)."""
+import numpy as np
+import pytest
+
+from core.dieta import REFEICOES, PlanoDieta
+
+
+@pytest.fixture
+def plano(matriz):
+    plano = PlanoDieta(matriz, verificar=True)
+    plano.adicionar_varios([(REFEICOES[k % len(REFEICOES)], k + 1, 10.0 * (k + 1)) for k in range(12)])
+    return plano
+
+
+def test_adicionar(matriz):
+    plano = PlanoDieta(matriz, verificar=True)
+    ids = [plano.adicionar("Almoço", 3, 120), plano.adicionar("Almoço", 7, 80.5), plano.adicionar("Ceia", 3, 30)]
+    assert ids == [1, 2, 3]
+    assert plano.verificar_totais()
+    esperado = (120 * matriz.valores[2] + 80.5 * matriz.valores[6]) / 100.0
+    np.testing.assert_allclose(plano.totais_por_refeicao()[REFEICOES.index("Almoço")], esperado, rtol=1e-5)
+
+
+def test_adicionar_varios(plano):
+    assert len(plano) == 12
+    assert plano.verificar_totais()
+
+
+def test_remover(plano):
+    plano.remover(5)
+    plano.remover(1)
+    assert len(plano) == 10 and 5 not in plano.id_itens
+    assert plano.verificar_totais()
+    with pytest.raises(KeyError):
+        plano.remover(5)
+
+
+def test_remover_ultimo_item_zera_a_refeicao(plano):
+    codigo = REFEICOES.index("Café da Manhã")
+    for id_item in plano.id_itens[plano.refeicoes == codigo].tolist():
+        plano.remover(id_item)
+    assert not plano.totais_por_refeicao()[codigo].any()
+    assert plano.verificar_totais()
+
+
+def test_alterar_gramas(plano):
+    plano.alterar_gramas(2, 333.3)
+    plano.alterar_gramas(8, 1)
+    assert plano.gramas[plano.id_itens == 2][0] == pytest.approx(333.3)
+    assert plano.verificar_totais()
+
+
+def test_substituir(plano):
+    plano.substituir(4, 40, 55)
+    assert plano.linha(4) == 39
+    assert plano.verificar_totais()
+
+
+def test_ids_estaveis_e_de_registros(plano, matriz):
+    plano.remover(3)
+    novo = plano.adicionar("Jantar", 9, 90)
+    assert novo == 13
+    copia = PlanoDieta.de_registros(matriz, plano.registros(), verificar=True)
+    assert copia.verificar_totais()
+    np.testing.assert_allclose(copia.totais_por_refeicao(), plano.totais_por_refeicao(), rtol=1e-5)
+    assert copia.adicionar("Ceia", 1, 10) == 14
+
+
+def test_verificar_acusa_totais_divergentes(plano):
+    plano._totais[0, 0] += 50.0
+    assert not plano.verificar_totais()
+    with pytest.raises(AssertionError):
+        plano.alterar_gramas(1, 20)
+
+
+def test_editar_refeicao_em_lote(plano):
+    almoco = plano.id_itens[plano.refeicoes == REFEICOES.index("Almoço")].tolist()
+    assert plano.editar_refeicao("Almoço", almoco, plano.gramas[plano.refeicoes == REFEICOES.index("Almoço")]) is False
+
+    mantidos = [almoco[1], almoco[0]]
+    assert plano.editar_refeicao("Almoço", mantidos, [15, 25]) is True
+    assert plano.verificar_totais()
+    tabela = plano.tabela_refeicao("Almoço", ["kcal"])
+    assert tabela["gramas"].tolist() == [15, 25]
+    # reordenar dá ids novos, na nova ordem, para a ordem sobreviver ao salvar
+    assert tabela.index.is_monotonic_increasing and not set(tabela.index) & set(almoco)
+
+
+def test_editar_refeicao_removendo_tudo_e_itens_invalidos(plano, matriz):
+    codigo = REFEICOES.index("Jantar")
+    plano.editar_refeicao("Jantar", [], [])
+    assert not plano.totais_por_refeicao()[codigo].any()
+    assert plano.verificar_totais()
+    with pytest.raises(KeyError):
+        plano.editar_refeicao("Ceia", [999], [10])
+    ceia = plano.id_itens[plano.refeicoes == REFEICOES.index("Ceia")].tolist()
+    with pytest.raises(KeyError):
+        plano.editar_refeicao("Ceia", ceia + ceia, [10] * 2 * len(ceia))
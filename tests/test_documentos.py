@@ -0,0 +1,12 @@
+"""Índice do TACO.pdf: só a versão atual e a anterior ficam no disco."""
+from core.documentos import remover_versoes_antigas
+
+
+def test_mantem_a_versao_atual_e_a_anterior(tmp_path):
+    for versao in ["20260101000000-aaaa", "20260201000000-bbbb", "20260301000000-cccc", "20260401000000-dddd"]:
+        (tmp_path / versao).mkdir()
+    (tmp_path / "manifesto.json").write_text("{}")
+
+    remover_versoes_antigas(str(tmp_path), "20260401000000-dddd")
+
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["20260301000000-cccc", "20260401000000-dddd", "manifesto.json"]
@@ -0,0 +1,141 @@
+"""Enriquecimento da TACO contra um servidor HTTP local no lugar do Gemini."""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import core.enriquecimento
+from core.enriquecimento import CacheEnriquecimento, ClienteGemini, enriquecer
+
+ALIMENTOS = [(i, f"Alimento {i}") for i in range(1, 31)]
+
+
+class ServidorFalso(ThreadingHTTPServer):
+    """`generateContent` que devolve o nome do alimento do prompt, anotando cada requisição."""
+
+    daemon_threads = True
+
+    def __init__(self, demora=0.0, falhas=()):
+        super().__init__(("127.0.0.1", 0), TratadorFalso)
+        self.demora = demora
+        # status a devolver, em ordem, antes de começar a responder 200
+        self.falhas = list(falhas)
+        self.requisicoes = []
+        self.em_andamento = 0
+        self.maximo_em_andamento = 0
+        self.trava = threading.Lock()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class TratadorFalso(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        servidor = self.server
+        corpo = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        prompt = corpo["contents"][0]["parts"][0]["text"]
+        with servidor.trava:
+            servidor.requisicoes.append(time.monotonic())
+            servidor.em_andamento += 1
+            servidor.maximo_em_andamento = max(servidor.maximo_em_andamento, servidor.em_andamento)
+            status = servidor.falhas.pop(0) if servidor.falhas else 200
+        time.sleep(servidor.demora)
+        nome = prompt.split("'")[1]
+        resposta = {"candidates": [{"content": {"parts": [{"text": nome}]}}]} if status == 200 else {"error": status}
+        dados = json.dumps(resposta).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(dados)))
+        self.end_headers()
+        self.wfile.write(dados)
+        with servidor.trava:
+            servidor.em_andamento -= 1
+
+
+@pytest.fixture
+def servidor_falso():
+    servidores = []
+
+    def criar(**opcoes):
+        servidor = ServidorFalso(**opcoes)
+        threading.Thread(target=servidor.serve_forever, args=(0.05,), daemon=True).start()
+        servidores.append(servidor)
+        return servidor
+
+    yield criar
+    for servidor in servidores:
+        servidor.shutdown()
+        servidor.server_close()
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return CacheEnriquecimento(str(tmp_path / "enriquecimento.db"))
+
+
+def test_no_maximo_concorrencia_requisicoes_em_andamento(servidor_falso, cache):
+    servidor = servidor_falso(demora=0.05)
+
+    resumo = enriquecer(ALIMENTOS, "tags", ClienteGemini("teste", servidor.url), cache, concorrencia=3, taxa=1000)
+
+    assert resumo["novos"] == len(ALIMENTOS)
+    assert resumo["resultados"][7] == "alimento 7"
+    assert servidor.maximo_em_andamento == 3
+
+
+def test_balde_de_fichas_limita_a_taxa(servidor_falso, cache):
+    servidor = servidor_falso()
+    taxa = 20
+
+    enriquecer(ALIMENTOS, "tags", ClienteGemini("teste", servidor.url), cache, concorrencia=8, taxa=taxa)
+
+    # rajada de até `taxa` requisições (o balde cheio) e depois `taxa` por segundo
+    inicio = servidor.requisicoes[0]
+    for n, instante in enumerate(servidor.requisicoes):
+        assert instante - inicio >= (n + 1 - taxa) / taxa - 0.05
+    assert servidor.requisicoes[-1] - inicio >= (len(ALIMENTOS) - taxa) / taxa - 0.05
+
+
+def test_429_e_5xx_sao_refeitos(servidor_falso, cache, monkeypatch):
+    monkeypatch.setattr(core.enriquecimento, "ESPERA_INICIAL", 0.01)
+    servidor = servidor_falso(falhas=[429, 503, 500, 429])
+
+    resumo = enriquecer(ALIMENTOS[:5], "tags", ClienteGemini("teste", servidor.url), cache, concorrencia=2, taxa=1000)
+
+    assert resumo["falhas"] == {}
+    assert resumo["novos"] == 5
+    assert len(servidor.requisicoes) == 5 + 4
+
+
+def test_erro_permanente_interrompe_sem_tentar_de_novo(servidor_falso, cache):
+    servidor = servidor_falso(falhas=[403] * len(ALIMENTOS))
+
+    resumo = enriquecer(ALIMENTOS, "tags", ClienteGemini("teste", servidor.url), cache, concorrencia=1, taxa=1000)
+
+    assert resumo["interrompido"].startswith("HTTP 403")
+    assert resumo["novos"] == 0
+    assert len(servidor.requisicoes) == 1
+    assert cache.obter("tags") == {}
+
+
+def test_segunda_execucao_so_pede_o_que_nao_esta_no_cache(servidor_falso, tmp_path):
+    servidor = servidor_falso()
+    caminho = str(tmp_path / "enriquecimento.db")
+    cliente = ClienteGemini("teste", servidor.url)
+
+    enriquecer(ALIMENTOS[:10], "tags", cliente, CacheEnriquecimento(caminho), taxa=1000)
+    assert len(servidor.requisicoes) == 10
+
+    # outro processo, mesmo arquivo de cache
+    resumo = enriquecer(ALIMENTOS, "tags", cliente, CacheEnriquecimento(caminho), taxa=1000)
+
+    assert resumo["do_cache"] == 10
+    assert resumo["novos"] == 20
+    assert len(servidor.requisicoes) == 30
+    assert len(resumo["resultados"]) == len(ALIMENTOS)
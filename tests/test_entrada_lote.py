@@ -0,0 +1,52 @@
+"""Entrada em lote: refeições, quantidades e nomes resolvidos ou ambíguos."""
+import pytest
+
+from core.busca_alimentos import IndiceBuscaAlimentos
+from core.entrada_lote import interpretar_lote
+
+NOMES = [
+    "Arroz, integral, cozido",
+    "Arroz, tipo 1, cozido",
+    "Feijão, carioca, cozido",
+    "Pão, trigo, francês",
+    "Queijo, minas, frescal",
+]
+
+
+@pytest.fixture
+def indice():
+    return IndiceBuscaAlimentos(NOMES)
+
+
+def resumo(itens):
+    return [(i["refeicao"], i["linha"], i["gramas"], i["erro"]) for i in itens]
+
+
+def test_refeicoes_e_quantidades(indice):
+    itens = interpretar_lote(
+        "Café da manhã: pão francês 50g, queijo minas 30 g\n"
+        "almoco: arroz, integral, cozido 120g; feijão carioca 1,5 kg\n"
+        "pao frances 25gr",
+        indice,
+    )
+    assert resumo(itens) == [
+        ("Café da Manhã", 3, 50.0, None),
+        ("Café da Manhã", 4, 30.0, None),
+        ("Almoço", 0, 120.0, None),
+        ("Almoço", 2, 1500.0, None),
+        # sem refeição na linha: vale a última citada
+        ("Almoço", 3, 25.0, None),
+    ]
+
+
+def test_erros_por_item(indice):
+    itens = interpretar_lote("Jantar: arroz 100g; xyzw 10g; pão francês 0g; 50g; feijão carioca", indice)
+    assert [(i["refeicao"], i["erro"]) for i in itens] == [
+        ("Jantar", "Nome ambíguo: escolha uma das opções."),
+        ("Jantar", "Alimento não encontrado na TACO."),
+        ("Jantar", "Quantidade deve ser maior que zero."),
+        ("Jantar", "Quantidade sem alimento."),
+        ("Jantar", "Faltou a quantidade (ex.: 50g)."),
+    ]
+    assert sorted(itens[0]["opcoes"][:2]) == [0, 1]
+    assert itens[4]["linha"] == 2
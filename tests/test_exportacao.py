@@ -0,0 +1,36 @@
+"""Exportação em PDF: nomes de arquivo e ZIP em lote, com e sem o pool de processos."""
+import zipfile
+
+import pytest
+
+from core.dieta import PlanoDieta
+from core.exportacao import MINIMO_PARA_POOL, dados_plano, exportar_zip, nome_arquivo
+
+
+@pytest.fixture
+def dados(matriz):
+    plano = PlanoDieta(matriz)
+    plano.adicionar("Café da Manhã", 1, 50.0)
+    plano.adicionar("Almoço", 3, 120.0)
+    plano.adicionar("Almoço", 5, 80.0)
+    return dados_plano(plano, "Ana Sousa 🍎", "Nutri")
+
+
+def test_nome_arquivo():
+    assert nome_arquivo("plano", 12, "Ana Júlia  Sousa") == "plano_0012_ana_julia_sousa.pdf"
+    assert nome_arquivo("relatorio", 3, "") == "relatorio_0003_paciente.pdf"
+
+
+def test_dados_plano_soma_as_refeicoes(dados):
+    assert [r["nome"] for r in dados["refeicoes"]] == ["Café da Manhã", "Almoço"]
+    assert sum(r["totais"][0] for r in dados["refeicoes"]) == pytest.approx(dados["totais_dia"][0], rel=1e-5)
+
+
+@pytest.mark.parametrize("quantidade", [2, MINIMO_PARA_POOL + 2])
+def test_zip_com_um_pdf_por_tarefa(dados, quantidade):
+    tarefas = ((nome_arquivo("plano", i, f"Paciente {i}"), "plano", dados) for i in range(quantidade))
+
+    with zipfile.ZipFile(exportar_zip(tarefas, processos=2)) as arquivo_zip:
+        nomes = sorted(arquivo_zip.namelist())
+        assert nomes == sorted(nome_arquivo("plano", i, f"Paciente {i}") for i in range(quantidade))
+        assert all(arquivo_zip.read(nome).startswith(b"%PDF") for nome in nomes)
@@ -0,0 +1,39 @@
+"""IDs da sequência: nunca repetidos entre threads e processos (versão pequena de `benchmarks/stress_ids.py`)."""
+import multiprocessing
+import threading
+
+from benchmarks.stress_ids import alocar
+from core.database import BackendSQLite, Repositorio
+
+
+def test_ids_unicos_entre_threads_de_repositorios_no_mesmo_banco(tmp_path):
+    caminho = str(tmp_path / "ids.db")
+    # um Repositorio por "processo": cada um reserva os próprios blocos
+    repositorios = [Repositorio(BackendSQLite(caminho)) for _ in range(2)]
+    ids = []
+    trava = threading.Lock()
+
+    def trabalhador(repositorio):
+        locais = [repositorio.proximo_id("id_paciente") for _ in range(100)]
+        with trava:
+            ids.extend(locais)
+
+    grupo = [threading.Thread(target=trabalhador, args=(r,)) for r in repositorios for _ in range(4)]
+    for t in grupo:
+        t.start()
+    for t in grupo:
+        t.join()
+
+    assert len(ids) == 800
+    assert len(set(ids)) == 800
+
+
+def test_ids_unicos_entre_processos(tmp_path):
+    caminho = str(tmp_path / "ids.db")
+    BackendSQLite(caminho)
+    with multiprocessing.get_context("spawn").Pool(2) as pool:
+        lotes = pool.starmap(alocar, [(caminho, 4, 50)] * 2)
+
+    ids = [i for lote in lotes for i in lote]
+    assert len(ids) == 400
+    assert len(set(ids)) == 400
@@ -0,0 +1,48 @@
+"""Alergias do paciente: quais alimentos saem do plano gerado e das substituições."""
+import numpy as np
+import pytest
+
+from core.dieta import MatrizTACO
+from core.otimizacao import alimentos_excluidos, termos_alergia
+
+ALIMENTOS = [
+    ("Arroz, tipo 1, cozido", "Cereais e derivados"),
+    ("Pão, trigo, francês", "Cereais e derivados"),
+    ("Castanha-de-caju, torrada, salgada", "Nozes e sementes"),
+    ("Gergelim, semente", "Nozes e sementes"),
+    ("Leite, de vaca, integral", "Leite e derivados"),
+    ("Iogurte, natural", "Leite e derivados"),
+    ("Banana, prata, crua", "Frutas e derivados"),
+    ("Manga, Palmer, crua", "Frutas e derivados"),
+]
+
+
+@pytest.fixture
+def matriz_nomes():
+    nomes, classes = zip(*ALIMENTOS)
+    return MatrizTACO(np.arange(1, len(nomes) + 1), nomes, ["kcal"], np.ones((len(nomes), 1)), classes)
+
+
+def excluidos(matriz, alergias):
+    return [matriz.nomes[i] for i in np.flatnonzero(alimentos_excluidos(matriz, alergias))]
+
+
+def test_termos_curtos_sao_ignorados(matriz_nomes):
+    assert termos_alergia("a, no, ok") == []
+    assert excluidos(matriz_nomes, "a, no") == []
+
+
+def test_termo_casa_por_palavra_inteira(matriz_nomes):
+    # "man" não é "manga"
+    assert excluidos(matriz_nomes, "alergia a man") == []
+    assert excluidos(matriz_nomes, "manga") == ["Manga, Palmer, crua"]
+
+
+@pytest.mark.parametrize("alergias, esperados", [
+    ("Alergia a nozes", ["Castanha-de-caju, torrada, salgada", "Gergelim, semente"]),
+    ("castanhas", ["Castanha-de-caju, torrada, salgada", "Gergelim, semente"]),
+    ("intolerância à lactose", ["Leite, de vaca, integral", "Iogurte, natural"]),
+    ("glúten", ["Pão, trigo, francês"]),
+])
+def test_alergenos_comuns_excluem_a_classe(matriz_nomes, alergias, esperados):
+    assert excluidos(matriz_nomes, alergias) == esperados
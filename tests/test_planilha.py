@@ -0,0 +1,106 @@
+"""Google Sheets como fonte e destino: importação, linhas novas da planilha e envio."""
+import pandas as pd
+import pytest
+
+from benchmarks.gsheets_falso import ConexaoFalsa, PlanilhaFalsa
+from core.database import TABELAS, BackendGSheets, BackendSQLite, Repositorio
+
+
+class PlanilhaQueGuardaOpcoes(PlanilhaFalsa):
+    def append_rows(self, valores, **opcoes):
+        self.opcoes = opcoes
+        super().append_rows(valores, **opcoes)
+
+
+def abas_vazias():
+    return {aba: PlanilhaFalsa(pd.DataFrame()) for aba, tabela in TABELAS.items() if not tabela.get("somente_local")}
+
+
+@pytest.fixture
+def planilhas():
+    return abas_vazias()
+
+
+@pytest.fixture
+def repositorio(tmp_path, planilhas):
+    conexao = ConexaoFalsa(planilhas)
+    repositorio = Repositorio(BackendSQLite(str(tmp_path / "planilha.db")), BackendGSheets(lambda: conexao))
+    yield repositorio
+    repositorio.sincronizador.parar(1)
+
+
+def anexar_na_planilha(planilhas, aba, registros):
+    planilha = planilhas[aba]
+    planilha.df = pd.concat([planilha.dataframe(), pd.DataFrame(registros)], ignore_index=True)
+
+
+def test_anexar_envia_valores_crus():
+    planilha = PlanilhaQueGuardaOpcoes(pd.DataFrame(columns=["id_lead", "nome"]))
+    backend = BackendGSheets(lambda: ConexaoFalsa({"LeadsPacientes": planilha}))
+
+    backend.anexar("LeadsPacientes", [{"id_lead": 1, "nome": '=IMPORTXML("http://x", "//a")'}])
+
+    assert planilha.opcoes["value_input_option"] == "RAW"
+    assert planilha.dataframe()["nome"].iloc[0] == '=IMPORTXML("http://x", "//a")'
+
+
+def test_linha_incluida_na_planilha_depois_da_importacao_chega_ao_banco(repositorio, planilhas):
+    anexar_na_planilha(planilhas, "Nutricionistas", [{"id_nutricionista": 1, "email_nutricionista": "a@x.com"}])
+    assert repositorio.ler("Nutricionistas")["email_nutricionista"].tolist() == ["a@x.com"]
+
+    anexar_na_planilha(planilhas, "Nutricionistas", [{"id_nutricionista": 2, "email_nutricionista": "b@x.com"}])
+    assert len(repositorio.ler("Nutricionistas")) == 1
+    assert repositorio.reconciliar("Nutricionistas") == 1
+    assert repositorio.ler("Nutricionistas")["email_nutricionista"].tolist() == ["a@x.com", "b@x.com"]
+    assert repositorio.reconciliar("Nutricionistas") == 0
+
+
+def test_leitura_depois_do_intervalo_reconcilia_ao_fundo(repositorio, planilhas):
+    repositorio.ler("Nutricionistas")
+    anexar_na_planilha(planilhas, "Nutricionistas", [{"id_nutricionista": 5, "email_nutricionista": "c@x.com"}])
+    repositorio.intervalo_reconciliacao = 0
+
+    repositorio.ler("Nutricionistas")
+    repositorio._reconciliacoes["Nutricionistas"].join(5)
+    assert repositorio.ler("Nutricionistas")["email_nutricionista"].tolist() == ["c@x.com"]
+
+
+def test_ids_repetidos_na_planilha_vao_para_a_quarentena(repositorio, planilhas):
+    anexar_na_planilha(planilhas, "AnamnesePacientes", [
+        {"id_paciente": 1, "nome_paciente": "Ana"},
+        {"id_paciente": 2, "nome_paciente": "Bia"},
+        {"id_paciente": 1, "nome_paciente": "Carla"},
+    ])
+
+    assert repositorio.ler("AnamnesePacientes")["nome_paciente"].tolist() == ["Ana", "Bia"]
+    quarentena = repositorio.local.quarentena()
+    assert quarentena["chave"].tolist() == [1]
+    assert "Carla" in quarentena["registro"].iloc[0]
+
+    repositorio.reconciliar("AnamnesePacientes")
+    assert len(repositorio.local.quarentena()) == 1
+    assert repositorio.ler("AnamnesePacientes")["nome_paciente"].tolist() == ["Ana", "Bia"]
+
+
+def test_ida_e_volta_pela_planilha(tmp_path, repositorio, planilhas):
+    anexar_na_planilha(planilhas, "AnamnesePacientes", [
+        {"id_paciente": 1, "nome_paciente": "Ana", "id_nutricionista": 1},
+        {"id_paciente": 2, "nome_paciente": "Bia", "id_nutricionista": 1},
+    ])
+    assert repositorio.ler("AnamnesePacientes")["nome_paciente"].tolist() == ["Ana", "Bia"]
+
+    repositorio.inserir("AnamnesePacientes", {"id_paciente": 3, "nome_paciente": "Carla", "id_nutricionista": 2})
+    assert repositorio.sincronizador.descarregar(timeout=10)
+    enviada = planilhas["AnamnesePacientes"].dataframe().iloc[-1]
+    assert (int(enviada["id_paciente"]), enviada["nome_paciente"]) == (3, "Carla")
+
+    # outra máquina, banco vazio: importa tudo da planilha, inclusive o que a primeira enviou
+    conexao = ConexaoFalsa(planilhas)
+    outro = Repositorio(BackendSQLite(str(tmp_path / "outro.db")), BackendGSheets(lambda: conexao))
+    try:
+        pacientes = outro.ler("AnamnesePacientes")
+    finally:
+        outro.sincronizador.parar(1)
+    assert pacientes["id_paciente"].tolist() == [1, 2, 3]
+    assert pacientes["nome_paciente"].tolist() == ["Ana", "Bia", "Carla"]
+    assert pacientes["id_nutricionista"].tolist() == [1, 1, 2]
@@ -0,0 +1,72 @@
+"""Versões de planos salvos: só no banco local e sem versões repetidas entre sessões."""
+import threading
+
+import pandas as pd
+import pytest
+
+from core.database import BackendSQLite, Repositorio
+from core.dieta import PlanoDieta, carregar_plano, salvar_plano
+
+
+class PlanilhaSemPlanos:
+    """Destino de sincronização como a planilha real: sem a aba PlanosDieta."""
+
+    def __init__(self):
+        self.anexados = []
+
+    def ler(self, aba, **filtros):
+        if aba == "PlanosDieta":
+            raise LookupError("WorksheetNotFound: PlanosDieta")
+        return pd.DataFrame()
+
+    def anexar(self, aba, registros):
+        if aba == "PlanosDieta":
+            raise LookupError("WorksheetNotFound: PlanosDieta")
+        self.anexados.append(aba)
+
+
+@pytest.fixture
+def repositorio(tmp_path):
+    repositorio = Repositorio(BackendSQLite(str(tmp_path / "planos.db")), PlanilhaSemPlanos())
+    yield repositorio
+    repositorio.sincronizador.parar(1)
+
+
+def plano_do_paciente(matriz, gramas):
+    plano = PlanoDieta(matriz, verificar=True)
+    plano.id_paciente, plano.id_nutricionista = 1, 1
+    plano.adicionar("Almoço", 3, gramas)
+    return plano
+
+
+def test_planos_ficam_so_no_banco_local(repositorio, matriz):
+    assert salvar_plano(repositorio, plano_do_paciente(matriz, 100)) == 1
+    assert carregar_plano(repositorio, matriz, 1, 1).gramas.tolist() == [100]
+    assert repositorio.local.tamanho_fila() == 0
+
+
+def test_sessoes_simultaneas_gravam_versoes_distintas(repositorio, matriz):
+    salvar_plano(repositorio, plano_do_paciente(matriz, 100))
+    planos = [carregar_plano(repositorio, matriz, 1, 1) for _ in range(8)]
+    for n, plano in enumerate(planos):
+        plano.alterar_gramas(1, 110 + n)
+    largada = threading.Barrier(len(planos))
+    versoes = []
+
+    def salvar(plano):
+        largada.wait()
+        versoes.append(salvar_plano(repositorio, plano))
+
+    threads = [threading.Thread(target=salvar, args=(p,)) for p in planos]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(versoes) == list(range(2, 2 + len(planos)))
+    historico = repositorio.ler("PlanosDieta")
+    assert not historico["versao"].duplicated().any()
+    # só a primeira a gravar pode ir como alterações da versão 1; as outras vão completas
+    assert (historico["tipo"] == "alteracoes").sum() <= 1
+    ultima = carregar_plano(repositorio, matriz, 1, 1)
+    assert ultima.versao == 1 + len(planos) and ultima.verificar_totais()
@@ -0,0 +1,61 @@
+"""Dados de referência: a recarga depois do ttl traz o que mudou na planilha."""
+import functools
+
+import pandas as pd
+import pytest
+
+from benchmarks.gsheets_falso import ConexaoFalsa, PlanilhaFalsa
+from core.database import BackendGSheets, BackendSQLite, Repositorio
+from core.referencia import DadoReferencia, _carregar_matriz_taco
+from core.usuarios import IndiceCredenciais
+
+
+@pytest.fixture
+def planilhas():
+    return {
+        "Nutricionistas": PlanilhaFalsa(pd.DataFrame([
+            {"id_nutricionista": 1, "email_nutricionista": "nutri1@exemplo.com", "senha_nutricionista": "um"},
+        ])),
+        "TACO": PlanilhaFalsa(pd.DataFrame([
+            {"id_alimento": 1, "descricao_alimento": "Arroz, tipo 1, cozido", "classe": "Cereais e derivados", "kcal": 128.0},
+            {"id_alimento": 2, "descricao_alimento": "Banana, prata, crua", "classe": "Frutas e derivados", "kcal": 98.0},
+        ])),
+        "AGtaco3": PlanilhaFalsa(pd.DataFrame()),
+        "AminoácidosTACO3": PlanilhaFalsa(pd.DataFrame()),
+    }
+
+
+@pytest.fixture
+def repositorio(tmp_path, planilhas):
+    conexao = ConexaoFalsa(planilhas)
+    repositorio = Repositorio(BackendSQLite(str(tmp_path / "referencia.db")), BackendGSheets(lambda: conexao))
+    yield repositorio
+    repositorio.sincronizador.parar(1)
+
+
+def kcal(matriz, id_alimento):
+    return matriz.por_100g(matriz.linha_por_id[id_alimento])[matriz.coluna("kcal")]
+
+
+def test_recarga_da_taco_traz_o_valor_alterado_na_planilha(repositorio, planilhas, tmp_path):
+    carregar = functools.partial(_carregar_matriz_taco, repositorio=repositorio, diretorio=str(tmp_path / "sem_snapshot"))
+    taco = DadoReferencia("taco", carregar, ttl=0)
+    assert kcal(taco.obter(), 1) == pytest.approx(128.0)
+
+    planilhas["TACO"].df.loc[0, "kcal"] = 130.0
+    taco.obter()
+    taco.aguardar(5)
+    assert kcal(taco.obter(), 1) == pytest.approx(130.0)
+
+
+def test_recarga_dos_nutricionistas_traz_quem_entrou_na_planilha(repositorio, planilhas):
+    indice = IndiceCredenciais(repositorio, ttl=0)
+    assert list(indice.dados.obter()) == ["nutri1@exemplo.com"]
+
+    planilha = planilhas["Nutricionistas"]
+    planilha.df = pd.concat([planilha.dataframe(), pd.DataFrame([
+        {"id_nutricionista": 2, "email_nutricionista": "nutri2@exemplo.com", "senha_nutricionista": "dois"},
+    ])], ignore_index=True)
+    indice.dados.obter()
+    indice.dados.aguardar(5)
+    assert sorted(indice.dados.obter()) == ["nutri1@exemplo.com", "nutri2@exemplo.com"]
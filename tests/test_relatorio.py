@@ -0,0 +1,50 @@
+"""Agregado do relatório: consultas gravadas durante a montagem não se perdem nem contam duas vezes."""
+import pytest
+
+import core.relatorio
+from core.database import BackendSQLite, Repositorio
+from core.relatorio import agregado_paciente, registrar_consulta
+
+
+@pytest.fixture
+def repositorio(tmp_path):
+    repositorio = Repositorio(BackendSQLite(str(tmp_path / "relatorio.db")))
+    repositorio.inserir("AnamnesePacientes", {"id_paciente": 1, "nome_paciente": "Ana", "id_nutricionista": 1})
+    return repositorio
+
+
+def consulta(id_consulta, dia):
+    return {"id_consulta": id_consulta, "id_paciente": 1, "id_nutricionista": 1, "data_consulta": f"2025-01-{dia:02d} 10:00:00"}
+
+
+def registrar(repositorio, dados):
+    repositorio.inserir("Consultas", dados)
+    registrar_consulta(repositorio, dados)
+
+
+def test_consulta_gravada_durante_a_montagem_entra_no_agregado(repositorio, monkeypatch):
+    registrar(repositorio, consulta(1, 1))
+    reconstruir = core.relatorio.reconstruir_agregado
+    montagens = []
+
+    def reconstruir_com_consulta_no_meio(repo, id_paciente):
+        agregado = reconstruir(repo, id_paciente)
+        if not montagens:
+            # outra sessão registra uma consulta depois da leitura das abas
+            registrar(repo, consulta(2, 2))
+        montagens.append(agregado)
+        return agregado
+
+    monkeypatch.setattr(core.relatorio, "reconstruir_agregado", reconstruir_com_consulta_no_meio)
+    assert agregado_paciente(repositorio, 1)["consultas"] == 2
+    assert len(montagens) == 2
+
+
+def test_consulta_ja_montada_nao_conta_de_novo(repositorio):
+    dados = consulta(1, 1)
+    repositorio.inserir("Consultas", dados)
+    assert agregado_paciente(repositorio, 1)["consultas"] == 1
+
+    # o registrar_consulta da mesma consulta chega depois de o agregado ser montado
+    registrar_consulta(repositorio, dados)
+    assert agregado_paciente(repositorio, 1)["consultas"] == 1
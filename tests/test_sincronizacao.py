@@ -0,0 +1,68 @@
+"""Fila de sincronização: envio em lote, isolamento de linhas ruins e descarte."""
+import pytest
+
+from core.database import BackendSQLite
+from core.sincronizacao import Sincronizador
+
+
+class DestinoFalso:
+    """Destino que recusa o lote inteiro se houver uma linha com nome "ruim"."""
+
+    def __init__(self):
+        self.recebidas = []
+
+    def anexar(self, aba, registros):
+        if any(r.get("nome") == "ruim" for r in registros):
+            raise ValueError("linha ruim")
+        self.recebidas += [r["nome"] for r in registros]
+
+
+@pytest.fixture
+def local(tmp_path):
+    return BackendSQLite(str(tmp_path / "fila.db"))
+
+
+def sincronizador(local, destino):
+    return Sincronizador(local, destino, janela_agrupamento=0, espera_inicial=0.001, espera_maxima=0.002, maximo_tentativas=5)
+
+
+def enfileirar(local, nomes):
+    local.anexar("LeadsPacientes", [{"id_lead": i, "nome": n} for i, n in enumerate(nomes, 1)], enfileirar=True)
+
+
+def test_linha_ruim_nao_segura_a_aba_e_vai_para_descartados(local):
+    destino = DestinoFalso()
+    enfileirar(local, ["a", "ruim", "b"])
+    sinc = sincronizador(local, destino)
+    try:
+        assert sinc.descarregar(timeout=10)
+    finally:
+        sinc.parar(1)
+    assert sorted(destino.recebidas) == ["a", "b"]
+    descartados = local.descartados()
+    assert descartados["tentativas"].tolist() == [5]
+    assert descartados["ultimo_erro"].tolist() == ["linha ruim"]
+
+    assert local.reenfileirar_descartados() == 1
+    assert local.tamanho_fila() == 1 and local.descartados().empty
+
+
+def test_erro_no_banco_nao_mata_a_thread(local):
+    destino = DestinoFalso()
+    enfileirar(local, ["a"])
+    pendentes, falhas = local.pendentes, [RuntimeError("database is locked")]
+
+    def pendentes_com_falha(*args):
+        if falhas:
+            raise falhas.pop()
+        return pendentes(*args)
+
+    local.pendentes = pendentes_com_falha
+    sinc = sincronizador(local, destino)
+    try:
+        assert sinc.descarregar(timeout=10)
+        assert sinc._thread.is_alive()
+    finally:
+        sinc.parar(1)
+    assert destino.recebidas == ["a"]
+    assert "database is locked" in sinc.ultimo_erro
@@ -0,0 +1,28 @@
+"""Máscaras de alergia do índice de substituição: compartilhadas por termos e em número limitado."""
+import numpy as np
+
+from core.dieta import MatrizTACO
+from core.substituicao import MASCARAS_ALERGIA, IndiceSubstituicao
+
+
+def test_mascaras_por_termos_e_limitadas(matriz):
+    nomes = ["Leite, de vaca, integral", "Castanha-do-Brasil, crua"] + list(matriz.nomes[2:])
+    indice = IndiceSubstituicao(MatrizTACO(matriz.ids, nomes, matriz.nutrientes, matriz.valores, matriz.classes))
+
+    assert indice.permitidos("Nozes, lactose") is indice.permitidos("lactose; nozes")
+    assert not indice.permitidos("lactose")[0]
+    assert indice.permitidos("nenhuma") is indice.permitidos(None)
+
+    for k in range(2 * MASCARAS_ALERGIA):
+        indice.permitidos(f"alimento {k}")
+    assert indice._permitidos_por_termos.cache_info().currsize == MASCARAS_ALERGIA
+    assert np.array_equal(indice.permitidos("lactose"), indice._calcular_permitidos(("lactose",)))
+
+
+def test_sem_proteina_no_original_nao_ha_equivalentes(matriz):
+    valores = matriz.valores.copy()
+    valores[0, matriz.coluna("proteina_g")] = 0.0
+    indice = IndiceSubstituicao(MatrizTACO(matriz.ids, matriz.nomes, matriz.nutrientes, valores, matriz.classes))
+
+    assert indice.substitutos(0, 100.0, por="proteina_g") == []
+    assert all(gramas > 0 for _, gramas, _ in indice.substitutos(0, 100.0, por="kcal"))
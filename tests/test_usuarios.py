@@ -0,0 +1,64 @@
+"""Login: senhas em texto puro vindas da planilha, nutricionistas recém-cadastrados e administradores."""
+import pandas as pd
+import pytest
+
+from benchmarks.gsheets_falso import ConexaoFalsa, PlanilhaFalsa
+from core.database import BackendGSheets, BackendSQLite, Repositorio
+from core.usuarios import IndiceCredenciais, administradores, eh_administrador
+
+
+@pytest.fixture
+def local(tmp_path):
+    return BackendSQLite(str(tmp_path / "usuarios.db"))
+
+
+def nutricionista(id_nutricionista, senha):
+    return {
+        "id_nutricionista": id_nutricionista,
+        "nome_nutricionista": f"Nutricionista {id_nutricionista}",
+        "email_nutricionista": f"nutri{id_nutricionista}@exemplo.com",
+        "senha_nutricionista": senha,
+    }
+
+
+@pytest.mark.parametrize("senha", [1234, 1234.0, "1234"])
+def test_senha_numerica_da_planilha_vira_hash(local, senha):
+    local.anexar("Nutricionistas", [nutricionista(1, senha)])
+    indice = IndiceCredenciais(Repositorio(local))
+
+    assert indice.autenticar("nutri1@exemplo.com", "1234")["id_nutricionista"] == 1
+    linha = local.primeiro("Nutricionistas", id_nutricionista=1)
+    assert linha["senha_nutricionista"] is None
+    assert linha["hash_senha_nutricionista"].startswith("pbkdf2_sha256$")
+
+
+def test_nutricionista_incluido_na_planilha_entra_na_primeira_tentativa(tmp_path):
+    planilha = PlanilhaFalsa(pd.DataFrame([nutricionista(1, "um")]))
+    conexao = ConexaoFalsa({"Nutricionistas": planilha})
+    repositorio = Repositorio(BackendSQLite(str(tmp_path / "usuarios.db")), BackendGSheets(lambda: conexao))
+    try:
+        indice = IndiceCredenciais(repositorio, intervalo_minimo=0)
+        assert indice.autenticar("nutri1@exemplo.com", "um") is not None
+
+        planilha.df = pd.concat([planilha.dataframe(), pd.DataFrame([nutricionista(2, "dois")])], ignore_index=True)
+        assert indice.autenticar("nutri2@exemplo.com", "dois")["id_nutricionista"] == 2
+
+        indice.intervalo_minimo = 3600
+        recargas = indice.dados.recargas
+        assert indice.autenticar("ninguem@exemplo.com", "x") is None
+        assert indice.dados.recargas == recargas
+    finally:
+        repositorio.sincronizador.parar(1)
+
+
+def test_administradores_vem_de_nutri_admins(monkeypatch):
+    monkeypatch.setenv("NUTRI_ADMINS", " Nutri1@Exemplo.com, ,nutri7@exemplo.com")
+    assert administradores() == {"nutri1@exemplo.com", "nutri7@exemplo.com"}
+    assert eh_administrador("nutri1@exemplo.com ")
+    assert not eh_administrador("nutri2@exemplo.com")
+    assert not eh_administrador(None)
+
+
+def test_sem_nutri_admins_ninguem_e_administrador(monkeypatch):
+    monkeypatch.delenv("NUTRI_ADMINS", raising=False)
+    assert not eh_administrador("nutri1@exemplo.com")
@@ -1,12 +1,133 @@
+"""Build da Tabela TACO usada pelo app.
+
+Lê as abas TACO, AGtaco3 e AminoácidosTACO3 da planilha, limpa os tipos
+("Tr", "NA", "*" -> 0), normaliza os nomes, une tudo por `id_alimento` e grava
+um snapshot versionado em `dados/taco/<versão>/`:
+
+    nutrientes.npy   matriz float32 (alimentos × nutrientes, por 100 g)
+    ids.npy          id_alimento de cada linha
+    alimentos.json   nomes, classes e a ordem das colunas de nutrientes
+
+`dados/taco/manifesto.json` aponta para a versão atual e só é trocado depois
+que a versão nova foi gravada por inteiro. Em seguida, as versões além da
+atual e da anterior são apagadas. O app abre a matriz com
+`np.load(mmap_mode="r")` (ver `core.dieta.carregar_matriz_taco`), sem rede.
+
+O snapshot vai para o git (~200 KB por versão), ao contrário do índice de
+documentos: sem ele, cada processo do app montaria a TACO lendo três abas da
+planilha. Ao commitar uma versão nova, a anterior sai junto (`git add -A
+dados/taco`).
+
+Uso:
+    python tratar_taco.py [--origem Nutri-app.xlsx] [--destino dados/taco] [--forcar]
+"""
+import argparse
+import datetime
+import hashlib
+import json
+import os
+import re
+
+import numpy as np
 import pandas as pd
 
-TACO = pd.read_excel('Nutri-app.xlsx', sheet_name='TACO')
-AGtaco = pd.read_excel('Nutri-app.xlsx', sheet_name='AGtaco3')
-AAtaco = pd.read_excel('Nutri-app.xlsx', sheet_name='AminoácidosTACO3')
+from core.dieta import DIRETORIO_SNAPSHOT_TACO, nutrientes_disponiveis
+from core.documentos import remover_versoes_antigas
+
+
+def sha256_arquivo(caminho):
+    h = hashlib.sha256()
+    with open(caminho, "rb") as arquivo:
+        for bloco in iter(lambda: arquivo.read(1 << 20), b""):
+            h.update(bloco)
+    return h.hexdigest()
+
+
+def limpar_aba(df):
+    """Remove colunas sem nome e linhas de título de grupo (id não numérico)."""
+    df = df[[c for c in df.columns if not str(c).startswith("Unnamed") and not str(c).endswith(".1")]]
+    df = df[pd.to_numeric(df["id_alimento"], errors="coerce").notna()].copy()
+    df["id_alimento"] = df["id_alimento"].astype(int)
+    return df.drop_duplicates(subset="id_alimento")
+
+
+def normalizar_nome(nome):
+    return re.sub(r"\s+", " ", str(nome)).strip()
+
+
+def montar_tabela(origem):
+    taco = limpar_aba(pd.read_excel(origem, sheet_name="TACO"))
+    ag = limpar_aba(pd.read_excel(origem, sheet_name="AGtaco3"))
+    aa = limpar_aba(pd.read_excel(origem, sheet_name="AminoácidosTACO3"))
+
+    df = taco.merge(ag.drop(columns=["descricao_alimento"]), on="id_alimento", how="left")
+    df = df.merge(aa.drop(columns=["descricao_alimento"]), on="id_alimento", how="left")
+    df["descricao_alimento"] = df["descricao_alimento"].map(normalizar_nome)
+    df["classe"] = df["classe"].fillna("").map(normalizar_nome)
+    return df.sort_values("id_alimento").reset_index(drop=True)
+
+
+def gravar_snapshot(df, destino, sha_origem):
+    nutrientes = nutrientes_disponiveis(df.columns)
+    valores = np.zeros((len(df), len(nutrientes)), dtype=np.float32)
+    for j, coluna in enumerate(nutrientes):
+        if coluna in df.columns:
+            valores[:, j] = pd.to_numeric(df[coluna], errors="coerce").fillna(0.0)
+
+    versao = f"{datetime.datetime.now():%Y%m%d%H%M%S}-{sha_origem[:8]}"
+    pasta = os.path.join(destino, versao)
+    os.makedirs(pasta)
+    np.save(os.path.join(pasta, "nutrientes.npy"), np.ascontiguousarray(valores))
+    np.save(os.path.join(pasta, "ids.npy"), df["id_alimento"].to_numpy(dtype=np.int64))
+    with open(os.path.join(pasta, "alimentos.json"), "w", encoding="utf-8") as arquivo:
+        json.dump(
+            {
+                "nomes": df["descricao_alimento"].tolist(),
+                "classes": df["classe"].tolist(),
+                "nutrientes": nutrientes,
+            },
+            arquivo,
+            ensure_ascii=False,
+        )
+
+    manifesto = {
+        "versao": versao,
+        "criado_em": datetime.datetime.now().isoformat(timespec="seconds"),
+        "sha256_origem": sha_origem,
+        "alimentos": len(df),
+        "nutrientes": len(nutrientes),
+    }
+    temporario = os.path.join(destino, "manifesto.json.tmp")
+    with open(temporario, "w", encoding="utf-8") as arquivo:
+        json.dump(manifesto, arquivo, ensure_ascii=False, indent=2)
+    os.replace(temporario, os.path.join(destino, "manifesto.json"))
+    remover_versoes_antigas(destino, versao)
+    return manifesto
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--origem", default="Nutri-app.xlsx")
+    parser.add_argument("--destino", default=DIRETORIO_SNAPSHOT_TACO)
+    parser.add_argument("--forcar", action="store_true", help="gera nova versão mesmo sem mudanças na origem")
+    args = parser.parse_args()
+
+    sha_origem = sha256_arquivo(args.origem)
+    caminho_manifesto = os.path.join(args.destino, "manifesto.json")
+    if not args.forcar and os.path.exists(caminho_manifesto):
+        with open(caminho_manifesto, encoding="utf-8") as arquivo:
+            atual = json.load(arquivo)
+        if atual.get("sha256_origem") == sha_origem:
+            print(f"TACO já atualizada (versão {atual['versao']}).")
+            return
 
-df_merged_1 = pd.merge(TACO, AGtaco, on='id_alimento', how='left')
+    os.makedirs(args.destino, exist_ok=True)
+    manifesto = gravar_snapshot(montar_tabela(args.origem), args.destino, sha_origem)
+    print(
+        f"TACO versão {manifesto['versao']}: {manifesto['alimentos']} alimentos × "
+        f"{manifesto['nutrientes']} nutrientes em {args.destino}"
+    )
 
-df_final = pd.merge(df_merged_1, AAtaco, on='id_alimento', how='left')
 
-df_final.to_excel('TACO.xlsx')
-print(AAtaco)
\ No newline at end of file
+if __name__ == "__main__":
+    main()